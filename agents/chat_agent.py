@@ -1,25 +1,111 @@
-import os
-import json
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
-from typing import List, Dict, Any
+from tools.llm_client import get_client, extract_json, DEFAULT_MODEL
+from tools.response_cache import ResponseCache
+from tools.json_stream import JSONFieldStream
+from tools.chat_context import ConversationContext, estimate_tokens
+from typing import List, Dict, Any, AsyncIterator, Tuple
+
+SIMULATION_RESPONSE = {
+    "message": "Simulation: API Key missing.",
+    "question": "Simulation Question?",
+    "feedback": "Simulation Feedback",
+    "next_question": "Simulation Next Question",
+    "is_correct": True,
+    "concept": "Simulation",
+    "difficulty": "Easy"
+}
 
 class ChatAgent:
-    def __init__(self, model_name: str = "models/gemini-2.5-flash"):
-        self.model_name = model_name
-        self._setup_genai()
+    # Bump when the recommendations prompt changes so cached replies aren't reused
+    RECOMMENDATIONS_PROMPT_VERSION = 1
 
-    def _setup_genai(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if api_key and genai:
-            genai.configure(api_key=api_key)
+    def __init__(self, model_name: str = DEFAULT_MODEL, cache: ResponseCache = None, context: ConversationContext = None):
+        self.model_name = model_name
+        self.llm = get_client(model_name)
+        # Only recommendations are cached; tutoring turns depend on the live conversation
+        self.cache = cache
+        # Last few turns verbatim plus a rolling summary, under a token budget
+        self.context = context or ConversationContext()
 
     def start_session(self, subject: str, difficulty: str = "intermediate", grade_level: str = "College Year 1") -> Dict[str, Any]:
         """
         Starts a new chat session with specified difficulty and grade level.
         """
+        return self._generate(self._start_prompt(subject, difficulty, grade_level))
+
+    async def start_session_async(self, subject: str, difficulty: str = "intermediate", grade_level: str = "College Year 1") -> Dict[str, Any]:
+        return await self._generate_async(self._start_prompt(subject, difficulty, grade_level))
+
+    def process_response(self, subject: str, history: List[Dict[str, str]], last_answer: str, difficulty: str = "intermediate", grade_level: str = "College Year 1", session_id: str = None) -> Dict[str, Any]:
+        """
+        Evaluates the student's answer and generates the next step.
+        The response's "context" entry reports the prompt's token counts.
+        """
+        prompt, context = self._response_prompt(subject, history, last_answer, difficulty, grade_level, session_id)
+        return self._with_context(self._generate(prompt), context)
+
+    async def process_response_async(self, subject: str, history: List[Dict[str, str]], last_answer: str, difficulty: str = "intermediate", grade_level: str = "College Year 1", session_id: str = None) -> Dict[str, Any]:
+        prompt, context = self._response_prompt(subject, history, last_answer, difficulty, grade_level, session_id)
+        return self._with_context(await self._generate_async(prompt), context)
+
+    async def stream_response_async(self, subject: str, history: List[Dict[str, str]], last_answer: str, difficulty: str = "intermediate", grade_level: str = "College Year 1", session_id: str = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming process_response. Yields (event, data) pairs:
+        ("context", token_report) first, ("feedback_delta", text) as feedback
+        is generated, (field_name, value) as each structured field completes,
+        then ("done", full_response). Failures end the stream with
+        ("error", message).
+        """
+        prompt, context = self._response_prompt(subject, history, last_answer, difficulty, grade_level, session_id)
+        yield "context", context
+        if not self.llm.available:
+            for name, value in SIMULATION_RESPONSE.items():
+                yield name, value
+            yield "done", self._with_context(dict(SIMULATION_RESPONSE), context)
+            return
+
+        parser = JSONFieldStream()
+        chunks = []
+        try:
+            async for chunk in self.llm.stream_text_async(prompt, agent=type(self).__name__):
+                chunks.append(chunk)
+                for kind, name, value in parser.feed(chunk):
+                    if kind == "delta":
+                        if name == "feedback":
+                            yield "feedback_delta", value
+                    else:
+                        yield name, value
+        except Exception as e:
+            print(f"Error in ChatAgent stream: {e}")
+            yield "error", str(e)
+            return
+
+        response = parser.fields
+        if not parser.done:
+            # Not the single flat object we asked for; fall back to a full parse
+            try:
+                response = extract_json("".join(chunks))
+                if not isinstance(response, dict):
+                    raise ValueError("Expected a JSON object in model response")
+            except ValueError as e:
+                yield "error", str(e)
+                return
+            for name, value in response.items():
+                if name not in parser.fields:
+                    yield name, value
+        yield "done", self._with_context(dict(response), context)
+
+    def generate_recommendations(self, subject: str, weak_concepts: List[str], difficulty: str) -> Dict[str, Any]:
+        """
+        Generates specific video recommendations based on weak concepts.
+        """
+        return self._generate(self._recommendations_prompt(subject, weak_concepts, difficulty),
+                              template_version=self.RECOMMENDATIONS_PROMPT_VERSION)
+
+    async def generate_recommendations_async(self, subject: str, weak_concepts: List[str], difficulty: str) -> Dict[str, Any]:
+        return await self._generate_async(self._recommendations_prompt(subject, weak_concepts, difficulty),
+                                          template_version=self.RECOMMENDATIONS_PROMPT_VERSION)
+
+    def _start_prompt(self, subject: str, difficulty: str, grade_level: str) -> str:
         difficulty_prompts = {
             "beginner": "Ask simple, foundational questions.",
             "intermediate": "Ask conceptual questions.",
@@ -50,13 +136,12 @@ class ChatAgent:
             "question": "..."
         }}
         """
-        return self._generate(prompt)
+        return prompt
 
-    def process_response(self, subject: str, history: List[Dict[str, str]], last_answer: str, difficulty: str = "intermediate", grade_level: str = "College Year 1") -> Dict[str, Any]:
-        """
-        Evaluates the student's answer and generates the next step.
-        """
-        history_str = json.dumps(history[-5:]) # Keep context manageable
+    def _response_prompt(self, subject: str, history: List[Dict[str, str]], last_answer: str, difficulty: str, grade_level: str, session_id: str = None):
+        # Keep context manageable: recent turns verbatim, older ones summarized
+        window = self.context.build(history, session_id)
+        history_str = window.render()
         
         prompt = f"""
         You are a tutor for {subject}.
@@ -85,12 +170,11 @@ class ChatAgent:
             "difficulty": "{difficulty}"
         }}
         """
-        return self._generate(prompt)
+        context = window.report()
+        context["prompt_tokens"] = estimate_tokens(prompt)
+        return prompt, context
 
-    def generate_recommendations(self, subject: str, weak_concepts: List[str], difficulty: str) -> Dict[str, Any]:
-        """
-        Generates specific video recommendations based on weak concepts.
-        """
+    def _recommendations_prompt(self, subject: str, weak_concepts: List[str], difficulty: str) -> str:
         concepts_str = ", ".join(weak_concepts) if weak_concepts else "general topics"
         
         prompt = f"""
@@ -114,29 +198,34 @@ class ChatAgent:
             ]
         }}
         """
-        return self._generate(prompt)
-
-    def _generate(self, prompt: str) -> Dict[str, Any]:
-        if not os.getenv("GOOGLE_API_KEY") or not genai:
-            return {
-                "message": "Simulation: API Key missing.",
-                "question": "Simulation Question?",
-                "feedback": "Simulation Feedback",
-                "next_question": "Simulation Next Question",
-                "is_correct": True,
-                "concept": "Simulation",
-                "difficulty": "Easy"
-            }
-
-        model = genai.GenerativeModel(self.model_name)
+        return prompt
+
+    @staticmethod
+    def _with_context(response: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+        if isinstance(response, dict):
+            response["context"] = context
+        return response
+
+    def _generate(self, prompt: str, template_version: int = None) -> Dict[str, Any]:
+        if not self.llm.available:
+            return dict(SIMULATION_RESPONSE)
+
+        try:
+            if template_version is not None and self.cache is not None:
+                return self.llm.generate_json(prompt, cache=self.cache, template_version=template_version, agent=type(self).__name__)
+            return extract_json(self.llm.generate_text(prompt, agent=type(self).__name__))
+        except Exception as e:
+            print(f"Error in ChatAgent: {e}")
+            return {"error": str(e)}
+
+    async def _generate_async(self, prompt: str, template_version: int = None) -> Dict[str, Any]:
+        if not self.llm.available:
+            return dict(SIMULATION_RESPONSE)
+
         try:
-            response = model.generate_content(prompt)
-            text = response.text.strip()
-            if text.startswith("```json"):
-                text = text[7:]
-            if text.endswith("```"):
-                text = text[:-3]
-            return json.loads(text)
+            if template_version is not None and self.cache is not None:
+                return await self.llm.generate_json_async(prompt, cache=self.cache, template_version=template_version, agent=type(self).__name__)
+            return extract_json(await self.llm.generate_text_async(prompt, agent=type(self).__name__))
         except Exception as e:
             print(f"Error in ChatAgent: {e}")
             return {"error": str(e)}
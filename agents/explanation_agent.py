@@ -1,22 +1,22 @@
-import os
-import json
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
+from tools.llm_client import get_client, DEFAULT_MODEL
+from tools.response_cache import ResponseCache
+from tools.fan_out import unique_concepts, run_bounded, run_bounded_async, merge_results
 from typing import List, Dict, Any
 
 class ExplanationAgent:
-    def __init__(self, model_name: str = "models/gemini-2.5-flash"):
+    # Bump when the prompt wording changes so cached replies aren't reused
+    PROMPT_VERSION = 1
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, cache: ResponseCache = None,
+                 fan_out: bool = False, max_concurrency: int = 4):
         self.model_name = model_name
-        self._setup_genai()
+        self.llm = get_client(model_name)
+        self.cache = cache
+        # One request per concept (at most max_concurrency at once) instead of one for all
+        self.fan_out = fan_out
+        self.max_concurrency = max_concurrency
         self.prompt_template = self._load_prompt()
 
-    def _setup_genai(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if api_key and genai:
-            genai.configure(api_key=api_key)
-
     def _load_prompt(self) -> str:
         try:
             with open("prompts/explanation.txt", "r") as f:
@@ -27,30 +27,39 @@ class ExplanationAgent:
     def generate_explanations(self, weak_concepts: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Generates explanations for the given weak concepts.
+        With fan_out, concepts that fail are listed under "errors" and the rest are still returned.
         """
-        if not os.getenv("GOOGLE_API_KEY") or genai is None:
+        if not self.llm.available:
             return {"error": "Missing API Key or genai module", "explanations": []}
 
-        model = genai.GenerativeModel(self.model_name)
-        
-        concepts_str = ", ".join([c["concept"] for c in weak_concepts])
-        prompt = self.prompt_template.replace("{concepts}", concepts_str)
-        
+        if self.fan_out:
+            return merge_results(run_bounded(self._generate_one, unique_concepts(weak_concepts), self.max_concurrency), "explanations")
+
         try:
-            response = model.generate_content(prompt)
-            return self._parse_response(response.text)
+            return self.llm.generate_json(self._build_prompt(weak_concepts), cache=self.cache, template_version=self.PROMPT_VERSION, agent=type(self).__name__)
         except Exception as e:
             print(f"Error in explanation generation: {e}")
             return {"error": str(e)}
 
-    def _parse_response(self, text: str) -> Dict[str, Any]:
-        text = text.strip()
-        if text.startswith("```json"):
-            text = text[7:]
-        if text.endswith("```"):
-            text = text[:-3]
-        
+    async def generate_explanations_async(self, weak_concepts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if not self.llm.available:
+            return {"error": "Missing API Key or genai module", "explanations": []}
+
+        if self.fan_out:
+            return merge_results(await run_bounded_async(self._generate_one_async, unique_concepts(weak_concepts), self.max_concurrency), "explanations")
+
         try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            return {"raw_text": text}
+            return await self.llm.generate_json_async(self._build_prompt(weak_concepts), cache=self.cache, template_version=self.PROMPT_VERSION, agent=type(self).__name__)
+        except Exception as e:
+            print(f"Error in explanation generation: {e}")
+            return {"error": str(e)}
+
+    def _generate_one(self, concept: Dict[str, Any]) -> Dict[str, Any]:
+        return self.llm.generate_json(self._build_prompt([concept]), cache=self.cache, template_version=self.PROMPT_VERSION, agent=type(self).__name__)
+
+    async def _generate_one_async(self, concept: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.llm.generate_json_async(self._build_prompt([concept]), cache=self.cache, template_version=self.PROMPT_VERSION, agent=type(self).__name__)
+
+    def _build_prompt(self, weak_concepts: List[Dict[str, Any]]) -> str:
+        concepts_str = ", ".join([c["concept"] for c in weak_concepts])
+        return self.prompt_template.replace("{concepts}", concepts_str)
@@ -1,45 +1,126 @@
-from typing import Dict, Any, List
+from collections import Counter
+from typing import Dict, Any, List, Tuple
 try:
     from tools.math_solver import MathSolver
+    from tools import metrics
 except ImportError:
     # Fallback for when running from a different context
     import sys
     import os
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
     from tools.math_solver import MathSolver
+    from tools import metrics
 
 class QuizRunner:
-    def __init__(self):
-        self.math_solver = MathSolver()
+    def __init__(self, grading_pool=None):
+        # With a GradingPool, answers are checked in parallel worker processes
+        # with per-answer time and memory limits
+        self.math_solver = MathSolver(pool=grading_pool)
+
+    def compile_answer_key(self, practice_set: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+        """
+        Flattens a practice set into (concept, question_text, correct_answer) rows.
+        """
+        return [
+            (concept_group.get("concept"), q.get("question"), q.get("answer"))
+            for concept_group in practice_set.get("practice_set", [])
+            for q in concept_group.get("questions", [])
+        ]
 
     def grade_quiz(self, practice_set: Dict[str, Any], student_answers: Dict[str, str]) -> Dict[str, Any]:
         """
         Grades the practice set.
         """
+        answer_key = self.compile_answer_key(practice_set)
+        
+        # Grade the whole set at once so a pool can spread it across cores
+        verdicts = self.math_solver.check_many([(student_answers.get(q_text, ""), correct_ans) for _, q_text, correct_ans in answer_key])
+        return self._build_results(answer_key, student_answers, verdicts)
+
+    def grade_many(self, practice_set: Dict[str, Any], submissions: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Grades many students' answers to one practice set. The answer key is
+        compiled once and each distinct (answer, key) pair is checked once,
+        however many students gave it.
+        """
+        answer_key = self.compile_answer_key(practice_set)
+        
+        pairs = [
+            (answers.get(q_text, ""), correct_ans)
+            for answers in submissions.values()
+            for _, q_text, correct_ans in answer_key
+        ]
+        verdicts = self.math_solver.check_many(pairs)
+        
+        students = {}
+        n = len(answer_key)
+        for i, (student_id, answers) in enumerate(submissions.items()):
+            students[student_id] = self._build_results(answer_key, answers, verdicts[i * n:(i + 1) * n])
+        
+        return {
+            "students": students,
+            "questions": self._question_aggregates(answer_key, students),
+            "distinct_checks": len(set(pairs)),
+            "total_checks": len(pairs)
+        }
+
+    def _build_results(self, answer_key, student_answers, verdicts) -> Dict[str, Any]:
         results = {
             "score": 0,
             "total": 0,
+            "undetermined": 0,
             "details": []
         }
-
-        for concept_group in practice_set.get("practice_set", []):
-            for q in concept_group.get("questions", []):
-                q_text = q.get("question")
-                correct_ans = q.get("answer")
-                student_ans = student_answers.get(q_text, "")
-                
-                is_correct = self.math_solver.validate_answer(student_ans, correct_ans)
-                
-                results["total"] += 1
-                if is_correct:
-                    results["score"] += 1
-                
-                results["details"].append({
-                    "question": q_text,
-                    "student_answer": student_ans,
-                    "correct_answer": correct_ans,
-                    "is_correct": is_correct,
-                    "concept": concept_group.get("concept")
-                })
+        
+        for (concept, q_text, correct_ans), (is_correct, tier) in zip(answer_key, verdicts):
+            student_ans = student_answers.get(q_text, "")
+            results["total"] += 1
+            if is_correct:
+                results["score"] += 1
+            elif is_correct is None:
+                # Check hit the time/memory limit: neither right nor wrong
+                results["undetermined"] += 1
+            
+            results["details"].append({
+                "question": q_text,
+                "student_answer": student_ans,
+                "correct_answer": correct_ans,
+                "is_correct": is_correct,
+                "check_tier": tier,
+                "concept": concept
+            })
         
         return results
+
+    def _question_aggregates(self, answer_key, students: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        aggregates = []
+        for index, (concept, q_text, correct_ans) in enumerate(answer_key):
+            correct = undetermined = 0
+            wrong_answers = Counter()
+            for result in students.values():
+                detail = result["details"][index]
+                if detail["is_correct"]:
+                    correct += 1
+                elif detail["is_correct"] is None:
+                    undetermined += 1
+                else:
+                    wrong_answers[str(detail["student_answer"]).strip()] += 1
+            
+            attempts = len(students)
+            aggregates.append({
+                "question": q_text,
+                "concept": concept,
+                "correct_answer": correct_ans,
+                "attempts": attempts,
+                "correct": correct,
+                "undetermined": undetermined,
+                "percent_correct": round(100 * correct / attempts, 1) if attempts else 0,
+                "common_wrong_answers": [
+                    {"answer": answer, "count": count} for answer, count in wrong_answers.most_common(3)
+                ]
+            })
+        return aggregates
+
+
+# Whole-quiz grading, answer key included
+metrics.instrument_methods(QuizRunner, metrics.GRADING_SECONDS, "QuizRunner", methods=["grade_quiz", "grade_many"])
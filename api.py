@@ -3,8 +3,12 @@ from fastapi import FastAPI, HTTPException, UploadFile, File
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 import json
 import shutil
+import asyncio
+import time
 from datetime import datetime
 
 # Import Agents
@@ -21,6 +25,14 @@ from agents.chat_agent import ChatAgent
 from agents.game_service import GameService
 from tools.memory_bank import MemoryBank
 from tools.user_database import UserDatabase
+from tools.grading_pool import GradingPool
+from tools import llm_client
+from tools import metrics
+from tools.math_solver import PARSE_CACHE, VERDICT_CACHE, PROBE_CACHE
+from tools.response_cache import ResponseCache
+from tools.chat_context import ConversationContext
+from tools.session_store import ChatSessionStore
+from tools.pipeline_state import PipelineStateStore, MemoryStateBackend, SQLiteStateBackend
 
 # Load Env
 from dotenv import load_dotenv
@@ -36,20 +48,63 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so request latency on /metrics covers CORS handling too
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Generated explanations / practice sets / recommendations, reused for identical prompts
+# (LLM_CACHE_DB_PATH="" keeps the cache in memory only)
+response_cache = ResponseCache(
+    db_path=os.getenv("LLM_CACHE_DB_PATH", "llm_cache.db") or None,
+    maxsize=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("LLM_CACHE_TTL_S", "86400"))
+)
 
 # Initialize Agents
 ingest = IngestAgent()
 diagnostic = DiagnosticAgent()
-practice = PracticeAgent()
-explanation = ExplanationAgent()
-quiz_runner = QuizRunner()
-tracker = ProgressTracker()
+# One model request per weak concept, LLM_FAN_OUT_CONCURRENCY at a time (LLM_FAN_OUT=0: one request for all)
+fan_out = os.getenv("LLM_FAN_OUT", "1") != "0"
+fan_out_concurrency = int(os.getenv("LLM_FAN_OUT_CONCURRENCY", "4"))
+practice = PracticeAgent(cache=response_cache, fan_out=fan_out, max_concurrency=fan_out_concurrency)
+explanation = ExplanationAgent(cache=response_cache, fan_out=fan_out, max_concurrency=fan_out_concurrency)
+# Symbolic grading runs in worker processes with per-answer limits (GRADING_POOL_SIZE=0 grades in-process)
+pool_size = int(os.getenv("GRADING_POOL_SIZE", "2"))
+grading_pool = GradingPool(
+    size=pool_size,
+    timeout=float(os.getenv("GRADING_TIMEOUT_S", "5")),
+    memory_limit_mb=int(os.getenv("GRADING_MEMORY_MB", "1024"))
+) if pool_size > 0 else None
+quiz_runner = QuizRunner(grading_pool=grading_pool)
+memory = MemoryBank(db_path=os.getenv("MEMORY_DB_PATH", "tutor_memory.db"))
+tracker = ProgressTracker(memory=memory)
 scheduler = SchedulerAgent()
 summary_agent = TeacherSummaryAgent()
-chat_agent = ChatAgent()
-memory = MemoryBank()
-user_db = UserDatabase()
-user_db = UserDatabase()
+chat_agent = ChatAgent(
+    cache=response_cache,
+    # Messages kept verbatim in chat prompts; older ones are summarized within the token budget
+    context=ConversationContext(
+        keep_turns=int(os.getenv("CHAT_CONTEXT_TURNS", "6")),
+        max_tokens=int(os.getenv("CHAT_CONTEXT_TOKENS", "1500"))
+    )
+)
+# Chat transcripts live server-side; clients send only the new message
+chat_sessions = ChatSessionStore(
+    db_path=os.getenv("CHAT_SESSION_DB_PATH") or None,  # unset = in memory only
+    max_sessions=int(os.getenv("CHAT_SESSION_MAX", "10000")),
+    idle_ttl=float(os.getenv("CHAT_SESSION_TTL_S", "7200"))
+)
+# Ingest -> diagnose -> practice -> submit state, one entry per pipeline_id.
+# PIPELINE_STATE_DB_PATH shares it between uvicorn workers; unset = in-process only
+pipeline_db_path = os.getenv("PIPELINE_STATE_DB_PATH")
+pipelines = PipelineStateStore(
+    backend=SQLiteStateBackend(pipeline_db_path) if pipeline_db_path
+    else MemoryStateBackend(maxsize=int(os.getenv("PIPELINE_STATE_MAX", "10000"))),
+    ttl=float(os.getenv("PIPELINE_STATE_TTL_S", "3600"))
+)
+user_db = UserDatabase(
+    db_path=os.getenv("USER_DB_PATH", "tutormate_users.db"),
+    timezone=os.getenv("STREAK_TIMEZONE")  # e.g. "Asia/Kolkata"; unset = UTC days
+)
 game_service = GameService()
 
 # Data Models
@@ -61,9 +116,10 @@ class ChatStartRequest(BaseModel):
 class ChatMessageRequest(BaseModel):
     session_id: str
     message: str
-    history: List[Dict[str, str]] = []
-    difficulty: str = "intermediate"
-    grade_level: str = "College Year 1"
+    # Only needed by clients that don't use server-side sessions
+    history: List[Dict[str, Any]] = []
+    difficulty: Optional[str] = None  # defaults to the session's
+    grade_level: Optional[str] = None
     image: Optional[str] = None # Add image field
 
 class RegisterRequest(BaseModel):
@@ -84,15 +140,52 @@ class QuizData(BaseModel):
     quiz_id: str
     questions: List[Dict[str, Any]]
 
-# Global state for demo simplicity (in real app, use DB)
-CURRENT_DATA = {
-    "quiz": None,
-    "responses": None,
-    "normalized": None,
-    "diagnosis": None,
-    "weak_concepts": [],
-    "practice_set": None
-}
+class PipelineRunRequest(BaseModel):
+    responses: Dict[str, Any]
+    quiz: Optional[Dict[str, Any]] = None  # defaults to the pipeline's (or the shared) quiz
+    pipeline_id: Optional[str] = None  # a new pipeline is started if not given
+    stream: bool = True
+
+class GradeBatchRequest(BaseModel):
+    submissions: Dict[str, Dict[str, str]]  # student_id -> {question text: answer}
+    practice_set: Optional[Dict[str, Any]] = None  # defaults to the pipeline's practice set
+    pipeline_id: Optional[str] = None
+    track_progress: bool = True
+
+# Callers that don't pass a pipeline_id all share this one (the old single-student behaviour).
+# A quiz ingested here is also the fallback answer key for pipelines without their own quiz.
+DEFAULT_PIPELINE = "default"
+
+# Errors a route catches and answers with a fallback, which the status code alone doesn't show
+HANDLED_ERRORS = metrics.counter(
+    "tutormate_handled_errors_total", "Errors caught inside a route and answered with a fallback", ("source",))
+
+def _collect_metrics():
+    """Counters components keep themselves, read on each /metrics scrape"""
+    cache = response_cache.stats()
+    families = metrics.cache_families({
+        "llm_response": {"hits": cache["memory_hits"] + cache["disk_hits"], "misses": cache["misses"],
+                         "size": cache["memory_size"]},
+        "math_parse": PARSE_CACHE.stats(),
+        "math_verdict": VERDICT_CACHE.stats(),
+        "math_probe": PROBE_CACHE.stats(),
+        "chat_summary": chat_agent.context.summaries.stats(),
+        "chat_session": chat_sessions.sessions.stats(),
+    })
+    pools = {"UserDatabase": user_db.get_pool_stats(), "MemoryBank": memory.get_pool_stats()}
+    families.append(("tutormate_sqlite_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection",
+                     [({"component": name}, stats["wait_total_ms"] / 1000) for name, stats in pools.items()]))
+    families.append(("tutormate_sqlite_pool_in_use", "gauge", "Connections checked out",
+                     [({"component": name}, stats["in_use"]) for name, stats in pools.items()]))
+    if grading_pool is not None:
+        grading = grading_pool.stats()
+        families.append(("tutormate_grading_pool_timeouts_total", "counter", "Checks stopped at the time or memory limit",
+                         [({}, grading["timeouts"])]))
+        families.append(("tutormate_grading_pool_restarts_total", "counter", "Grading workers replaced",
+                         [({}, grading["restarts"])]))
+    return families
+
+metrics.register_collector("api", _collect_metrics)
 
 @app.get("/")
 def read_root():
@@ -141,77 +234,222 @@ def get_dashboard(user_id: int):
         }
     except Exception as e:
         print(f"Dashboard error: {e}")
+        HANDLED_ERRORS.inc("dashboard")
         return {
             "stats": {"total_sessions": 0, "average_score": 0, "subjects": []},
             "recent_sessions": [],
             "has_sessions": False
         }
 
+@app.get("/sessions/{session_id}")
+def get_session(session_id: int, user_id: int):
+    """Get one of the user's saved sessions with its full chat transcript"""
+    session = user_db.get_session(session_id, user_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+def pipeline_quiz(pipeline_id: str) -> Optional[Dict[str, Any]]:
+    """The pipeline's quiz, else the default pipeline's; blocking, so call it through run_in_threadpool"""
+    return pipelines.get(pipeline_id)["quiz"] or pipelines.get(DEFAULT_PIPELINE)["quiz"]
+
 @app.post("/ingest/quiz")
-async def ingest_quiz(file: UploadFile = File(...)):
+async def ingest_quiz(file: UploadFile = File(...), pipeline_id: str = DEFAULT_PIPELINE):
     try:
         content = await file.read()
         data = json.loads(content)
-        CURRENT_DATA["quiz"] = data
-        return {"status": "success", "message": "Quiz ingested", "data": data}
+        state = await run_in_threadpool(pipelines.update, pipeline_id, quiz=data)
+        if state["responses"]:
+            await run_in_threadpool(pipelines.update, pipeline_id,
+                                    normalized=ingest.normalize_responses(state["responses"], data))
+        return {"status": "success", "message": "Quiz ingested", "data": data, "pipeline_id": pipeline_id}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/ingest/responses")
-async def ingest_responses(file: UploadFile = File(...)):
+async def ingest_responses(file: UploadFile = File(...), pipeline_id: str = DEFAULT_PIPELINE):
     try:
         content = await file.read()
         data = json.loads(content)
-        CURRENT_DATA["responses"] = data
+        fields = {"responses": data}
         
-        if CURRENT_DATA["quiz"]:
-            CURRENT_DATA["normalized"] = ingest.normalize_responses(data, CURRENT_DATA["quiz"])
+        quiz = await run_in_threadpool(pipeline_quiz, pipeline_id)
+        if quiz:
+            fields["normalized"] = ingest.normalize_responses(data, quiz)
+        await run_in_threadpool(pipelines.update, pipeline_id, **fields)
             
-        return {"status": "success", "message": "Responses ingested", "data": data}
+        return {"status": "success", "message": "Responses ingested", "data": data, "pipeline_id": pipeline_id}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/diagnose")
-def run_diagnosis():
-    if not CURRENT_DATA["normalized"]:
+async def run_diagnosis(pipeline_id: str = DEFAULT_PIPELINE):
+    state = await run_in_threadpool(pipelines.get, pipeline_id)
+    if not state["normalized"]:
         raise HTTPException(status_code=400, detail="No normalized data found. Ingest quiz and responses first.")
     
-    diagnosis = diagnostic.diagnose(CURRENT_DATA["normalized"])
-    CURRENT_DATA["diagnosis"] = diagnosis
-    CURRENT_DATA["weak_concepts"] = diagnosis.get("weak_concepts", [])
+    diagnosis = await diagnostic.diagnose_async(state["normalized"])
+    await run_in_threadpool(pipelines.update, pipeline_id,
+                            diagnosis=diagnosis, weak_concepts=diagnosis.get("weak_concepts", []))
     
     return diagnosis
 
 @app.get("/explain")
-def get_explanations():
-    if not CURRENT_DATA["weak_concepts"]:
+async def get_explanations(pipeline_id: str = DEFAULT_PIPELINE):
+    state = await run_in_threadpool(pipelines.get, pipeline_id)
+    if not state["weak_concepts"]:
         return {"explanations": []}
     
-    explanations = explanation.generate_explanations(CURRENT_DATA["weak_concepts"])
+    explanations = await explanation.generate_explanations_async(state["weak_concepts"])
     return explanations
 
 @app.get("/practice")
-def get_practice():
-    if not CURRENT_DATA["weak_concepts"]:
+async def get_practice(pipeline_id: str = DEFAULT_PIPELINE):
+    state = await run_in_threadpool(pipelines.get, pipeline_id)
+    if not state["weak_concepts"]:
         return {"practice_set": []}
     
-    practice_set = practice.generate_practice(CURRENT_DATA["weak_concepts"])
-    CURRENT_DATA["practice_set"] = practice_set
+    practice_set = await practice.generate_practice_async(state["weak_concepts"])
+    await run_in_threadpool(pipelines.update, pipeline_id, practice_set=practice_set)
     return practice_set
 
 @app.post("/submit_practice")
-def submit_practice(answers: Dict[str, str]):
-    if not CURRENT_DATA["practice_set"]:
+def submit_practice(answers: Dict[str, str], pipeline_id: str = DEFAULT_PIPELINE):
+    state = pipelines.get(pipeline_id)
+    if not state["practice_set"]:
         raise HTTPException(status_code=400, detail="No active practice set.")
     
-    results = quiz_runner.grade_quiz(CURRENT_DATA["practice_set"], answers)
+    results = quiz_runner.grade_quiz(state["practice_set"], answers)
     
     # Update tracker
-    student_id = CURRENT_DATA.get("responses", {}).get("student_id", "unknown")
+    student_id = (state["responses"] or {}).get("student_id", "unknown")
     tracker.update_progress(student_id, results)
     
     return results
 
+@app.post("/practice/grade_batch")
+def grade_batch(request: GradeBatchRequest):
+    """Grade a whole class against one practice set"""
+    practice_set = request.practice_set or pipelines.get(request.pipeline_id or DEFAULT_PIPELINE)["practice_set"]
+    if not practice_set:
+        raise HTTPException(status_code=400, detail="No practice set provided or active.")
+    
+    results = quiz_runner.grade_many(practice_set, request.submissions)
+    
+    if request.track_progress:
+        for student_id, student_results in results["students"].items():
+            tracker.update_progress(student_id, student_results)
+    
+    return results
+
+def elapsed_ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+async def run_pipeline(pipeline_id: str, quiz: Dict[str, Any], responses: Dict[str, Any],
+                       normalized: Dict[str, Any], normalize_ms: float):
+    """
+    Diagnose -> (explain, practice) for already normalized responses. Yields
+    (stage, data) pairs as each stage finishes: "normalize" (done by the
+    caller, so bad input is rejected before any response starts),
+    "diagnose", then "explain" and "practice" (generated concurrently, in
+    whichever order they complete), each as {"result": ..., "ms": stage
+    time}, and finally "done" with the pipeline_id and per-stage timings.
+    The pipeline's state is saved as it goes, so /explain, /practice and
+    /submit_practice work on it afterwards.
+    """
+    start = time.perf_counter()
+    timings = {"normalize": normalize_ms}
+    yield "normalize", {"result": normalized, "ms": normalize_ms}
+    
+    stage_start = time.perf_counter()
+    diagnosis = await diagnostic.diagnose_async(normalized)
+    weak_concepts = diagnosis.get("weak_concepts", [])
+    timings["diagnose"] = elapsed_ms(stage_start)
+    yield "diagnose", {"result": diagnosis, "ms": timings["diagnose"]}
+    await run_in_threadpool(pipelines.update, pipeline_id, quiz=quiz, responses=responses, normalized=normalized,
+                            diagnosis=diagnosis, weak_concepts=weak_concepts)
+    
+    async def stage(name, generate, empty):
+        stage_start = time.perf_counter()
+        result = await generate(weak_concepts) if weak_concepts else empty
+        return name, result, elapsed_ms(stage_start)
+    
+    tasks = [
+        asyncio.ensure_future(stage("explain", explanation.generate_explanations_async, {"explanations": []})),
+        asyncio.ensure_future(stage("practice", practice.generate_practice_async, {"practice_set": []})),
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            name, result, ms = await next_done
+            timings[name] = ms
+            # A failed generation isn't something /submit_practice can grade against
+            if name == "practice" and weak_concepts and "error" not in result:
+                await run_in_threadpool(pipelines.update, pipeline_id, practice_set=result)
+            yield name, {"result": result, "ms": ms}
+    finally:
+        # Client went away mid-stream: don't leave generation running
+        for task in tasks:
+            task.cancel()
+    
+    timings["total"] = round(normalize_ms + elapsed_ms(start), 1)
+    yield "done", {"pipeline_id": pipeline_id, "timings_ms": timings}
+
+@app.post("/pipeline/run")
+async def pipeline_run(request: PipelineRunRequest):
+    """
+    Diagnosis, explanations and practice for one student's responses in a
+    single request, streamed as server-sent events (see run_pipeline).
+    With "stream": false, returns every stage's result and the timings as
+    one JSON object instead.
+    """
+    pipeline_id = request.pipeline_id or pipelines.new_id()
+    quiz = request.quiz or await run_in_threadpool(pipeline_quiz, pipeline_id)
+    if not quiz:
+        raise HTTPException(status_code=400, detail="No quiz provided or ingested.")
+    
+    stage_start = time.perf_counter()
+    try:
+        normalized = ingest.normalize_responses(request.responses, quiz)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    stages = run_pipeline(pipeline_id, quiz, request.responses, normalized, elapsed_ms(stage_start))
+    
+    if not request.stream:
+        response = {"pipeline_id": pipeline_id}
+        async for event, data in stages:
+            if event == "done":
+                response["timings_ms"] = data["timings_ms"]
+            else:
+                response[event] = data["result"]
+        return response
+    
+    async def events():
+        yield sse_event("pipeline", {"pipeline_id": pipeline_id})
+        async for event, data in stages:
+            yield sse_event(event, data)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/llm/stats")
+def llm_stats():
+    """Call, retry, latency and token counters per model, plus response cache hit rates"""
+    return {
+        "models": llm_client.all_stats(),
+        "response_cache": response_cache.stats(),
+        "chat_context": chat_agent.context.stats(),
+        "chat_sessions": chat_sessions.stats(),
+        "pipelines": pipelines.stats()
+    }
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format: request, model, SQLite and grading timings, cache hit rates"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/student/{student_id}/summary")
 def get_student_summary(student_id: str):
     status = tracker.get_student_status(student_id)
@@ -224,31 +462,113 @@ def get_student_summary(student_id: str):
 # --- Chat Endpoints ---
 
 @app.post("/chat/start")
-def start_chat(request: ChatStartRequest):
-    response = chat_agent.start_session(request.subject, request.difficulty, request.grade_level)
-    # Initialize session tracking if needed
+async def start_chat(request: ChatStartRequest):
+    response = await chat_agent.start_session_async(request.subject, request.difficulty, request.grade_level)
+    # Session store I/O (SQLite with CHAT_SESSION_DB_PATH) stays off the event loop
+    response["session_id"] = await run_in_threadpool(
+        open_chat_session, request.subject, request.difficulty, request.grade_level,
+        f"{response.get('message', '')} {response.get('question', '')}".strip()
+    )
     return response
 
+def open_chat_session(subject: str, difficulty: str, grade_level: str, first_message: str) -> str:
+    session_id = chat_sessions.create(subject, difficulty, grade_level)
+    chat_sessions.append(session_id, {"role": "ai", "content": first_message})
+    return session_id
+
+def chat_turn(request: ChatMessageRequest) -> Dict[str, Any]:
+    """
+    Subject, settings and history for a chat message. Clients that still send
+    their own history get it used as-is; otherwise history comes from the
+    session store (an unknown id starts a new session under that id).
+    """
+    if request.history:
+        return {
+            "subject": "General",
+            "history": request.history,
+            "difficulty": request.difficulty or "intermediate",
+            "grade_level": request.grade_level or "College Year 1",
+            "stored": False
+        }
+    
+    session = chat_sessions.get(request.session_id)
+    if session is None:
+        chat_sessions.create("General", request.difficulty or "intermediate",
+                             request.grade_level or "College Year 1", session_id=request.session_id)
+        session = chat_sessions.get(request.session_id)
+    return {
+        "subject": session["subject"],
+        "history": session["messages"],
+        "difficulty": request.difficulty or session["difficulty"],
+        "grade_level": request.grade_level or session["grade_level"],
+        "stored": True
+    }
+
+def record_chat_turn(session_id: str, message: str, response: Dict[str, Any]):
+    """Append the student's message and the tutor's reply to the stored session"""
+    if "error" in response:
+        chat_sessions.append(session_id, {"role": "user", "content": message})
+        return
+    chat_sessions.append(
+        session_id,
+        {"role": "user", "content": message},
+        {
+            "role": "ai",
+            "content": f"{response.get('feedback', '')}\n\n{response.get('next_question', '')}".strip(),
+            "is_correct": response.get("is_correct")
+        }
+    )
+
 @app.post("/chat/message")
-def chat_message(request: ChatMessageRequest):
-    # In a real app, we'd fetch history from DB using session_id
-    # Here we trust the client to send relevant history or we just use the last few
+async def chat_message(request: ChatMessageRequest):
+    turn = await run_in_threadpool(chat_turn, request)
     
-    response = chat_agent.process_response(
-        subject="General", # Ideally passed or stored in session
-        history=request.history,
+    response = await chat_agent.process_response_async(
+        subject=turn["subject"],
+        history=turn["history"],
         last_answer=request.message,
-        difficulty=request.difficulty,
-        grade_level=request.grade_level
+        difficulty=turn["difficulty"],
+        grade_level=turn["grade_level"],
+        session_id=request.session_id
     )
     
-    # Track progress immediately
-    if "is_correct" in response:
-        # Update tracker (simplified)
-        pass 
+    if turn["stored"]:
+        await run_in_threadpool(record_chat_turn, request.session_id, request.message, response)
         
     return response
 
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/message/stream")
+async def chat_message_stream(request: ChatMessageRequest):
+    """
+    /chat/message as server-sent events: "feedback_delta" events carry feedback
+    text as it is generated, then each field ("feedback", "next_question",
+    "is_correct", "concept", "difficulty") arrives as its own event once
+    complete, and "done" carries the full response.
+    """
+    turn = await run_in_threadpool(chat_turn, request)
+    
+    async def events():
+        async for event, data in chat_agent.stream_response_async(
+            subject=turn["subject"],
+            history=turn["history"],
+            last_answer=request.message,
+            difficulty=turn["difficulty"],
+            grade_level=turn["grade_level"],
+            session_id=request.session_id
+        ):
+            if event == "done" and turn["stored"]:
+                await run_in_threadpool(record_chat_turn, request.session_id, request.message, data)
+            yield sse_event(event, data)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/game/current")
 def get_current_game(user_id: int):
     """Get the current game with 1-hour cooldown"""
@@ -339,12 +659,17 @@ def submit_game(request: dict):
         raise HTTPException(status_code=500, detail="Submission failed")
 
 @app.post("/chat/analyze")
-def analyze_session(request: dict):
+async def analyze_session(request: dict):
     """
     Generate analysis from chat session
     """
     try:
-        session_data = request.get("session_data", {})
+        session_data = request.get("session_data") or {}
+        # Prefer the server-side transcript; session_data is for clients without sessions
+        session_id = request.get("session_id") or session_data.get("session_id")
+        stored = await run_in_threadpool(chat_sessions.get, session_id) if session_id else None
+        if stored and stored["messages"]:
+            session_data = stored
         messages = session_data.get("messages", [])
         difficulty = session_data.get("difficulty", "intermediate")
         subject = session_data.get("subject", "General")
@@ -365,7 +690,6 @@ def analyze_session(request: dict):
                     correct_count += 1
                 elif isinstance(is_correct, str) and is_correct.lower() == "true":
                     correct_count += 1
-            print(f"DEBUG: Calculated score - Correct: {correct_count}/{total_questions}")
         else:
             # Fallback for sessions without flags (should not happen with new frontend)
             # Count user messages as attempts
@@ -394,19 +718,22 @@ def analyze_session(request: dict):
         # Save session to database if user_id provided
         if user_id:
             try:
-                user_db.save_session(user_id, subject, difficulty, overall_score, session_data)
+                # SQLite work stays off the event loop
+                await run_in_threadpool(user_db.save_session, user_id, subject, difficulty, overall_score, session_data)
             except Exception as e:
                 print(f"Error saving session: {e}")
+                HANDLED_ERRORS.inc("save_session")
         
         # Generate AI Recommendations
         try:
             # Identify weak areas based on messages (simplified logic for now)
             # In a real app, we'd track per-question correctness
             weak_concepts = ["General Understanding"] 
-            ai_recs = chat_agent.generate_recommendations(subject, weak_concepts, difficulty)
+            ai_recs = await chat_agent.generate_recommendations_async(subject, weak_concepts, difficulty)
             recommendations = ai_recs.get("recommendations", [])
         except Exception as e:
             print(f"AI Recommendation error: {e}")
+            HANDLED_ERRORS.inc("recommendations")
             recommendations = [
                 {"title": f"{subject} Fundamentals", "channel": "Crash Course", "query": f"{subject} crash course"},
                 {"title": f"Advanced {subject} Concepts", "channel": "Khan Academy", "query": f"{subject} khan academy"},
@@ -428,6 +755,7 @@ def analyze_session(request: dict):
         }
     except Exception as e:
         print(f"Analysis error: {e}")
+        HANDLED_ERRORS.inc("analysis")
         return {
             "overall_score": 0,
             "strengths": ["Good effort", "Active participation"],
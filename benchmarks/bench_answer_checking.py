@@ -0,0 +1,76 @@
+"""
+Tiered answer checking vs. simplify-only, over a corpus of answer pairs.
+
+Runs every pair through MathSolver with and without the exact / rational /
+numeric-probe fast paths (verdict cache disabled so each check is really computed),
+asserts the verdicts are identical and reports time and the tier mix.
+
+    python benchmarks/bench_answer_checking.py
+    python benchmarks/bench_answer_checking.py --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools.math_solver import MathSolver
+from tools.lru_cache import LRUCache
+
+# (student answer, answer key) pairs in the shape practice sets produce
+CORPUS = [
+    ("4", "4"), ("4.0", "4"), ("3", "4"), ("12/3", "4"), ("-2", "2"),
+    ("5/6", "5/6"), ("10/12", "5/6"), ("2/5", "5/6"), ("0.5", "1/2"), ("0.3333", "1/3"),
+    ("x + 6", "x + 6"), ("6 + x", "x + 6"), ("x + 5", "x + 6"), ("2x + 6", "2(x + 3)"),
+    ("2x + 3", "2(x + 3)"), ("x^2 + 2x + 1", "(x + 1)^2"), ("x^2 + 1", "(x + 1)^2"),
+    ("(x - 1)(x + 1)", "x^2 - 1"), ("x^2 + 1", "x^2 - 1"), ("x + 1", "(x^2 - 1)/(x - 1)"),
+    ("3x^2 - 2x", "x(3x - 2)"), ("3x^2 + 2x", "x(3x - 2)"), ("a*b + a*c", "a(b + c)"),
+    ("2*y - 4", "2(y - 2)"), ("y - 2", "2(y - 2)"), ("1/x + 1/y", "(x + y)/(x*y)"),
+    ("sqrt(8)", "2*sqrt(2)"), ("sqrt(9)", "3"), ("sin(x)^2 + cos(x)^2", "1"),
+    ("sin(2x)", "2 sin(x) cos(x)"), ("e^x", "exp(x)"), ("log(x^2)", "2 log(x)"),
+    ("Nitrogen", "Nitrogen"), ("", "x + 6"), ("x +", "x + 6"),
+]
+
+
+def run(fast_paths, repeat):
+    # Parsing is shared by both modes; only the verdict cache is disabled
+    solver = MathSolver(parse_cache=LRUCache(4096), verdict_cache=LRUCache(0), fast_paths=fast_paths)
+    verdicts, tiers = [], Counter()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        verdicts = []
+        for student, key in CORPUS:
+            verdict, tier = solver.check_answer(student, key)
+            verdicts.append(verdict)
+            tiers[tier] += 1
+    return verdicts, time.perf_counter() - start, tiers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    baseline, base_s, _ = run(False, args.repeat)
+    tiered, tier_s, tiers = run(True, args.repeat)
+    mismatches = [CORPUS[i] for i, (a, b) in enumerate(zip(baseline, tiered)) if a != b]
+
+    result = {
+        "pairs": len(CORPUS),
+        "checks": len(CORPUS) * args.repeat,
+        "simplify_only_ms": round(base_s * 1000, 1),
+        "tiered_ms": round(tier_s * 1000, 1),
+        "speedup": round(base_s / tier_s, 1),
+        "identical_verdicts": not mismatches,
+        "mismatches": mismatches,
+        "tiers": dict(tiers),
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Model-bound routes under concurrency: async routes vs. the old sync ones.
+
+Replaces the shared model handle with a local fake that waits ``--latency``
+seconds per call (asyncio.sleep for the async API, time.sleep for the
+blocking one), then fires ``--clients`` concurrent POST /chat/start calls
+while pollers hit GET /game/current. --legacy serves the same agents through
+sync routes (the previous behaviour), where every in-flight model call holds
+one of the server's worker threads.
+
+    python benchmarks/bench_async_routes.py --clients 200
+    python benchmarks/bench_async_routes.py --clients 200 --legacy
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+REPLY = json.dumps({"message": "Hello! I'm TutorMate.", "question": "What is 2 + 2?"})
+
+
+class FakeModel:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        return SimpleNamespace(text=REPLY)
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(text=REPLY)
+
+
+def legacy_app(api):
+    """The pre-async routes: plain def handlers calling the blocking agent methods"""
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.post("/chat/start")
+    def start_chat(request: api.ChatStartRequest):
+        return api.chat_agent.start_session(request.subject, request.difficulty, request.grade_level)
+
+    app.get("/game/current")(api.get_current_game)
+    return app
+
+
+def summary(samples, elapsed=None):
+    samples = sorted(samples)
+    result = {
+        "requests": len(samples),
+        "p50_ms": round(statistics.median(samples), 1),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 1),
+        "max_ms": round(samples[-1], 1),
+    }
+    if elapsed:
+        result["throughput_rps"] = round(len(samples) / elapsed, 1)
+    return result
+
+
+async def run(clients, pollers, latency, legacy):
+    import httpx
+    import api
+    from tools import llm_client
+
+    llm_client.get_client(api.chat_agent.model_name).use_model(FakeModel(latency))
+    app = legacy_app(api) if legacy else api.app
+
+    chat_samples, game_samples = [], []
+    done = asyncio.Event()
+
+    async def chat(client):
+        start = time.perf_counter()
+        response = await client.post("/chat/start", json={"subject": "Algebra"})
+        chat_samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200 and "question" in response.json(), response.text
+
+    async def poll(client, user_id):
+        while not done.is_set():
+            start = time.perf_counter()
+            response = await client.get(f"/game/current?user_id={user_id}")
+            game_samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.text
+            await asyncio.sleep(0.01)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        polling = [asyncio.create_task(poll(client, u)) for u in range(1, pollers + 1)]
+        start = time.perf_counter()
+        await asyncio.gather(*(chat(client) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*polling)
+
+    return {
+        "mode": "sync routes" if legacy else "async routes",
+        "clients": clients,
+        "model_latency_ms": latency * 1000,
+        "wall_s": round(elapsed, 2),
+        "chat_start": summary(chat_samples, elapsed),
+        "game_current_during_load": summary(game_samples),
+        "model_calls": llm_client.get_client(api.chat_agent.model_name).stats()["calls"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200, help="concurrent /chat/start requests")
+    parser.add_argument("--pollers", type=int, default=5, help="concurrent /game/current pollers")
+    parser.add_argument("--latency", type=float, default=1.0, help="fake model latency in seconds")
+    parser.add_argument("--legacy", action="store_true", help="serve the agents through sync routes")
+    args = parser.parse_args()
+
+    # Must be set before api is imported
+    scratch = tempfile.mkdtemp()
+    os.environ["USER_DB_PATH"] = os.path.join(scratch, "bench_users.db")
+    os.environ["MEMORY_DB_PATH"] = os.path.join(scratch, "bench_memory.db")
+    os.environ["LLM_CACHE_DB_PATH"] = ""
+    os.environ["GRADING_POOL_SIZE"] = "0"
+    result = asyncio.run(run(args.clients, args.pollers, args.latency, args.legacy))
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Chat prompt size and latency vs. session length: full history vs. bounded context.
+
+Builds the /chat/message prompt for sessions of growing length, once with
+the whole client-supplied history interpolated (what a naive prompt would
+send) and once through ConversationContext, whose summary is extended
+incrementally turn by turn as a live session would. A fake model charges
+``--ms-per-1k-tokens`` on top of ``--base-ms`` so prompt size shows up as latency.
+
+    python benchmarks/bench_chat_context.py
+    python benchmarks/bench_chat_context.py --turns 10 100 1000 --keep 6 --budget 1500
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.chat_agent import ChatAgent
+from tools.chat_context import ConversationContext, estimate_tokens
+
+
+def message(i):
+    if i % 2:
+        return {"role": "user", "content": f"I think the answer is x = {i % 9}, because I subtracted both sides."}
+    return {"role": "ai", "content": f"Good try! Let's check step {i}: what happens when you divide both sides by 2? "
+                                     f"Question {i}: Solve {i % 7 + 2}x + 3 = {i % 11 + 9}."}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 100, 500, 1000])
+    parser.add_argument("--keep", type=int, default=6)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--base-ms", type=float, default=300.0)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=150.0)
+    args = parser.parse_args()
+
+    agent = ChatAgent(context=ConversationContext(keep_turns=args.keep, max_tokens=args.budget))
+    model_ms = lambda tokens: args.base_ms + args.ms_per_1k_tokens * tokens / 1000
+
+    rows = []
+    history = []
+    for turns in sorted(args.turns):
+        # Grow the live session turn by turn so the summary cache sees every step
+        while len(history) < turns:
+            history.append(message(len(history)))
+            agent._response_prompt("Algebra", history, "x = 4", "intermediate", "Class 9", session_id="bench")
+
+        full_prompt_tokens = estimate_tokens(json.dumps(history)) + 250
+        start = time.perf_counter()
+        _, context = agent._response_prompt("Algebra", history, "x = 4", "intermediate", "Class 9", session_id="bench")
+        build_ms = (time.perf_counter() - start) * 1000
+
+        rows.append({
+            "turns": turns,
+            "full_history_prompt_tokens": full_prompt_tokens,
+            "bounded_prompt_tokens": context["prompt_tokens"],
+            "summarized_turns": context["summarized_turns"],
+            "context_build_ms": round(build_ms, 3),
+            "full_history_model_ms": round(model_ms(full_prompt_tokens), 1),
+            "bounded_model_ms": round(model_ms(context["prompt_tokens"]), 1),
+        })
+
+    print(json.dumps({"keep_turns": args.keep, "budget_tokens": args.budget, "rows": rows,
+                      "context": agent.context.stats()}, indent=2))
+    return rows
+
+
+if __name__ == "__main__":
+    main()
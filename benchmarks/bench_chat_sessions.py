@@ -0,0 +1,116 @@
+"""
+Chat request bytes per session: client-shipped history vs. server-side sessions.
+
+Plays a ``--turns`` long tutoring session through /chat/start,
+/chat/message and /chat/analyze against a fake model, once the old way
+(every message carries the whole history, analyze carries the whole
+transcript) and once with server-side sessions (only the new message and
+the session_id are sent). Reports total and last-request body sizes.
+--db-path persists sessions to SQLite, as a multi-worker deployment would.
+
+    python benchmarks/bench_chat_sessions.py --turns 10 50 200
+    python benchmarks/bench_chat_sessions.py --turns 200 --db-path /tmp/sessions.db
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ANSWER = "I think the answer is x = 4, because I subtracted 3 from both sides and divided by 2."
+
+
+class FakeModel:
+    async def generate_content_async(self, prompt):
+        if "next_question" in prompt:
+            reply = {"feedback": "Good work, that is right. Dividing both sides keeps the equation balanced.",
+                     "next_question": "Now solve 3x + 5 = 20. What is x?",
+                     "is_correct": True, "concept": "Linear equations", "difficulty": "intermediate"}
+        elif "recommendations" in prompt:
+            reply = {"recommendations": []}
+        else:
+            reply = {"message": "Hello! I'm TutorMate.", "question": "Solve 2x + 3 = 11."}
+        return SimpleNamespace(text=json.dumps(reply))
+
+
+async def play(client, turns, legacy):
+    sent = []
+
+    async def post(path, body):
+        payload = json.dumps(body).encode("utf-8")
+        sent.append(len(payload))
+        response = await client.post(path, content=payload, headers={"content-type": "application/json"})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    start = await post("/chat/start", {"subject": "Algebra"})
+    session_id = start["session_id"]
+    history = [{"role": "ai", "content": f"{start['message']} {start['question']}"}]
+
+    begin = time.perf_counter()
+    for _ in range(turns):
+        if legacy:
+            reply = await post("/chat/message", {"session_id": session_id, "message": ANSWER, "history": history})
+        else:
+            reply = await post("/chat/message", {"session_id": session_id, "message": ANSWER})
+        history.append({"role": "user", "content": ANSWER})
+        history.append({"role": "ai", "content": f"{reply['feedback']}\n\n{reply['next_question']}",
+                        "is_correct": reply["is_correct"]})
+    elapsed = time.perf_counter() - begin
+
+    if legacy:
+        analysis = await post("/chat/analyze", {"session_data": {"subject": "Algebra", "messages": history}})
+    else:
+        analysis = await post("/chat/analyze", {"session_id": session_id})
+    assert analysis["overall_score"] == 100, analysis
+
+    return {
+        "mode": "client history" if legacy else "server sessions",
+        "turns": turns,
+        "request_bytes_total": sum(sent),
+        "last_message_bytes": sent[-2],
+        "analyze_bytes": sent[-1],
+        "ms_per_message": round(elapsed * 1000 / turns, 2),
+    }
+
+
+async def run(turns_list):
+    import httpx
+    import api
+    from tools import llm_client
+
+    llm_client.get_client(api.chat_agent.model_name).use_model(FakeModel())
+    rows = []
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for turns in turns_list:
+            for legacy in (True, False):
+                rows.append(await play(client, turns, legacy))
+    return {"rows": rows, "chat_sessions": api.chat_sessions.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--db-path", default="", help="persist sessions to this SQLite file")
+    args = parser.parse_args()
+
+    # Must be set before api is imported
+    scratch = tempfile.mkdtemp()
+    os.environ["USER_DB_PATH"] = os.path.join(scratch, "bench_users.db")
+    os.environ["MEMORY_DB_PATH"] = os.path.join(scratch, "bench_memory.db")
+    os.environ["LLM_CACHE_DB_PATH"] = ""
+    os.environ["GRADING_POOL_SIZE"] = "0"
+    os.environ["CHAT_SESSION_DB_PATH"] = args.db_path
+    result = asyncio.run(run(args.turns))
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Time to first byte for /chat/message vs. the SSE /chat/message/stream.
+
+A fake model produces the chat reply token by token: ``--first-token``
+seconds before the first chunk, then ``--per-token`` seconds per chunk.
+Both routes are driven through the real app in-process at the ASGI level
+(httpx's ASGI transport buffers whole bodies, which would hide streaming);
+the non-streaming route only answers once the whole reply is generated.
+
+    python benchmarks/bench_chat_stream.py
+    python benchmarks/bench_chat_stream.py --clients 50 --first-token 0.4 --per-token 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+REPLY = json.dumps({
+    "feedback": "Nice work! You isolated x correctly by subtracting 3 from both sides and then dividing by 2, "
+                "which gives x = 4. Remember to check by substituting back into the original equation.",
+    "next_question": "Solve 3x - 5 = 10.",
+    "is_correct": True,
+    "concept": "Linear Equations",
+    "difficulty": "intermediate",
+})
+
+
+class FakeStreamingModel:
+    def __init__(self, first_token, per_token, chunk_size=4):
+        self.first_token = first_token
+        self.per_token = per_token
+        self.chunks = [REPLY[i:i + chunk_size] for i in range(0, len(REPLY), chunk_size)]
+
+    async def _stream(self):
+        await asyncio.sleep(self.first_token)
+        for chunk in self.chunks:
+            yield SimpleNamespace(text=chunk)
+            await asyncio.sleep(self.per_token)
+
+    async def generate_content_async(self, prompt, stream=False):
+        if stream:
+            return self._stream()
+        text = "".join([chunk.text async for chunk in self._stream()])
+        return SimpleNamespace(text=text)
+
+
+async def measure(app, path):
+    """Drive the ASGI app directly and timestamp each body chunk as it is sent"""
+    body = json.dumps({"session_id": "bench", "message": "x = 4", "history": []}).encode()
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+             "client": ("bench", 1), "server": ("bench", 80)}
+    received = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    start = time.perf_counter()
+    first_byte = first_feedback = None
+    status = None
+
+    async def send(message):
+        nonlocal first_byte, first_feedback, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            now = time.perf_counter() - start
+            if chunk and first_byte is None:
+                first_byte = now
+            if first_feedback is None and (b"feedback_delta" in chunk or b'"feedback"' in chunk):
+                first_feedback = now
+
+    await app(scope, receive, send)
+    finished.set()
+    assert status == 200
+    return first_byte * 1000, (first_feedback or first_byte) * 1000, (time.perf_counter() - start) * 1000
+
+
+def summary(samples):
+    return {"p50_ms": round(statistics.median(samples), 1), "max_ms": round(max(samples), 1)}
+
+
+async def run(clients, first_token, per_token):
+    import api
+    from tools import llm_client
+
+    llm_client.get_client(api.chat_agent.model_name).use_model(FakeStreamingModel(first_token, per_token))
+
+    result = {"clients": clients, "first_token_ms": first_token * 1000, "per_token_ms": per_token * 1000,
+              "reply_chunks": len(FakeStreamingModel(0, 0).chunks)}
+    for path in ("/chat/message", "/chat/message/stream"):
+        samples = await asyncio.gather(*(measure(api.app, path) for _ in range(clients)))
+        result[path] = {
+            "ttfb": summary([s[0] for s in samples]),
+            "first_feedback_text": summary([s[1] for s in samples]),
+            "complete": summary([s[2] for s in samples]),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--first-token", type=float, default=0.5, help="seconds before the first chunk")
+    parser.add_argument("--per-token", type=float, default=0.01, help="seconds between chunks")
+    args = parser.parse_args()
+
+    # Must be set before api is imported
+    scratch = tempfile.mkdtemp()
+    os.environ["USER_DB_PATH"] = os.path.join(scratch, "bench_users.db")
+    os.environ["MEMORY_DB_PATH"] = os.path.join(scratch, "bench_memory.db")
+    os.environ["LLM_CACHE_DB_PATH"] = ""
+    os.environ["GRADING_POOL_SIZE"] = "0"
+    result = asyncio.run(run(args.clients, args.first_token, args.per_token))
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
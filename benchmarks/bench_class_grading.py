@@ -0,0 +1,93 @@
+"""
+Grading a whole class on one practice set.
+
+Each simulated student answers the same set with a mix of exact, equivalent
+and wrong answers drawn from a small pool (as real classes do). Compares the
+class total against 500x a single cold grading; --no-cache disables the
+shared MathSolver caches.
+
+    python benchmarks/bench_class_grading.py --students 500
+    python benchmarks/bench_class_grading.py --students 500 --no-cache
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.quiz_runner import QuizRunner
+from tools import math_solver
+from tools.lru_cache import LRUCache
+
+QUESTIONS = [
+    ("Simplify 2(x + 3)", "2*x + 6", ["2x + 6", "2*(x+3)", "2x + 3", "x + 6"]),
+    ("Expand (x + 1)^2", "x^2 + 2x + 1", ["(x+1)^2", "x^2 + 1", "x**2 + 2*x + 1", "2x + 1"]),
+    ("Solve 3x = 12 for x", "4", ["4", "4.0", "3", "12/3"]),
+    ("Simplify (x^2 - 1)/(x - 1)", "x + 1", ["x + 1", "1 + x", "x - 1", "x"]),
+    ("Compute 1/2 + 1/3", "5/6", ["5/6", "0.8333333333333334", "2/5", "10/12"]),
+]
+
+
+def make_practice_set(repeat=4):
+    questions = []
+    for r in range(repeat):
+        for text, answer, _ in QUESTIONS:
+            questions.append({"question": f"[{r}] {text}", "answer": answer})
+    return {"practice_set": [{"concept": "Algebra", "questions": questions}]}
+
+
+def make_class(practice_set, students, seed=7):
+    rng = random.Random(seed)
+    pool = {f"[{r}] {text}": options for r in range(4) for text, _, options in QUESTIONS}
+    return [
+        {q["question"]: rng.choice(pool[q["question"]]) for q in practice_set["practice_set"][0]["questions"]}
+        for _ in range(students)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    if args.no_cache:
+        math_solver.PARSE_CACHE = LRUCache(maxsize=0)
+        math_solver.VERDICT_CACHE = LRUCache(maxsize=0)
+
+    practice_set = make_practice_set()
+    answers = make_class(practice_set, args.students)
+
+    # One cold student on fresh caches, as the per-student baseline
+    solo = QuizRunner()
+    solo.math_solver.parse_cache = LRUCache(maxsize=0 if args.no_cache else 4096)
+    solo.math_solver.verdict_cache = LRUCache(maxsize=0 if args.no_cache else 65536)
+    start = time.perf_counter()
+    solo.grade_quiz(practice_set, answers[0])
+    single_s = time.perf_counter() - start
+
+    # A fresh QuizRunner per student still shares the module-level caches
+    start = time.perf_counter()
+    for student_answers in answers:
+        QuizRunner().grade_quiz(practice_set, student_answers)
+    class_s = time.perf_counter() - start
+
+    result = {
+        "caching": not args.no_cache,
+        "students": args.students,
+        "questions": len(practice_set["practice_set"][0]["questions"]),
+        "single_student_ms": round(single_s * 1000, 1),
+        "class_total_ms": round(class_s * 1000, 1),
+        "naive_estimate_ms": round(single_s * 1000 * args.students, 1),
+        "speedup_vs_naive": round(single_s * args.students / class_s, 1),
+        "cache": QuizRunner().math_solver.cache_stats(),
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
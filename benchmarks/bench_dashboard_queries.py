@@ -0,0 +1,134 @@
+"""
+Dashboard query latency vs. sessions table size.
+
+Fills a scratch database with sessions spread over many users, rebuilds
+the materialized user_stats / user_subject_stats rows from them (raw
+inserts bypass save_session, which normally keeps them current), then
+times the two reads behind /dashboard/{user_id} for one user with a fixed
+history:
+
+- stats: get_user_stats, primary-key reads of the materialized summaries;
+  independent of table size and of the sessions indexes
+- recent: get_user_sessions(limit=5), which uses the (user_id,
+  completed_at) index; run with --drop-indexes to see its full-scan baseline
+
+For reference, "full_scan_streak" times the pre-materialization streak
+calculation over the user's whole history.
+
+    python benchmarks/bench_dashboard_queries.py --sizes 10000 100000 1000000
+    python benchmarks/bench_dashboard_queries.py --sizes 10000000   # slow to build
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools.user_database import UserDatabase
+
+SUBJECTS = ["Math", "Science", "History", "English"]
+TARGET_USER = 1
+TARGET_SESSIONS = 200
+CREATE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_sessions_user_completed ON sessions (user_id, completed_at)"
+
+
+def fill_sessions(db, total_rows, users=10000, batch=50000):
+    """Insert total_rows sessions; TARGET_USER always gets TARGET_SESSIONS of them"""
+    with db._get_conn() as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        remaining = total_rows - existing
+        rows = []
+        for i in range(remaining):
+            user_id = TARGET_USER if existing + i < TARGET_SESSIONS else random.randint(2, users)
+            day = random.randint(0, 365)
+            rows.append((
+                user_id,
+                random.choice(SUBJECTS),
+                "intermediate",
+                random.randint(0, 100),
+                "2025-01-01 00:00:00",
+                day,
+            ))
+            if len(rows) >= batch:
+                _insert(conn, rows)
+                rows = []
+        if rows:
+            _insert(conn, rows)
+
+
+def _insert(conn, rows):
+    conn.executemany(
+        """INSERT INTO sessions (user_id, subject, difficulty, score, completed_at, session_data)
+           VALUES (?, ?, ?, ?, datetime(?, '+' || ? || ' days'), '{}')""",
+        rows
+    )
+    conn.commit()
+
+
+def time_call(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def time_dashboard(db, repeats):
+    stats = db.get_user_stats(TARGET_USER)
+    # Guard against timing an empty summary row
+    assert stats["total_sessions"] == TARGET_SESSIONS, stats
+    return {
+        "stats": time_call(lambda: db.get_user_stats(TARGET_USER), repeats),
+        "recent": time_call(lambda: db.get_user_sessions(TARGET_USER, limit=5), repeats),
+        "full_scan_streak": time_call(lambda: db.calculate_streak_full_scan(TARGET_USER), repeats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--drop-indexes", action="store_true", help="measure the unindexed baseline")
+    parser.add_argument("--db", help="scratch database path (default: temp file)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "bench_users.db")
+    db = UserDatabase(db_path=db_path)
+
+    results = []
+    for size in sorted(args.sizes):
+        build_start = time.perf_counter()
+        fill_sessions(db, size)
+        build_s = time.perf_counter() - build_start
+        with db._get_conn() as conn:
+            # The rebuild scans per user, so it always runs with the index
+            conn.execute(CREATE_INDEX_SQL)
+        rebuild_start = time.perf_counter()
+        db.rebuild_stats()
+        rebuild_s = time.perf_counter() - rebuild_start
+        if args.drop_indexes:
+            with db._get_conn() as conn:
+                conn.execute("DROP INDEX IF EXISTS idx_sessions_user_completed")
+        timings = time_dashboard(db, args.repeats)
+        result = {"sessions": size, "indexed": not args.drop_indexes, "build_s": round(build_s, 1),
+                  "rebuild_stats_s": round(rebuild_s, 1), **timings}
+        results.append(result)
+        print(json.dumps(result))
+
+    db.close()
+    return results
+
+
+if __name__ == "__main__":
+    main()
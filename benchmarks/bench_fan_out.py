@@ -0,0 +1,96 @@
+"""
+Explanation/practice generation: one prompt for all concepts vs. per-concept fan-out.
+
+A fake model answers after ``--base-ms`` plus ``--ms-per-concept`` for
+every concept named in the prompt (output length grows with the number of
+concepts) and fails a reply with probability ``--failure-rate``. For each
+concept count the script times a combined call and a fan-out call, counts
+the concepts that came back, then asks again with one extra concept to
+show that only the new one goes to the model.
+
+    python benchmarks/bench_fan_out.py
+    python benchmarks/bench_fan_out.py --concepts 1 4 8 --concurrency 4 --failure-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.practice_agent import PracticeAgent
+from tools.llm_client import LLMClient
+from tools.response_cache import ResponseCache
+
+
+class FakeModel:
+    def __init__(self, base_ms, ms_per_concept, failure_rate, seed=0):
+        self.base_ms = base_ms
+        self.ms_per_concept = ms_per_concept
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        concepts = re.search(r"weak concepts: (.+)", prompt).group(1).split(", ")
+        await asyncio.sleep((self.base_ms + self.ms_per_concept * len(concepts)) / 1000)
+        if self.rng.random() < self.failure_rate:
+            return SimpleNamespace(text='{"practice_set": [{"concept": "truncated...')
+        return SimpleNamespace(text=json.dumps({"practice_set": [
+            {"concept": concept, "questions": [{"question": f"{concept} Q1", "answer": "1"}]} for concept in concepts
+        ]}))
+
+
+async def timed(agent, concepts):
+    start = time.perf_counter()
+    result = await agent.generate_practice_async(concepts)
+    return (time.perf_counter() - start) * 1000, len(result.get("practice_set", []))
+
+
+async def run(args):
+    rows = []
+    for n in args.concepts:
+        concepts = [{"concept": f"Concept {i}"} for i in range(n)]
+        row = {"concepts": n}
+        for fan_out in (False, True):
+            model = FakeModel(args.base_ms, args.ms_per_concept, args.failure_rate)
+            agent = PracticeAgent("models/bench-fan-out", cache=ResponseCache(db_path=None),
+                                  fan_out=fan_out, max_concurrency=args.concurrency)
+            agent.llm = LLMClient("models/bench-fan-out", max_retries=0, model=model)
+
+            mode = "fan_out" if fan_out else "single_call"
+            latency, returned = await timed(agent, concepts)
+            calls_before = model.calls
+            warm_latency, _ = await timed(agent, concepts + [{"concept": "New concept"}])
+            row[mode] = {
+                "ms": round(latency, 1),
+                "concepts_returned": returned,
+                "plus_one_concept_ms": round(warm_latency, 1),
+                "plus_one_concept_model_calls": model.calls - calls_before,
+            }
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concepts", type=int, nargs="+", default=[1, 3, 6, 10])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--base-ms", type=float, default=400.0)
+    parser.add_argument("--ms-per-concept", type=float, default=600.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args))
+    print(json.dumps({"concurrency": args.concurrency, "failure_rate": args.failure_rate, "rows": rows}, indent=2))
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+GET /game/current latency under many concurrent pollers.
+
+Drives the real FastAPI app in-process against a scratch users database.
+--legacy re-adds the per-call CREATE TABLE IF NOT EXISTS game_attempts that
+the game methods used to run, for a before/after comparison.
+
+    python benchmarks/bench_game_polling.py --pollers 1000
+    python benchmarks/bench_game_polling.py --pollers 1000 --legacy
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+LEGACY_DDL = '''
+    CREATE TABLE IF NOT EXISTS game_attempts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        window_id INTEGER NOT NULL,
+        score INTEGER,
+        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+'''
+
+
+def patch_legacy(user_db):
+    """Run the old lazy DDL before every game query"""
+    original = user_db.get_last_game_attempt
+
+    def get_last_game_attempt(user_id):
+        with user_db._get_conn() as conn:
+            conn.execute(LEGACY_DDL)
+            return original(user_id)
+
+    user_db.get_last_game_attempt = get_last_game_attempt
+
+
+async def poll(client, user_id, rounds, samples):
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = await client.get(f"/game/current?user_id={user_id}")
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+
+
+async def run(pollers, rounds, legacy):
+    import httpx
+    import api
+
+    if legacy:
+        patch_legacy(api.user_db)
+
+    # Half the pollers have a recent attempt so both cooldown branches run
+    window_id = api.game_service.get_current_game()["window_id"]
+    for user_id in range(1, pollers + 1, 2):
+        api.user_db.record_game_attempt(user_id, window_id, 66)
+
+    samples = []
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(poll(client, u, rounds, samples) for u in range(1, pollers + 1)))
+        elapsed = time.perf_counter() - start
+
+    samples.sort()
+    return {
+        "mode": "legacy" if legacy else "current",
+        "pollers": pollers,
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 2),
+        "p99_ms": round(samples[int(len(samples) * 0.99) - 1], 2),
+        "pool": api.user_db.get_pool_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pollers", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3, help="requests per poller")
+    parser.add_argument("--legacy", action="store_true", help="re-run CREATE TABLE on every poll")
+    args = parser.parse_args()
+
+    # Must be set before api is imported
+    os.environ["USER_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench_users.db")
+    result = asyncio.run(run(args.pollers, args.rounds, args.legacy))
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Bulk class grading throughput: QuizRunner.grade_many vs. per-student grade_quiz.
+
+Simulates N students answering one practice set, each answer drawn from a
+small pool of plausible right and wrong answers, and grades them in one
+batch. Caches are reset between modes so each starts cold.
+
+    python benchmarks/bench_grade_batch.py --students 1000 --questions 20
+    python benchmarks/bench_grade_batch.py --students 1000 --questions 20 --pool 4
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.quiz_runner import QuizRunner
+from tools.lru_cache import LRUCache
+
+
+def make_set(questions, seed=3):
+    rng = random.Random(seed)
+    items, options = [], {}
+    for i in range(questions):
+        a, b = rng.randint(2, 9), rng.randint(1, 9)
+        text = f"Q{i}: expand {a}(x + {b})"
+        key = f"{a}x + {a * b}"
+        items.append({"question": text, "answer": key})
+        options[text] = [key, f"{a}*(x+{b})", f"{a * b} + {a}x", f"{a}x + {b}", f"x + {a * b}", f"{a}x+{a*b}"]
+    return {"practice_set": [{"concept": "Distributive Property", "questions": items}]}, options
+
+
+def make_submissions(options, students, seed=11):
+    rng = random.Random(seed)
+    return {f"student_{n}": {q: rng.choice(opts) for q, opts in options.items()} for n in range(students)}
+
+
+def fresh_runner(pool):
+    runner = QuizRunner(grading_pool=pool)
+    runner.math_solver.verdict_cache = LRUCache(65536)
+    runner.math_solver.parse_cache = LRUCache(4096)
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--pool", type=int, default=0, help="GradingPool workers (0 = in-process)")
+    args = parser.parse_args()
+
+    pool = None
+    if args.pool:
+        from tools.grading_pool import GradingPool
+        pool = GradingPool(size=args.pool)
+
+    practice_set, options = make_set(args.questions)
+    submissions = make_submissions(options, args.students)
+
+    start = time.perf_counter()
+    batch = fresh_runner(pool).grade_many(practice_set, submissions)
+    batch_s = time.perf_counter() - start
+
+    # Per-student loop without a shared verdict cache: the cost grade_many avoids
+    sample = dict(list(submissions.items())[:50])
+    start = time.perf_counter()
+    for answers in sample.values():
+        fresh_runner(pool).grade_quiz(practice_set, answers)
+    per_student_s = (time.perf_counter() - start) / len(sample)
+
+    result = {
+        "students": args.students,
+        "questions": args.questions,
+        "pool_workers": args.pool,
+        "answers_graded": batch["total_checks"],
+        "distinct_checks": batch["distinct_checks"],
+        "batch_ms": round(batch_s * 1000, 1),
+        "answers_per_s": round(batch["total_checks"] / batch_s, 1),
+        "students_per_s": round(args.students / batch_s, 1),
+        "uncached_per_student_ms": round(per_student_s * 1000, 1),
+        "uncached_estimate_ms": round(per_student_s * 1000 * args.students, 1),
+    }
+    print(json.dumps(result, indent=2))
+    if pool:
+        pool.close()
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+MemoryBank.update_concept_mastery cost as one concept's history grows.
+
+Seeds a scratch database with N past events for a single (student, concept)
+and times further updates. Event-log storage keeps the per-update cost flat;
+--legacy replays the old read-modify-write of the JSON history array.
+
+    python benchmarks/bench_mastery_updates.py --events 0 1000 5000 10000
+    python benchmarks/bench_mastery_updates.py --events 0 1000 5000 10000 --legacy
+"""
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools.memory_bank import MemoryBank
+
+STUDENT, CONCEPT = "bench_student", "Linear Functions"
+
+
+def seed(memory, count, legacy):
+    conn = sqlite3.connect(memory.db_path)
+    now = datetime.datetime.now().isoformat()
+    if legacy:
+        history = [{"timestamp": now, "score_delta": 0.1, "mistake": None}] * count
+        conn.execute(
+            "INSERT OR REPLACE INTO concept_mastery VALUES (?, ?, 0.5, ?, NULL, ?)",
+            (STUDENT, CONCEPT, now, json.dumps(history))
+        )
+    else:
+        conn.execute("DELETE FROM mastery_events")
+        conn.executemany(
+            "INSERT INTO mastery_events (student_id, concept_id, ts, delta, mistake) VALUES (?, ?, ?, 0.1, NULL)",
+            [(STUDENT, CONCEPT, now)] * count
+        )
+    conn.commit()
+    conn.close()
+
+
+def legacy_update(memory, score_delta, mistake_summary=None):
+    """The pre-event-log implementation, kept here for comparison only"""
+    conn = sqlite3.connect(memory.db_path)
+    cursor = conn.cursor()
+    cursor.execute('SELECT mastery_score, history FROM concept_mastery WHERE student_id=? AND concept_id=?', (STUDENT, CONCEPT))
+    row = cursor.fetchone()
+    history = json.loads(row[1]) if row and row[1] else []
+    new_score = max(0.0, min(1.0, (row[0] if row else 0.0) + score_delta))
+    history.append({"timestamp": datetime.datetime.now().isoformat(), "score_delta": score_delta, "mistake": mistake_summary})
+    cursor.execute(
+        "INSERT OR REPLACE INTO concept_mastery (student_id, concept_id, mastery_score, last_practiced, last_mistake, history) VALUES (?, ?, ?, ?, ?, ?)",
+        (STUDENT, CONCEPT, new_score, datetime.datetime.now().isoformat(), mistake_summary, json.dumps(history))
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, nargs="+", default=[0, 1000, 5000, 10000])
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--legacy", action="store_true", help="time the old JSON-history implementation")
+    args = parser.parse_args()
+
+    results = []
+    for count in args.events:
+        memory = MemoryBank(db_path=os.path.join(tempfile.mkdtemp(), "bench_memory.db"))
+        seed(memory, count, args.legacy)
+        samples = []
+        for i in range(args.updates):
+            delta = 0.1 if i % 2 else -0.05
+            start = time.perf_counter()
+            if args.legacy:
+                legacy_update(memory, delta)
+            else:
+                memory.update_concept_mastery(STUDENT, CONCEPT, delta)
+            samples.append((time.perf_counter() - start) * 1000)
+        result = {
+            "mode": "legacy" if args.legacy else "event_log",
+            "prior_events": count,
+            "p50_ms": round(statistics.median(samples), 3),
+            "max_ms": round(max(samples), 3),
+        }
+        results.append(result)
+        print(json.dumps(result))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Concurrent MemoryBank writers: lock errors and writes per second.
+
+Many threads submit practice-set updates at once, as parallel
+/submit_practice calls do. --legacy uses the old access pattern (a fresh
+rollback-journal connection per call with the default timeout) for
+comparison.
+
+    python benchmarks/bench_memory_concurrency.py --threads 32 --writes 50
+    python benchmarks/bench_memory_concurrency.py --threads 32 --writes 50 --legacy
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools.memory_bank import MemoryBank
+
+
+class LegacyMemoryBank(MemoryBank):
+    """MemoryBank opening a new default-mode connection per call, as it used to"""
+
+    def _init_db(self):
+        super()._init_db()
+        with self._get_conn() as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+
+    @contextmanager
+    def _get_conn(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def run(memory, threads, writes, questions):
+    errors = []
+    updates = [(f"Concept {q % 4}", 0.1 if q % 2 else -0.05, None) for q in range(questions)]
+
+    def writer(n):
+        for i in range(writes):
+            try:
+                memory.update_concept_mastery_many(f"student_{(n + i) % 8}", updates)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    total = threads * writes
+    return {
+        "mode": "legacy" if isinstance(memory, LegacyMemoryBank) else "pooled_wal",
+        "threads": threads,
+        "transactions": total,
+        "lock_errors": len(errors),
+        "transactions_per_s": round((total - len(errors)) / elapsed, 1),
+        "events_per_s": round((total - len(errors)) * questions / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=50, help="transactions per thread")
+    parser.add_argument("--questions", type=int, default=20, help="graded questions per transaction")
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    bank = LegacyMemoryBank if args.legacy else MemoryBank
+    memory = bank(db_path=os.path.join(tempfile.mkdtemp(), "bench_memory.db"))
+    result = run(memory, args.threads, args.writes, args.questions)
+    print(json.dumps(result))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Cost of the /metrics instrumentation on hot paths.
+
+Times the same calls with and without their metrics wrapper: a bare
+histogram observation, a cached MathSolver check (the cheapest
+instrumented call), a UserDatabase read on a temporary database, and a
+trivial FastAPI route with and without MetricsMiddleware. Reports the
+added microseconds per call, then how long rendering /metrics takes.
+
+    python benchmarks/bench_metrics.py
+    python benchmarks/bench_metrics.py --calls 200000 --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools import metrics
+from tools.math_solver import MathSolver
+from tools.user_database import UserDatabase
+
+
+def per_call_us(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) * 1e6 / calls
+
+
+def compare(instrumented, bare, calls):
+    # Warm up caches and first-use series
+    instrumented()
+    bare()
+    with_metrics = per_call_us(instrumented, calls)
+    without = per_call_us(bare, calls)
+    return {"bare_us": round(without, 3), "instrumented_us": round(with_metrics, 3),
+            "overhead_us": round(with_metrics - without, 3)}
+
+
+async def request_overhead(requests):
+    import httpx
+    from fastapi import FastAPI
+
+    def make_app(instrumented):
+        app = FastAPI()
+        if instrumented:
+            app.add_middleware(metrics.MetricsMiddleware)
+
+        @app.get("/ping/{item}")
+        def ping(item: str):
+            return {"item": item}
+        return app
+
+    result = {}
+    for name, instrumented in (("bare", False), ("instrumented", True)):
+        transport = httpx.ASGITransport(app=make_app(instrumented))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.get("/ping/warm")
+            start = time.perf_counter()
+            for i in range(requests):
+                await client.get(f"/ping/{i}")
+            result[f"{name}_us"] = round((time.perf_counter() - start) * 1e6 / requests, 1)
+    result["overhead_us"] = round(result["instrumented_us"] - result["bare_us"], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    hist = metrics.histogram("bench_observe_seconds", "bench_metrics.py observations", ("label",))
+    solver = MathSolver()
+    user_db = UserDatabase(db_path=os.path.join(tempfile.mkdtemp(), "bench_users.db"))
+    user_id = user_db.register_user("Bench", "bench@example.com", "secret")["user_id"]
+
+    result = {
+        "observe": {"us": round(per_call_us(lambda: hist.observe(0.01, "x"), args.calls), 3)},
+        "math_solver_cached_check": compare(
+            lambda: solver.check_many([("2*x", "x*2")]),
+            lambda: MathSolver.check_many.__wrapped__(solver, [("2*x", "x*2")]),
+            args.calls),
+        "user_db_get_user_stats": compare(
+            lambda: user_db.get_user_stats(user_id),
+            lambda: UserDatabase.get_user_stats.__wrapped__(user_db, user_id),
+            max(args.calls // 20, 1)),
+        "http_request": asyncio.run(request_overhead(args.requests)),
+    }
+    start = time.perf_counter()
+    text = metrics.render()
+    result["render"] = {"ms": round((time.perf_counter() - start) * 1000, 3), "lines": text.count("\n")}
+    user_db.close()
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
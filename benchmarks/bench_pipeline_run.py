@@ -0,0 +1,160 @@
+"""
+Diagnose -> explain -> practice: sequential round trips vs. POST /pipeline/run.
+
+The old frontend flow is POST /ingest/responses, POST /diagnose, GET
+/explain, GET /practice one after another, each paying ``--rtt-ms`` of
+network round trip on top of its model call. /pipeline/run takes the quiz
+and responses in one request and streams each stage as it finishes, with
+explanations and practice generated concurrently. A fake model answers
+diagnosis, explanation and practice prompts after ``--diagnose-ms``,
+``--explain-ms`` and ``--practice-ms``. The stream is driven at the ASGI
+level so the time each stage's event is sent is measured.
+
+    python benchmarks/bench_pipeline_run.py
+    python benchmarks/bench_pipeline_run.py --clients 20 --rtt-ms 80
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+QUIZ = {"quiz_id": "bench", "questions": [
+    {"id": f"q{i}", "text": f"Question {i}", "correct_answer": "4", "concepts": [f"Concept {i}"]} for i in range(3)
+]}
+RESPONSES = {"student_id": "s1", "responses": [{"question_id": f"q{i}", "answer": "5"} for i in range(3)]}
+
+
+class FakeModel:
+    def __init__(self, diagnose_ms, explain_ms, practice_ms):
+        self.diagnose_ms = diagnose_ms
+        self.explain_ms = explain_ms
+        self.practice_ms = practice_ms
+
+    async def generate_content_async(self, prompt):
+        if "diagnostician" in prompt:
+            await asyncio.sleep(self.diagnose_ms / 1000)
+            reply = {"weak_concepts": [{"concept": f"Concept {i}", "confidence": 0.9} for i in range(3)]}
+        elif "Explain the following concepts" in prompt:
+            await asyncio.sleep(self.explain_ms / 1000)
+            reply = {"explanations": [{"concept": "Concept", "text": "...", "analogy": "..."}]}
+        else:
+            await asyncio.sleep(self.practice_ms / 1000)
+            reply = {"practice_set": [{"concept": "Concept", "questions": [{"question": "2 + 2", "answer": "4"}]}]}
+        return SimpleNamespace(text=json.dumps(reply))
+
+
+async def round_trips(client, rtt, n):
+    """The old flow; returns ms until diagnosis and until practice are in hand"""
+    start = time.perf_counter()
+    pipeline = {"pipeline_id": f"legacy-{n}"}
+
+    async def call(method, path, **kwargs):
+        await asyncio.sleep(rtt)
+        response = await client.request(method, path, params=pipeline, **kwargs)
+        assert response.status_code == 200, response.text
+        return (time.perf_counter() - start) * 1000
+
+    await call("POST", "/ingest/responses", files={"file": ("responses.json", json.dumps(RESPONSES))})
+    diagnosed = await call("POST", "/diagnose")
+    await call("GET", "/explain")
+    practice = await call("GET", "/practice")
+    return {"diagnosis": diagnosed, "practice": practice, "all": practice}
+
+
+async def pipeline_run(app, rtt):
+    """One streamed /pipeline/run; returns ms until each stage's event was sent"""
+    body = json.dumps({"quiz": QUIZ, "responses": RESPONSES}).encode()
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "scheme": "http", "path": "/pipeline/run", "raw_path": b"/pipeline/run", "query_string": b"",
+             "root_path": "", "client": ("bench", 1), "server": ("bench", 80),
+             "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]}
+    received = False
+    finished = asyncio.Event()
+    seen = {}
+    timings = {}
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    start = time.perf_counter()
+
+    async def send(message):
+        if message["type"] != "http.response.body":
+            return
+        # Half a round trip each way
+        now = (time.perf_counter() - start + rtt / 2) * 1000
+        for block in message.get("body", b"").decode().split("\n\n"):
+            if block.startswith("event: "):
+                event, data = block[len("event: "):].split("\ndata: ", 1)
+                seen.setdefault(event, now)
+                if event == "done":
+                    timings.update(json.loads(data)["timings_ms"])
+
+    await asyncio.sleep(rtt / 2)
+    await app(scope, receive, send)
+    finished.set()
+    return {"diagnosis": seen["diagnose"], "practice": seen["practice"], "all": seen["done"]}, timings
+
+
+def summary(samples, key):
+    return round(statistics.median(sample[key] for sample in samples), 1)
+
+
+async def run(args):
+    import httpx
+    import api
+    from tools import llm_client
+
+    llm_client.get_client(api.diagnostic.model_name).use_model(
+        FakeModel(args.diagnose_ms, args.explain_ms, args.practice_ms))
+    await api.run_in_threadpool(api.pipelines.update, api.DEFAULT_PIPELINE, quiz=QUIZ)
+    rtt = args.rtt_ms / 1000
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        legacy = await asyncio.gather(*(round_trips(client, rtt, n) for n in range(args.clients)))
+    # Fresh cache so the combined run generates everything again
+    api.response_cache.clear()
+    combined = await asyncio.gather(*(pipeline_run(api.app, rtt) for _ in range(args.clients)))
+
+    result = {"clients": args.clients, "rtt_ms": args.rtt_ms}
+    for name, samples in (("round_trips", legacy), ("pipeline_run", [c[0] for c in combined])):
+        result[name] = {f"{key}_p50_ms": summary(samples, key) for key in ("diagnosis", "practice", "all")}
+    result["pipeline_run"]["stage_timings_ms"] = combined[0][1]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--rtt-ms", type=float, default=50.0)
+    parser.add_argument("--diagnose-ms", type=float, default=1500.0)
+    parser.add_argument("--explain-ms", type=float, default=1200.0)
+    parser.add_argument("--practice-ms", type=float, default=2000.0)
+    args = parser.parse_args()
+
+    # Must be set before api is imported
+    scratch = tempfile.mkdtemp()
+    os.environ["USER_DB_PATH"] = os.path.join(scratch, "bench_users.db")
+    os.environ["MEMORY_DB_PATH"] = os.path.join(scratch, "bench_memory.db")
+    os.environ["LLM_CACHE_DB_PATH"] = ""
+    os.environ["GRADING_POOL_SIZE"] = "0"
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Concurrent students through ingest -> diagnose -> practice -> submit.
+
+Runs ``--students`` pipelines at once against a fake model (``--latency``
+seconds per call) whose diagnosis names a concept unique to each student.
+Each student checks that the practice set it gets back was built for its
+own concept. --legacy sends no pipeline_id, so every student shares the
+default pipeline the way they shared the old global CURRENT_DATA dict.
+--db-path uses the SQLite backend that multiple workers would share.
+
+    python benchmarks/bench_pipeline_state.py --students 100
+    python benchmarks/bench_pipeline_state.py --students 100 --legacy
+    python benchmarks/bench_pipeline_state.py --students 100 --db-path /tmp/pipelines.db
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+QUIZ = {"quiz_id": "bench", "questions": [{"id": "q1", "text": "2 + 2", "correct_answer": "4", "concepts": ["Addition"]}]}
+
+
+class FakeModel:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latency)
+        if '"student_id"' in prompt:
+            student = re.search(r'"student_id": "([^"]+)"', prompt).group(1)
+            reply = {"weak_concepts": [{"concept": f"Concept {student}", "reason": "bench"}]}
+        else:
+            concept = re.search(r"(Concept student-\d+)", prompt).group(1)
+            reply = {"practice_set": [{"concept": concept, "questions": [
+                {"difficulty": "Easy", "question": f"{concept}: 2 + 2", "answer": "4", "solution": "4"}
+            ]}]}
+        return SimpleNamespace(text=json.dumps(reply))
+
+
+async def student(client, n, legacy, timings):
+    student_id = f"student-{n}"
+    params = {} if legacy else {"pipeline_id": f"bench-{n}"}
+    responses = {"student_id": student_id, "responses": [{"question_id": "q1", "answer": "5"}]}
+
+    async def step(name, call):
+        start = time.perf_counter()
+        response = await call
+        timings.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        return response
+
+    await step("ingest", client.post("/ingest/responses", params=params,
+                                     files={"file": ("responses.json", json.dumps(responses))}))
+    await step("diagnose", client.post("/diagnose", params=params))
+    practice = (await step("practice", client.get("/practice", params=params))).json()
+    concepts = [group["concept"] for group in practice.get("practice_set", [])]
+    await step("submit", client.post("/submit_practice", params=params,
+                                     json={f"Concept {student_id}: 2 + 2": "4"}))
+    return concepts == [f"Concept {student_id}"]
+
+
+async def run(students, latency, legacy):
+    import httpx
+    import api
+    from tools import llm_client
+
+    llm_client.get_client(api.diagnostic.model_name).use_model(FakeModel(latency))
+    timings = {}
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/ingest/quiz", files={"file": ("quiz.json", json.dumps(QUIZ))})
+        start = time.perf_counter()
+        own = await asyncio.gather(*(student(client, n, legacy, timings) for n in range(students)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "mode": "shared default pipeline" if legacy else "per-student pipelines",
+        "students": students,
+        "wall_s": round(elapsed, 2),
+        "got_own_practice_set": sum(own),
+        "got_another_students_practice_set": students - sum(own),
+        "step_p50_ms": {name: round(statistics.median(samples), 1) for name, samples in timings.items()},
+        "pipelines": api.pipelines.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency in seconds")
+    parser.add_argument("--legacy", action="store_true", help="no pipeline_id: everyone shares one pipeline")
+    parser.add_argument("--db-path", default="", help="SQLite pipeline state backend")
+    args = parser.parse_args()
+
+    # Must be set before api is imported
+    scratch = tempfile.mkdtemp()
+    os.environ["USER_DB_PATH"] = os.path.join(scratch, "bench_users.db")
+    os.environ["MEMORY_DB_PATH"] = os.path.join(scratch, "bench_memory.db")
+    os.environ["LLM_CACHE_DB_PATH"] = ""
+    os.environ["GRADING_POOL_SIZE"] = "0"
+    os.environ["PIPELINE_STATE_DB_PATH"] = args.db_path
+    result = asyncio.run(run(args.students, args.latency, args.legacy))
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Grading + progress tracking throughput for practice-set submissions.
+
+Grades a synthetic 20-question practice set with QuizRunner and records it
+with ProgressTracker, against a scratch MemoryBank. --per-question replays
+the old behaviour of one update_concept_mastery call (and commit) per
+graded question for comparison.
+
+    python benchmarks/bench_progress_tracking.py --submissions 200
+    python benchmarks/bench_progress_tracking.py --submissions 200 --per-question
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.quiz_runner import QuizRunner
+from agents.progress_tracker import ProgressTracker
+from tools.memory_bank import MemoryBank
+
+
+def make_practice_set(questions=20, concepts=4):
+    groups = []
+    for c in range(concepts):
+        groups.append({
+            "concept": f"Concept {c}",
+            "questions": [
+                {"question": f"Q{c}-{i}: simplify {i}*x + {c}", "answer": f"{i}*x + {c}"}
+                for i in range(questions // concepts)
+            ]
+        })
+    return {"practice_set": groups}
+
+
+def make_answers(practice_set):
+    # Alternate right / wrong so both delta paths run
+    answers = {}
+    for group in practice_set["practice_set"]:
+        for i, q in enumerate(group["questions"]):
+            answers[q["question"]] = q["answer"] if i % 2 == 0 else "0"
+    return answers
+
+
+def track_per_question(tracker, student_id, results):
+    for detail in results["details"]:
+        correct = detail["is_correct"]
+        tracker.memory.update_concept_mastery(
+            student_id, detail["concept"], 0.1 if correct else -0.05,
+            None if correct else f"Failed question: {detail['question']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--per-question", action="store_true", help="one transaction per graded question")
+    args = parser.parse_args()
+
+    memory = MemoryBank(db_path=os.path.join(tempfile.mkdtemp(), "bench_memory.db"))
+    tracker = ProgressTracker(memory=memory)
+    runner = QuizRunner()
+    practice_set = make_practice_set(args.questions)
+    answers = make_answers(practice_set)
+
+    grade_s = track_s = 0.0
+    for n in range(args.submissions):
+        start = time.perf_counter()
+        results = runner.grade_quiz(practice_set, answers)
+        graded = time.perf_counter()
+        if args.per_question:
+            track_per_question(tracker, f"student_{n}", results)
+        else:
+            tracker.update_progress(f"student_{n}", results)
+        grade_s += graded - start
+        track_s += time.perf_counter() - graded
+
+    result = {
+        "mode": "per_question" if args.per_question else "batched",
+        "submissions": args.submissions,
+        "questions": args.questions,
+        "grading_ms_per_submission": round(grade_s * 1000 / args.submissions, 3),
+        "tracking_ms_per_submission": round(track_s * 1000 / args.submissions, 3),
+        "submissions_per_s": round(args.submissions / (grade_s + track_s), 1),
+    }
+    print(json.dumps(result))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Response cache for generated content: cold model calls vs. memory / SQLite hits.
+
+A stand-in model sleeps ``--latency`` seconds per call (no API key needed).
+Requests draw concepts from a small popular set, as a class working through
+the same weak topics would, and go through PracticeAgent with and without
+a ResponseCache. A second cache instance on the same file measures the
+on-disk tier as a restarted worker would see it.
+
+    python benchmarks/bench_response_cache.py
+    python benchmarks/bench_response_cache.py --requests 200 --concepts 10 --latency 1.5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.practice_agent import PracticeAgent
+from tools.llm_client import LLMClient
+from tools.response_cache import ResponseCache
+
+
+class SlowModel:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        return SimpleNamespace(text=json.dumps({"practice_set": [{"concept": prompt[-40:], "questions": []}]}))
+
+
+def timed(agent, requests):
+    latencies = []
+    for concepts in requests:
+        start = time.perf_counter()
+        agent.generate_practice([{"concept": c} for c in concepts])
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "avg_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "total_s": round(sum(latencies) / 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concepts", type=int, default=8, help="size of the popular concept pool")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated model latency in seconds")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    pool = [f"Concept {i}" for i in range(args.concepts)]
+    requests = [sorted(rng.sample(pool, 2)) for _ in range(args.requests)]
+    db_path = os.path.join(tempfile.mkdtemp(), "llm_cache.db")
+
+    def agent(cache):
+        practice = PracticeAgent(cache=cache)
+        practice.llm = LLMClient(practice.model_name, model=SlowModel(args.latency))
+        return practice
+
+    uncached = timed(agent(None), requests)
+    cache = ResponseCache(db_path=db_path)
+    cached = timed(agent(cache), requests)
+    warm = timed(agent(cache), requests)
+
+    restarted = ResponseCache(db_path=db_path)
+    disk = timed(agent(restarted), requests[:50])
+
+    result = {
+        "requests": args.requests,
+        "distinct_prompts": len({tuple(r) for r in requests}),
+        "model_latency_ms": args.latency * 1000,
+        "uncached": uncached,
+        "cached_first_pass": cached,
+        "memory_hits": warm,
+        "disk_hits_after_restart": disk,
+        "cache": cache.stats(),
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+End-to-end HTTP load test for api.py.
+
+Simulated users run a realistic mix against the real FastAPI app. Each
+user repeatedly picks an action and then waits an exponentially
+distributed think time. The actions:
+
+- views their dashboard
+- polls /game/current
+- plays a chat session (start, five turns, then /chat/analyze, which
+  saves it)
+- submits the current game once per window
+- runs a practice pipeline (/pipeline/run, then /submit_practice)
+
+By default the app runs in-process against the fake model backend
+(LLM_BACKEND=fake, tools/fake_llm.py), with every SQLite store (users,
+memory, LLM cache, chat sessions, pipeline state) in a fresh temporary
+directory. Client and server then share one event loop, so compare runs
+made the same way. --url targets a running server instead, e.g.
+several uvicorn workers started with LLM_BACKEND=fake; its environment
+is then up to you.
+
+Per endpoint the test reports request count, errors (5xx or transport)
+and client errors (4xx), p50/p95/p99/max latency, and throughput. It
+also records the server's /llm/stats. Results are written as JSON
+(--output, default benchmarks/results/<scenario>-<commit>.json).
+--compare flags p95 or throughput regressions against an earlier
+result and exits non-zero if there are any.
+
+    python benchmarks/load_test.py --scenario 100
+    python benchmarks/load_test.py --scenario 1k --duration 30 --compare benchmarks/results/1k-abc1234.json
+    python benchmarks/load_test.py --scenario 10k --url http://localhost:8000
+    python benchmarks/load_test.py --scenario all
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# users, seconds, mean think time (ms); a user issues about 1000/think_ms requests per second
+SCENARIOS = {
+    "100": {"users": 100, "duration": 30, "think_ms": 1000},
+    "1k": {"users": 1000, "duration": 60, "think_ms": 2000},
+    "10k": {"users": 10000, "duration": 60, "think_ms": 5000},
+}
+
+# Relative weight of each action a user picks between think times
+DEFAULT_MIX = {"dashboard": 25, "game_poll": 35, "chat": 25, "game_submit": 5, "practice": 10}
+
+CHAT_TURNS = 5
+QUIZ = {"quiz_id": "load", "questions": [
+    {"id": "q1", "text": "Simplify 2(x + 3)", "correct_answer": "2x + 6", "concepts": ["Distributive Property"]},
+    {"id": "q2", "text": "What is 3/4 + 1/4?", "correct_answer": "1", "concepts": ["Fractions"]},
+    {"id": "q3", "text": "Solve 2x = 10", "correct_answer": "5", "concepts": ["Linear Equations"]},
+]}
+SUBJECTS = ["Algebra", "Physics", "Chemistry", "Biology", "History"]
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    return samples[min(int(len(samples) * p / 100), len(samples) - 1)]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.client_errors = {}
+
+    def add(self, endpoint, ms, status):
+        self.samples.setdefault(endpoint, []).append(ms)
+        if status is None or status >= 500:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        elif status >= 400:
+            self.client_errors[endpoint] = self.client_errors.get(endpoint, 0) + 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": self.errors.get(endpoint, 0),
+                "client_errors": self.client_errors.get(endpoint, 0),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "mean_ms": round(sum(samples) / len(samples), 2),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+                "max_ms": round(samples[-1], 2),
+            }
+        everything = sorted(ms for samples in self.samples.values() for ms in samples)
+        total = {
+            "requests": len(everything),
+            "errors": sum(self.errors.values()),
+            "client_errors": sum(self.client_errors.values()),
+            "throughput_rps": round(len(everything) / elapsed, 2),
+            "p50_ms": round(percentile(everything, 50), 2),
+            "p95_ms": round(percentile(everything, 95), 2),
+            "p99_ms": round(percentile(everything, 99), 2),
+        }
+        return total, endpoints
+
+
+class User:
+    """One simulated student and the state its next requests depend on"""
+
+    def __init__(self, n, user_id, client, recorder, rng):
+        self.n = n
+        self.user_id = user_id
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.chat_session = None
+        self.chat_turns = 0
+        self.pipeline_id = None
+        self.practice_answers = None
+        self.window = None  # (window_id, answer) of the current game
+        self.submitted_windows = set()
+
+    async def request(self, endpoint, method, path, **kwargs):
+        start = time.perf_counter()
+        status = None
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            status = response.status_code
+            return response.json() if status < 400 else None
+        except Exception:
+            return None
+        finally:
+            self.recorder.add(endpoint, (time.perf_counter() - start) * 1000, status)
+
+    async def dashboard(self):
+        await self.request("GET /dashboard/{user_id}", "GET", f"/dashboard/{self.user_id}")
+
+    async def game_poll(self):
+        data = await self.request("GET /game/current", "GET", "/game/current", params={"user_id": self.user_id})
+        if data and not data.get("played"):
+            game = data["game"]
+            answer = {"0": "?"} if game.get("type") == "MCQ_SET" else str(self.rng.randint(1, 9))
+            self.window = (data["window_id"], answer)
+
+    async def game_submit(self):
+        if self.window is None or self.window[0] in self.submitted_windows:
+            return await self.game_poll()
+        window_id, answer = self.window
+        self.submitted_windows.add(window_id)
+        await self.request("POST /game/submit", "POST", "/game/submit",
+                           json={"user_id": self.user_id, "window_id": window_id, "answer": answer})
+
+    async def chat(self):
+        if self.chat_session is None:
+            data = await self.request("POST /chat/start", "POST", "/chat/start",
+                                      json={"subject": self.rng.choice(SUBJECTS)})
+            if data:
+                self.chat_session, self.chat_turns = data["session_id"], 0
+        elif self.chat_turns < CHAT_TURNS:
+            self.chat_turns += 1
+            await self.request("POST /chat/message", "POST", "/chat/message",
+                               json={"session_id": self.chat_session, "message": f"I think it is {self.rng.randint(1, 20)}"})
+        else:
+            await self.request("POST /chat/analyze", "POST", "/chat/analyze",
+                               json={"session_id": self.chat_session, "user_id": self.user_id})
+            self.chat_session = None
+
+    async def practice(self):
+        if self.practice_answers is None:
+            responses = {"student_id": f"load-{self.n}", "responses": [
+                {"question_id": q["id"], "answer": q["correct_answer"] if self.rng.random() < 0.5 else "0"}
+                for q in QUIZ["questions"]
+            ]}
+            data = await self.request("POST /pipeline/run", "POST", "/pipeline/run",
+                                      json={"quiz": QUIZ, "responses": responses, "stream": False})
+            if data:
+                self.pipeline_id = data["pipeline_id"]
+                self.practice_answers = {
+                    q["question"]: q["answer"] if self.rng.random() < 0.7 else "0"
+                    for group in data.get("practice", {}).get("practice_set", []) for q in group.get("questions", [])
+                }
+        else:
+            await self.request("POST /submit_practice", "POST", "/submit_practice",
+                               params={"pipeline_id": self.pipeline_id}, json=self.practice_answers)
+            self.practice_answers = None
+
+    async def run(self, mix, think_s, deadline):
+        actions = list(mix)
+        weights = [mix[action] for action in actions]
+        # Spread the first requests over one think time instead of a thundering herd
+        await asyncio.sleep(self.rng.uniform(0, think_s))
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rng.choices(actions, weights)[0])()
+            await asyncio.sleep(self.rng.expovariate(1 / think_s) if think_s > 0 else 0)
+
+
+async def register_users(client, count, run_id, concurrency=50):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def register(n):
+        async with semaphore:
+            response = await client.post("/auth/register", json={
+                "name": f"Load User {n}", "email": f"load.{run_id}.{n}@gmail.com", "password": "loadtest",
+                "grade_level": "College Year 1"})
+            response.raise_for_status()
+            return response.json()["user"]["user_id"]
+
+    return await asyncio.gather(*(register(n) for n in range(count)))
+
+
+async def run_scenario(args, name):
+    import httpx
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.max_connections))
+        app = None
+    else:
+        import api
+        app = api
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://load",
+                                   timeout=args.timeout)
+
+    recorder = Recorder()
+    async with client:
+        setup_start = time.perf_counter()
+        if app is not None:
+            await app.run_in_threadpool(app.pipelines.update, app.DEFAULT_PIPELINE, quiz=QUIZ)
+        user_ids = await register_users(client, args.users, f"{int(time.time())}-{os.getpid()}")
+        setup_s = time.perf_counter() - setup_start
+
+        users = [User(n, user_id, client, recorder, random.Random(args.seed * 1_000_003 + n))
+                 for n, user_id in enumerate(user_ids)]
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(user.run(args.mix, args.think_ms / 1000, deadline) for user in users))
+        elapsed = time.perf_counter() - start
+
+        stats = await client.get("/llm/stats")
+        server_stats = stats.json() if stats.status_code == 200 else None
+
+    total, endpoints = recorder.report(elapsed)
+    return {
+        "scenario": name,
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "target": args.url or "in-process",
+        "config": {"users": args.users, "duration_s": args.duration, "think_ms": args.think_ms,
+                   "mix": args.mix, "seed": args.seed,
+                   "model": {key: os.environ.get(key) for key in sorted(os.environ) if key.startswith("LLM_")}},
+        "setup_s": round(setup_s, 2),
+        "elapsed_s": round(elapsed, 2),
+        "total": total,
+        "endpoints": endpoints,
+        "server": server_stats,
+    }
+
+
+def compare(result, baseline, threshold):
+    """Per-endpoint p95 and throughput changes vs. a baseline; returns the regressions"""
+    rows, regressions = [], []
+    for endpoint, now in result["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before:
+            continue
+        p95_change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        rps_change = (now["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"] \
+            if before["throughput_rps"] else 0.0
+        row = {"endpoint": endpoint, "p95_ms": [before["p95_ms"], now["p95_ms"]], "p95_change": round(p95_change, 3),
+               "throughput_rps": [before["throughput_rps"], now["throughput_rps"]], "throughput_change": round(rps_change, 3)}
+        rows.append(row)
+        if p95_change > threshold or rps_change < -threshold:
+            regressions.append(row)
+    return {"baseline_commit": baseline.get("commit"), "threshold": threshold, "endpoints": rows,
+            "regressions": regressions}
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    if text:
+        for part in text.split(","):
+            action, weight = part.split("=")
+            if action.strip() not in DEFAULT_MIX:
+                raise SystemExit(f"Unknown action {action!r}; expected one of {sorted(DEFAULT_MIX)}")
+            mix[action.strip()] = float(weight)
+    return {action: weight for action, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", default="100", choices=sorted(SCENARIOS) + ["all"])
+    parser.add_argument("--users", type=int, help="override the scenario's user count")
+    parser.add_argument("--duration", type=float, help="seconds of traffic after setup")
+    parser.add_argument("--think-ms", type=float, help="mean pause between a user's requests")
+    parser.add_argument("--mix", default="", help="action weights, e.g. dashboard=40,chat=10 (others keep defaults)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", default="", help="load a running server instead of the in-process app")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--max-connections", type=int, default=500, help="HTTP connection limit with --url")
+    parser.add_argument("--model-latency-ms", type=float, default=400.0, help="fake model first-token latency (in-process)")
+    parser.add_argument("--model-error-rate", type=float, default=0.0, help="fake model injected error rate (in-process)")
+    parser.add_argument("--output", default="", help="result JSON path")
+    parser.add_argument("--compare", default="", help="earlier result JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    if args.scenario == "all":
+        if args.output or args.compare:
+            parser.error("--output and --compare take a single scenario")
+        # One process per scenario so caches and databases start cold each time
+        argv = sys.argv[1:]
+        if "--scenario" in argv:
+            del argv[argv.index("--scenario"):argv.index("--scenario") + 2]
+        argv = [arg for arg in argv if arg != "--scenario=all"]
+        failed = 0
+        for name in SCENARIOS:
+            failed |= subprocess.call([sys.executable, os.path.abspath(__file__), "--scenario", name] + argv)
+        return failed
+
+    preset = SCENARIOS[args.scenario]
+    args.users = args.users or preset["users"]
+    args.duration = args.duration or preset["duration"]
+    args.think_ms = args.think_ms if args.think_ms is not None else preset["think_ms"]
+    args.mix = parse_mix(args.mix)
+
+    if not args.url:
+        # Must be set before api is imported
+        scratch = tempfile.mkdtemp(prefix="tutormate-load-")
+        for key, filename in (("USER_DB_PATH", "users.db"), ("MEMORY_DB_PATH", "memory.db"),
+                              ("LLM_CACHE_DB_PATH", "llm_cache.db"), ("CHAT_SESSION_DB_PATH", "chat_sessions.db"),
+                              ("PIPELINE_STATE_DB_PATH", "pipelines.db")):
+            os.environ[key] = os.path.join(scratch, filename)
+        os.environ["LLM_BACKEND"] = "fake"
+        os.environ["LLM_FAKE_LATENCY_MS"] = str(args.model_latency_ms)
+        os.environ["LLM_FAKE_ERROR_RATE"] = str(args.model_error_rate)
+        os.environ.setdefault("LLM_FAKE_SEED", str(args.seed))
+
+    result = asyncio.run(run_scenario(args, args.scenario))
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            result["comparison"] = compare(result, json.load(f), args.threshold)
+        exit_code = 1 if result["comparison"]["regressions"] else 0
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{args.scenario}-{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    summary = {key: result[key] for key in ("scenario", "commit", "target", "elapsed_s", "total")}
+    summary["endpoints"] = {name: {k: e[k] for k in ("requests", "errors", "p50_ms", "p95_ms", "p99_ms", "throughput_rps")}
+                            for name, e in result["endpoints"].items()}
+    if "comparison" in result:
+        summary["regressions"] = result["comparison"]["regressions"]
+    summary["output"] = output
+    print(json.dumps(summary, indent=2))
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,9 +17,12 @@ const AnalysisView = ({ onRestart, sessionData, user, onBackToDashboard }) => {
             setLoading(true);
             try {
                 const userId = user?.id || user?.user_id || user?._id;
+                // With a session_id the server reads the transcript it already has
+                const sessionId = sessionData?.session_id;
                 const response = await axios.post('http://localhost:8000/chat/analyze', {
                     user_id: userId,
-                    session_data: sessionData || {
+                    session_id: sessionId,
+                    session_data: sessionId ? undefined : sessionData || {
                         subject: "General",
                         difficulty: "intermediate",
                         messages: []
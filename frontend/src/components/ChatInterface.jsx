@@ -9,6 +9,7 @@ const ChatInterface = ({ subject, difficulty, gradeLevel, onComplete }) => {
     const [loading, setLoading] = useState(false);
     const [questionCount, setQuestionCount] = useState(0);
     const [sessionData, setSessionData] = useState({ subject, difficulty, messages: [] });
+    const [sessionId, setSessionId] = useState(null);
     const [isComplete, setIsComplete] = useState(false);
     const MAX_QUESTIONS = 5;
     const messagesEndRef = useRef(null);
@@ -30,6 +31,7 @@ const ChatInterface = ({ subject, difficulty, gradeLevel, onComplete }) => {
                     difficulty,
                     grade_level: gradeLevel
                 });
+                setSessionId(response.data.session_id);
                 setMessages([{ role: 'ai', content: response.data.message + " " + (response.data.question || "") }]);
                 setQuestionCount(1);
             } catch (error) {
@@ -51,12 +53,10 @@ const ChatInterface = ({ subject, difficulty, gradeLevel, onComplete }) => {
         setLoading(true);
 
         try {
-            const history = messages.map(m => ({ role: m.role, content: m.content }));
-
+            // The server keeps the transcript; only the new message is sent
             const response = await axios.post('http://localhost:8000/chat/message', {
-                session_id: "demo_session",
+                session_id: sessionId,
                 message: userMessage,
-                history: history,
                 difficulty: difficulty,
                 grade_level: gradeLevel
             });
@@ -116,7 +116,7 @@ const ChatInterface = ({ subject, difficulty, gradeLevel, onComplete }) => {
                         <span className="text-xs">Question {questionCount} of {MAX_QUESTIONS}</span>
                     </div>
                 </div>
-                <button onClick={() => onComplete({ session_data: sessionData })} className="text-sm hover:bg-white/20 px-3 py-1 rounded-lg transition-colors">
+                <button onClick={() => onComplete({ session_id: sessionId, session_data: sessionData })} className="text-sm hover:bg-white/20 px-3 py-1 rounded-lg transition-colors">
                     End Session →
                 </button>
             </div>
@@ -159,6 +159,7 @@ const ChatInterface = ({ subject, difficulty, gradeLevel, onComplete }) => {
                             subject,
                             difficulty,
                             grade_level: gradeLevel,
+                            session_id: sessionId,
                             messages: messages,
                             session_data: { messages: messages, subject, difficulty, grade_level: gradeLevel }
                         })}
@@ -13,6 +13,9 @@ const QuizView = () => {
     const [showExplanation, setShowExplanation] = useState(false);
     const [results, setResults] = useState(null);
     const [loading, setLoading] = useState(false);
+    // Keys this student's ingest -> diagnose -> practice -> submit state on the server
+    const [pipelineId] = useState(() => crypto.randomUUID());
+    const pipelineParams = { params: { pipeline_id: pipelineId } };
 
     const handleFileUpload = async (e) => {
         const uploadedFile = e.target.files[0];
@@ -35,10 +38,11 @@ const QuizView = () => {
             // We need to upload quiz and responses. For simplicity in this UI demo, 
             // we'll assume the user is uploading the "responses.json" and the quiz is already there.
             await axios.post('http://localhost:8000/ingest/responses', formData, {
+                ...pipelineParams,
                 headers: { 'Content-Type': 'multipart/form-data' }
             });
 
-            const diagResponse = await axios.post('http://localhost:8000/diagnose');
+            const diagResponse = await axios.post('http://localhost:8000/diagnose', null, pipelineParams);
             setDiagnosis(diagResponse.data);
             setStep('diagnosis');
         } catch (error) {
@@ -52,7 +56,7 @@ const QuizView = () => {
     const startPractice = async () => {
         setLoading(true);
         try {
-            const response = await axios.get('http://localhost:8000/practice');
+            const response = await axios.get('http://localhost:8000/practice', pipelineParams);
             setPracticeSet(response.data);
             setStep('practice');
         } catch (error) {
@@ -74,7 +78,7 @@ const QuizView = () => {
     const submitQuiz = async () => {
         setLoading(true);
         try {
-            const response = await axios.post('http://localhost:8000/submit_practice', answers);
+            const response = await axios.post('http://localhost:8000/submit_practice', answers, pipelineParams);
             setResults(response.data);
             setStep('results');
         } catch (error) {
@@ -0,0 +1,41 @@
+import argparse
+from tools.user_database import UserDatabase
+
+
+def snapshot(db):
+    with db._get_conn() as conn:
+        stats = conn.execute("SELECT * FROM user_stats ORDER BY user_id").fetchall()
+        subjects = conn.execute("SELECT * FROM user_subject_stats ORDER BY user_id, subject").fetchall()
+    return stats, subjects
+
+
+def rebuild(db_path, user_id=None, verify=False, timezone=None):
+    db = UserDatabase(db_path=db_path, timezone=timezone)
+    before = snapshot(db) if verify else None
+
+    count = db.rebuild_stats(user_id)
+    print(f"Rebuilt dashboard stats for {count} user(s).")
+
+    if verify:
+        after = snapshot(db)
+        if user_id is not None:
+            before = tuple([r for r in rows if r[0] == user_id] for rows in before)
+            after = tuple([r for r in rows if r[0] == user_id] for rows in after)
+        drift = [(b, a) for b, a in zip(before[0] + before[1], after[0] + after[1]) if b != a]
+        if drift or len(before[0] + before[1]) != len(after[0] + after[1]):
+            print("Incremental summaries had drifted from raw sessions:")
+            for b, a in drift:
+                print(f"  was {b} -> now {a}")
+        else:
+            print("Incremental summaries matched raw sessions.")
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute user_stats / user_subject_stats from sessions")
+    parser.add_argument("--db", default="tutormate_users.db")
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--tz", help="streak day boundary, must match STREAK_TIMEZONE used by the API")
+    parser.add_argument("--verify", action="store_true", help="report rows that differed before the rebuild")
+    args = parser.parse_args()
+    rebuild(args.db, args.user_id, args.verify, args.tz)
@@ -0,0 +1,397 @@
+import sys
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to path to import tools
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools.llm_client import LLMClient, extract_json, get_client
+from agents.practice_agent import PracticeAgent
+from agents.explanation_agent import ExplanationAgent
+
+
+class FlakyModel:
+    """Times out ``failures`` times, then answers with a fenced JSON reply"""
+
+    def __init__(self, failures=0, text='```json\n{"ok": true}\n```'):
+        self.failures = failures
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise TimeoutError("deadline exceeded")
+        usage = SimpleNamespace(prompt_token_count=len(prompt.split()), candidates_token_count=3)
+        return SimpleNamespace(text=self.text, usage_metadata=usage)
+
+
+def test_extract_json_variants():
+    assert extract_json('{"a": 1}') == {"a": 1}
+    assert extract_json('```json\n{"a": 1}\n```') == {"a": 1}
+    assert extract_json('```\n[1, 2]\n```') == [1, 2]
+    assert extract_json('Sure! Here it is:\n{"a": {"b": 2}}\nHope that helps.') == {"a": {"b": 2}}
+    with pytest.raises(ValueError):
+        extract_json("no json here")
+
+
+def test_retries_transient_errors_and_counts_tokens():
+    model = FlakyModel(failures=2)
+    client = LLMClient("fake", max_retries=2, backoff=0, model=model)
+    assert client.generate_json("one two three") == {"ok": True}
+
+    stats = client.stats()
+    assert (model.calls, stats["calls"], stats["errors"], stats["retries"]) == (3, 3, 2, 2)
+    assert (stats["prompt_tokens"], stats["output_tokens"]) == (3, 3)
+
+    with pytest.raises(TimeoutError):
+        LLMClient("fake", max_retries=1, backoff=0, model=FlakyModel(failures=5)).generate_text("x")
+
+    raw = LLMClient("fake", model=FlakyModel(text="not json")).generate_json("x")
+    assert raw == {"raw_text": "not json"}
+
+
+def test_agents_share_one_client_per_model():
+    assert get_client("models/shared-test") is get_client("models/shared-test")
+    assert PracticeAgent().llm is ExplanationAgent().llm
+    assert PracticeAgent("models/other").llm is not PracticeAgent().llm
+
+
+def test_response_cache_tiers_ttl_and_trim(tmp_path, monkeypatch):
+    from tools import response_cache
+    from tools.response_cache import ResponseCache
+
+    db_path = str(tmp_path / "llm_cache.db")
+    model = FlakyModel(text='{"practice_set": [{"concept": "Fractions"}]}')
+    client = LLMClient("fake", model=model)
+    cache = ResponseCache(db_path=db_path, ttl=60)
+
+    first = client.generate_json("Practice for: Fractions", cache=cache, template_version=1)
+    first["practice_set"].append("mutated by caller")
+    # Whitespace-only differences hit the same entry; callers get their own copy
+    again = client.generate_json("Practice  for:\nFractions ", cache=cache, template_version=1)
+    assert again == {"practice_set": [{"concept": "Fractions"}]}
+    assert model.calls == 1
+
+    # A new template version or model is a different key
+    client.generate_json("Practice for: Fractions", cache=cache, template_version=2)
+    assert model.calls == 2
+
+    # A fresh process finds it on disk
+    restarted = ResponseCache(db_path=db_path, ttl=60)
+    assert restarted.get("fake", 1, "Practice for: Fractions") == again
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["disk_rows"]) == (1, 0, 2)
+
+    # Expired entries are misses in both tiers
+    now = response_cache.time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 61)
+    assert restarted.get("fake", 1, "Practice for: Fractions") is None
+    assert cache.get("fake", 2, "Practice for: Fractions") is None
+    monkeypatch.undo()
+
+    # Size eviction keeps the most recently used rows
+    small = ResponseCache(db_path=str(tmp_path / "small.db"), max_rows=10)
+    for i in range(response_cache.TRIM_EVERY):
+        small.set("fake", 1, f"prompt {i}", {"i": i})
+    assert small.stats()["disk_rows"] == 10
+    assert ResponseCache(db_path=str(tmp_path / "small.db")).get("fake", 1, "prompt 99") == {"i": 99}
+
+
+def test_async_calls_retry_timeouts_and_run_concurrently():
+    import asyncio
+    import time
+
+    class SlowAsyncModel:
+        def __init__(self):
+            self.calls = 0
+
+        async def generate_content_async(self, prompt):
+            self.calls += 1
+            # First call overruns the client timeout, later ones answer quickly
+            await asyncio.sleep(1 if self.calls == 1 else 0.05)
+            return SimpleNamespace(text='{"question": "What is 2 + 2?"}')
+
+    model = SlowAsyncModel()
+    client = LLMClient("fake-async", timeout=0.2, max_retries=1, backoff=0, model=model)
+    assert asyncio.run(client.generate_json_async("x")) == {"question": "What is 2 + 2?"}
+    assert (model.calls, client.stats()["retries"]) == (2, 1)
+
+    # Handles without an async API fall back to a worker thread
+    threaded = LLMClient("fake-thread", model=FlakyModel())
+    assert asyncio.run(threaded.generate_json_async("x")) == {"ok": True}
+
+    async def many():
+        return await asyncio.gather(*(client.generate_json_async(f"q{i}") for i in range(20)))
+
+    start = time.perf_counter()
+    assert len(asyncio.run(many())) == 20
+    assert time.perf_counter() - start < 0.5
+
+
+def test_async_cache_io_does_not_block_event_loop(tmp_path):
+    import asyncio
+    import sqlite3
+    import threading
+    from tools.response_cache import ResponseCache
+
+    db_path = str(tmp_path / "cache.db")
+    ResponseCache(db_path=db_path).set("fake", 1, "prompt", {"cached": True})
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE llm_cache SET last_used = 0")
+    # Fresh memory tier, so the lookup is a disk hit that has to refresh last_used
+    cache = ResponseCache(db_path=db_path)
+    client = LLMClient("fake", model=FlakyModel())
+
+    locker = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    locker.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.5, lambda: locker.execute("COMMIT")).start()
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        result = await client.generate_json_async("prompt", cache=cache, template_version=1)
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(main())
+    locker.close()
+    assert result == {"cached": True}
+    # The loop kept running while the cache waited out the write lock
+    assert ticks >= 20
+
+
+def test_recent_disk_hits_do_not_write(tmp_path):
+    import sqlite3
+    import time
+    from tools.response_cache import ResponseCache
+
+    db_path = str(tmp_path / "cache.db")
+    ResponseCache(db_path=db_path).set("fake", 1, "prompt", {"cached": True})
+    cache = ResponseCache(db_path=db_path)
+
+    locker = sqlite3.connect(db_path, isolation_level=None)
+    locker.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.perf_counter()
+        assert cache.get("fake", 1, "prompt") == {"cached": True}
+        # last_used is fresh, so the hit reads without waiting for the write lock
+        assert time.perf_counter() - start < 0.5
+    finally:
+        locker.execute("COMMIT")
+        locker.close()
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_json_field_stream_handles_any_chunking():
+    import json
+    import random
+    from tools.json_stream import JSONFieldStream
+
+    reply = {"feedback": "Close! \"x = 4\" works,\nbut check é signs 😀👍.", "next_question": "Solve 2x = 6",
+             "is_correct": False, "concept": "Linear Equations", "score": -1.5e3, "hints": [{"a": "}]"}], "extra": None}
+    text = "```json\n" + json.dumps(reply, indent=2) + "\n```"
+    rng = random.Random(0)
+    for _ in range(50):
+        parser, events, i = JSONFieldStream(), [], 0
+        while i < len(text):
+            step = rng.randint(1, 8)
+            events += parser.feed(text[i:i + step])
+            i += step
+        assert parser.done and parser.fields == reply
+        assert "".join(v for kind, key, v in events if kind == "delta" and key == "feedback") == reply["feedback"]
+        assert [key for kind, key, _ in events if kind == "field"] == list(reply)
+
+
+def test_chat_stream_emits_feedback_deltas_then_typed_fields():
+    import asyncio
+    from agents.chat_agent import ChatAgent
+
+    reply = '```json\n{"feedback": "Great job, that is right.", "next_question": "What is 3 x 3?", "is_correct": true, "concept": "Multiplication", "difficulty": "beginner"}\n```'
+
+    class StreamingModel:
+        async def generate_content_async(self, prompt, stream=False):
+            chunks = [reply[i:i + 7] for i in range(0, len(reply), 7)]
+
+            async def gen():
+                for chunk in chunks:
+                    await asyncio.sleep(0)
+                    yield SimpleNamespace(text=chunk)
+            return gen()
+
+    agent = ChatAgent("models/stream-test")
+    agent.llm = LLMClient("models/stream-test", model=StreamingModel())
+
+    async def collect():
+        return [event async for event in agent.stream_response_async("Math", [], "9")]
+
+    events = asyncio.run(collect())
+    names = [name for name, _ in events]
+    assert names.index("feedback_delta") < names.index("feedback") < names.index("is_correct")
+    assert "".join(v for name, v in events if name == "feedback_delta") == "Great job, that is right."
+    assert dict(events)["is_correct"] is True
+    assert names[0] == "context"
+    done = dict(events[-1][1])
+    assert done.pop("context")["prompt_tokens"] > 0
+    assert events[-1][0] == "done" and done == {"feedback": "Great job, that is right.", "next_question": "What is 3 x 3?",
+                                                "is_correct": True, "concept": "Multiplication", "difficulty": "beginner"}
+    assert agent.llm.stats()["streams"] == 1
+
+
+def test_conversation_context_is_bounded_and_incremental():
+    from tools.chat_context import ConversationContext
+
+    calls = []
+
+    def summarizer(previous, turns, budget):
+        calls.append(len(turns))
+        return (previous + " " + " ".join(t["content"] for t in turns)).strip()[-budget * 4:]
+
+    context = ConversationContext(keep_turns=4, max_tokens=400, summary_tokens=100, summarizer=summarizer)
+    history = []
+    sizes = []
+    for i in range(200):
+        history.append({"role": "user" if i % 2 else "ai", "content": f"message number {i} " + "x" * 30})
+        window = context.build(history, session_id="s1")
+        sizes.append(window.tokens)
+        assert window.recent == history[-4:] and window.summarized_turns == max(len(history) - 4, 0)
+        assert window.tokens <= 400
+
+    # Each turn folds exactly one new message into the cached summary
+    assert calls == [1] * 196
+    assert max(sizes[50:]) - min(sizes[50:]) <= 2
+    assert "message number 195" in window.summary and "message number 196" not in window.summary
+
+    # A different conversation under the same session_id is summarized from scratch
+    other = [{"role": "user", "content": f"other {i}"} for i in range(10)]
+    assert "other 0" in context.build(other, session_id="s1").summary
+    assert calls[-1] == 6
+
+    # One huge message is truncated rather than blowing the budget
+    huge = context.build([{"role": "user", "content": "y" * 20000}], session_id="s2")
+    assert huge.tokens <= 400 and huge.summarized_turns == 0
+
+
+def test_fan_out_returns_partial_results_and_reuses_cached_concepts():
+    import asyncio
+    import json
+    import re
+    from tools.response_cache import ResponseCache
+
+    class PerConceptModel:
+        def __init__(self):
+            self.prompts = []
+
+        def generate_content(self, prompt):
+            self.prompts.append(prompt)
+            concept = re.search(r"weak concepts: (.+)", prompt).group(1)
+            if concept == "Broken":
+                return SimpleNamespace(text="not json")
+            return SimpleNamespace(text=json.dumps({"practice_set": [{"concept": concept, "questions": []}]}))
+
+        async def generate_content_async(self, prompt):
+            return self.generate_content(prompt)
+
+    model = PerConceptModel()
+    agent = PracticeAgent("models/fan-out-test", cache=ResponseCache(db_path=None), fan_out=True, max_concurrency=2)
+    agent.llm = LLMClient("models/fan-out-test", model=model)
+    concepts = [{"concept": name} for name in ("Fractions", "Broken", "Decimals", "Fractions")]
+
+    result = asyncio.run(agent.generate_practice_async(concepts))
+    assert [group["concept"] for group in result["practice_set"]] == ["Fractions", "Decimals"]
+    assert result["errors"] == [{"concept": "Broken", "error": "Reply has no 'practice_set' list"}]
+    assert "error" not in result and len(model.prompts) == 3
+
+    # Only concepts without a cached reply go to the model
+    result = agent.generate_practice([{"concept": "Decimals"}, {"concept": "Percentages"}, {"concept": "Fractions"}])
+    assert [group["concept"] for group in result["practice_set"]] == ["Decimals", "Percentages", "Fractions"]
+    assert len(model.prompts) == 4 and "Percentages" in model.prompts[-1]
+
+
+def test_fake_backend_answers_every_prompt_type(monkeypatch):
+    import asyncio
+    from agents.diagnostic_agent import DiagnosticAgent
+    from agents.teacher_summary_agent import TeacherSummaryAgent
+    from agents.chat_agent import ChatAgent
+    from agents.quiz_runner import QuizRunner
+
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    monkeypatch.setenv("LLM_FAKE_LATENCY_MS", "0")
+    monkeypatch.setenv("LLM_FAKE_MS_PER_TOKEN", "0")
+    model_name = "models/fake-backend-test"
+
+    normalized = {"student_id": "s1", "questions": [
+        {"id": "q1", "student_answer": "5", "correct_answer": "4", "concepts": ["Addition"]},
+        {"id": "q2", "student_answer": "6", "correct_answer": "6", "concepts": ["Multiplication"]},
+    ]}
+    diagnosis = DiagnosticAgent(model_name).diagnose(normalized)
+    assert [c["concept"] for c in diagnosis["weak_concepts"]] == ["Addition"]
+
+    weak = [{"concept": "Addition"}, {"concept": "Fractions"}]
+    practice_set = PracticeAgent(model_name, fan_out=True).generate_practice(weak)
+    assert [g["concept"] for g in practice_set["practice_set"]] == ["Addition", "Fractions"]
+    # The generated answers are correct, so grading them back scores full marks
+    answers = {q["question"]: q["answer"] for g in practice_set["practice_set"] for q in g["questions"]}
+    assert QuizRunner().grade_quiz(practice_set, answers)["score"] == len(answers)
+
+    explanations = ExplanationAgent(model_name).generate_explanations(weak)
+    assert [e["concept"] for e in explanations["explanations"]] == ["Addition", "Fractions"]
+    assert TeacherSummaryAgent(model_name).generate_report("s1", []).startswith("# Progress Report")
+
+    chat = ChatAgent(model_name)
+    assert set(chat.start_session("Algebra")) == {"message", "question"}
+    reply = asyncio.run(chat.process_response_async("Algebra", [], "x = 4"))
+    assert {"feedback", "next_question", "is_correct", "concept", "difficulty"} <= set(reply)
+    assert reply == asyncio.run(chat.process_response_async("Algebra", [], "x = 4"))
+    assert set(chat.generate_recommendations("Algebra", ["Addition"], "beginner")) == {"recommendations"}
+
+    async def stream():
+        return [event async for event in chat.stream_response_async("Algebra", [], "x = 5")]
+    assert asyncio.run(stream())[-1][0] == "done"
+    assert get_client(model_name).stats()["fake_model"]["by_prompt_type"]["chat_response"] == 3
+
+
+def test_fake_model_fault_injection_is_repeatable():
+    import asyncio
+    from tools.fake_llm import FakeModel, LatencyModel
+
+    def run(seed):
+        model = FakeModel(latency=LatencyModel("fixed", 0), ms_per_token=0, error_rate=0.3, malformed_rate=0.2, seed=seed)
+        client = LLMClient("fake-faults", max_retries=3, backoff=0, model=model)
+        results = [asyncio.run(client.generate_json_async(f"Explain the following concepts: C{i}")) for i in range(30)]
+        return results, model.stats()["injected"], client.stats()["retries"]
+
+    results, injected, retries = run(seed=7)
+    assert run(seed=7) == (results, injected, retries)
+    assert injected["errors"] > 0 and retries == injected["errors"]
+    assert sum("raw_text" in r for r in results) == injected["malformed"] > 0
+    assert all(r["explanations"][0]["concept"] == f"C{i}" for i, r in enumerate(results) if "raw_text" not in r)
+
+
+def test_fake_model_sync_timeout_is_capped_and_history_bounded(monkeypatch):
+    import time
+    from tools import fake_llm
+    from tools.fake_llm import FakeModel, LatencyModel
+
+    model = FakeModel(latency=LatencyModel("fixed", 0), ms_per_token=0, timeout_rate=1.0, hang_s=120, timeout_s=0.05)
+    client = LLMClient("fake-hang", max_retries=1, backoff=0, model=model)
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        client.generate_text("Explain the following concepts: C1")
+    assert time.perf_counter() - start < 1
+    assert client.stats()["retries"] == 1
+
+    monkeypatch.setattr(fake_llm, "SEEN_PROMPTS", 10)
+    model = FakeModel(latency=LatencyModel("fixed", 0), ms_per_token=0)
+    for i in range(50):
+        model.generate_content(f"chat turn {i}")
+    assert len(model._seen) == 10
@@ -0,0 +1,195 @@
+import sys
+import os
+
+# Add parent directory to path to import tools
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools.math_solver import MathSolver
+from tools.lru_cache import LRUCache
+from agents.quiz_runner import QuizRunner
+
+
+def fresh_solver():
+    return MathSolver(parse_cache=LRUCache(64), verdict_cache=LRUCache(64))
+
+
+def test_validate_answer_verdicts():
+    solver = fresh_solver()
+    assert solver.validate_answer("2x + 6", "2*(x + 3)")
+    assert solver.validate_answer("x^2 + 2x + 1", "(x + 1)**2")
+    assert solver.validate_answer(" 5/6 ", "10/12")
+    assert not solver.validate_answer("x + 5", "x + 6")
+    assert not solver.validate_answer("", "4")
+    # Unparseable answers fall back to string comparison
+    assert solver.validate_answer("Nitrogen gas", "Nitrogen gas")
+
+
+def test_answer_key_is_parsed_once_and_verdicts_reused():
+    solver = fresh_solver()
+    for _ in range(50):
+        solver.validate_answer("2x + 6", "2*(x + 3)")
+        solver.validate_answer("x + 6", "2*(x + 3)")
+    stats = solver.cache_stats()
+    assert stats["parse"]["misses"] == 3
+    assert stats["verdict"]["misses"] == 2
+    assert stats["verdict"]["hits"] == 98
+
+
+def test_caches_shared_across_quiz_runners():
+    practice_set = {"practice_set": [{"concept": "Algebra", "questions": [
+        {"question": "Simplify 2(x + 3)", "answer": "2x + 6"}
+    ]}]}
+    first, second = QuizRunner(), QuizRunner()
+    assert first.math_solver.verdict_cache is second.math_solver.verdict_cache
+
+    first.grade_quiz(practice_set, {"Simplify 2(x + 3)": "2*x + 6"})
+    hits = second.math_solver.verdict_cache.hits
+    result = second.grade_quiz(practice_set, {"Simplify 2(x + 3)": "2*x + 6"})
+    assert result["score"] == 1
+    assert second.math_solver.verdict_cache.hits == hits + 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_check_answer_reports_deciding_tier():
+    solver = fresh_solver()
+    assert solver.check_answer("x + 6", "x + 6") == (True, "exact")
+    assert solver.check_answer("12/3", "4") == (True, "rational")
+    assert solver.check_answer("3x^2 - 2x", "x(3x - 2)") == (True, "probe")
+    assert solver.check_answer("3x^2 + 2x", "x(3x - 2)") == (False, "probe")
+    # Exact follow-up catches differences below float precision
+    assert solver.check_answer("x + 10^20", "x + 10^20 + 1") == (False, "probe")
+    # Probing is inconclusive for trig identities, so simplify decides
+    assert solver.check_answer("sin(x)^2 + cos(x)^2", "1") == (True, "simplify")
+
+
+def test_fast_paths_match_simplify_only():
+    pairs = [("4.0", "4"), ("0.5", "1/2"), ("0.3333", "1/3"), ("2x + 6", "2(x + 3)"),
+             ("x + 1", "(x^2 - 1)/(x - 1)"), ("1/x + 1/y", "(x + y)/(x*y)"), ("sqrt(8)", "2*sqrt(2)"),
+             ("log(x^2)", "2 log(x)"), ("a*b + a*c", "a(b + c)"), ("y - 2", "2(y - 2)")]
+    tiered = fresh_solver()
+    baseline = MathSolver(parse_cache=LRUCache(64), verdict_cache=LRUCache(64), fast_paths=False)
+    for student, key in pairs:
+        assert tiered.validate_answer(student, key) == baseline.validate_answer(student, key), (student, key)
+
+
+def test_grading_pool_bounds_adversarial_answers():
+    from tools.grading_pool import GradingPool
+    pool = GradingPool(size=2, timeout=3)
+    try:
+        runner = QuizRunner(grading_pool=pool)
+        runner.math_solver.verdict_cache = LRUCache(64)
+        practice_set = {"practice_set": [{"concept": "Algebra", "questions": [
+            {"question": "q1", "answer": "4"},
+            {"question": "q2", "answer": "2(x + 3)"},
+            {"question": "q3", "answer": 12},
+        ]}]}
+        result = runner.grade_quiz(practice_set, {"q1": "9^9^9^9", "q2": "2x + 6", "q3": "12"})
+
+        verdicts = {d["question"]: (d["is_correct"], d["check_tier"]) for d in result["details"]}
+        assert verdicts["q1"] == (None, "timeout")
+        assert verdicts["q2"] == (True, "probe")
+        assert verdicts["q3"] == (True, "exact")
+        assert (result["score"], result["undetermined"], result["total"]) == (2, 1, 3)
+        assert pool.stats()["timeouts"] == 1
+    finally:
+        pool.close()
+
+
+def test_undetermined_pool_verdicts_are_not_cached():
+    class StallingPool:
+        """Times out the first check, answers the rest"""
+        def __init__(self):
+            self.calls = 0
+
+        def check_many(self, pairs):
+            self.calls += 1
+            verdict = (None, "timeout") if self.calls == 1 else (True, "simplify")
+            return [verdict for _ in pairs]
+
+        def parse_many(self, answers):
+            return [None for _ in answers]
+
+    pool = StallingPool()
+    solver = MathSolver(parse_cache=LRUCache(64), verdict_cache=LRUCache(64), pool=pool)
+    assert solver.check_answer("2x + 6", "2(x + 3)") == (None, "timeout")
+    assert solver.check_answer("2x + 6", "2(x + 3)") == (True, "simplify")
+    assert solver.check_answer("2x + 6", "2(x + 3)") == (True, "simplify")
+    assert pool.calls == 2
+
+
+def test_grade_many_parses_each_answer_key_once_with_a_pool():
+    from tools.grading_pool import GradingPool
+    pool = GradingPool(size=2, timeout=10)
+    try:
+        runner = QuizRunner(grading_pool=pool)
+        runner.math_solver = MathSolver(parse_cache=LRUCache(64), verdict_cache=LRUCache(64), pool=pool)
+        practice_set = {"practice_set": [{"concept": "Algebra", "questions": [
+            {"question": "q1", "answer": "2(x + 3)"},
+            {"question": "q2", "answer": "x^2 - 1"},
+            {"question": "q3", "answer": "N2 (gas"},
+        ]}]}
+        submissions = {f"s{i}": {"q1": f"2x + {i}", "q2": f"(x - 1)(x + {i})", "q3": "N2 (gas" if i else "N2"} for i in range(7)}
+        batch = runner.grade_many(practice_set, submissions)
+
+        assert [batch["students"][f"s{i}"]["score"] for i in (0, 1, 6)] == [0, 2, 2]
+        # The keys were parsed once each, in a worker, and sent with every check
+        assert pool.stats()["parses"] == 3
+        assert pool.stats()["checks"] == 15
+        assert runner.math_solver.cache_stats()["parse"]["misses"] == 3
+
+        runner.grade_many(practice_set, {"late": {"q1": "x + x + 6", "q2": "x^2 - 1", "q3": "gas"}})
+        assert pool.stats()["parses"] == 3
+    finally:
+        pool.close()
+
+
+def test_grade_many_matches_per_student_grading():
+    runner = QuizRunner()
+    runner.math_solver.verdict_cache = LRUCache(256)
+    practice_set = {"practice_set": [{"concept": "Algebra", "questions": [
+        {"question": "q1", "answer": "2(x + 3)"},
+        {"question": "q2", "answer": "1/2"},
+    ]}]}
+    submissions = {
+        "amy": {"q1": "2x + 6", "q2": "0.5"},
+        "ben": {"q1": "2x + 3", "q2": "1/2"},
+        "cal": {"q1": "2x + 3", "q2": "3/6"},
+        "dee": {"q1": "2x + 6"},
+    }
+    batch = runner.grade_many(practice_set, submissions)
+
+    for student_id, answers in submissions.items():
+        assert batch["students"][student_id] == runner.grade_quiz(practice_set, answers)
+    assert [batch["students"][s]["score"] for s in submissions] == [2, 1, 1, 1]
+
+    q1, q2 = batch["questions"]
+    assert (q1["attempts"], q1["correct"], q1["percent_correct"]) == (4, 2, 50.0)
+    assert q1["common_wrong_answers"] == [{"answer": "2x + 3", "count": 2}]
+    assert (q2["correct"], q2["common_wrong_answers"]) == (3, [{"answer": "", "count": 1}])
+    assert (batch["distinct_checks"], batch["total_checks"]) == (6, 8)
+
+
+def test_grading_pool_start_up_does_not_count_against_the_answer_limit():
+    from tools.grading_pool import GradingPool
+    # Spawning a worker and importing SymPy takes far longer than 50ms
+    pool = GradingPool(size=1, timeout=0.05, acquire_timeout=0.2)
+    try:
+        assert pool.check_answer("4", "4") == (True, "exact")
+        assert pool.stats()["timeouts"] == 0
+
+        # With the only worker taken, a check gives up instead of waiting forever
+        busy = pool._acquire()
+        assert pool.check_answer("4", "4") == (None, "timeout")
+        assert pool.stats()["acquire_timeouts"] == 1
+        pool._idle.put(busy)
+    finally:
+        pool.close()
@@ -0,0 +1,85 @@
+import sys
+import os
+import json
+import sqlite3
+
+# Add parent directory to path to import tools
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools.memory_bank import MemoryBank
+
+
+def test_legacy_history_is_exploded_into_events(tmp_path):
+    path = str(tmp_path / "memory.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE concept_mastery (student_id TEXT, concept_id TEXT, mastery_score REAL, last_practiced TIMESTAMP, last_mistake TEXT, history TEXT, PRIMARY KEY (student_id, concept_id))")
+    history = [
+        {"timestamp": "2025-01-01T10:00:00", "score_delta": 0.1, "mistake": None},
+        {"timestamp": "2025-01-02T10:00:00", "score_delta": -0.05, "mistake": "Failed question: 2x = 4"},
+    ]
+    conn.execute("INSERT INTO concept_mastery VALUES ('s001', 'Algebra', 0.05, '2025-01-02T10:00:00', NULL, ?)", (json.dumps(history),))
+    conn.commit()
+    conn.close()
+
+    memory = MemoryBank(db_path=path)
+    events = memory.get_concept_history("s001", "Algebra")
+    assert [e["score_delta"] for e in events] == [-0.05, 0.1]
+    assert events[0]["mistake"] == "Failed question: 2x = 4"
+
+    memory.update_concept_mastery("s001", "Algebra", 0.1)
+    assert len(memory.get_concept_history("s001", "Algebra")) == 3
+    assert round(memory.get_student_mastery("s001")[0]["mastery_score"], 2) == 0.15
+
+
+def test_mastery_score_is_clamped(tmp_path):
+    memory = MemoryBank(db_path=str(tmp_path / "memory.db"))
+    for _ in range(15):
+        memory.update_concept_mastery("s002", "Geometry", 0.1)
+    memory.update_concept_mastery("s002", "Fractions", -0.05, "Failed question: 1/2 + 1/3")
+
+    scores = {m["concept_id"]: m["mastery_score"] for m in memory.get_student_mastery("s002")}
+    assert scores == {"Geometry": 1.0, "Fractions": 0.0}
+    assert len(memory.get_concept_history("s002", "Geometry", limit=5)) == 5
+
+
+def test_batched_updates_match_sequential(tmp_path):
+    updates = [("Algebra", 0.1, None), ("Geometry", -0.05, "Failed question: area"),
+               ("Algebra", -0.05, "Failed question: 2x = 4"), ("Algebra", 0.1, None)]
+
+    sequential = MemoryBank(db_path=str(tmp_path / "sequential.db"))
+    for concept_id, delta, mistake in updates:
+        sequential.update_concept_mastery("s003", concept_id, delta, mistake)
+
+    batched = MemoryBank(db_path=str(tmp_path / "batched.db"))
+    batched.update_concept_mastery_many("s003", updates)
+
+    def scores(memory):
+        return {m["concept_id"]: round(m["mastery_score"], 6) for m in memory.get_student_mastery("s003")}
+
+    assert scores(batched) == scores(sequential) == {"Algebra": 0.15, "Geometry": 0.0}
+    assert len(batched.get_concept_history("s003", "Algebra")) == 3
+
+
+def test_concurrent_writers_do_not_lock_or_lose_updates(tmp_path):
+    import threading
+    memory = MemoryBank(db_path=str(tmp_path / "memory.db"))
+    errors = []
+
+    def writer():
+        try:
+            for _ in range(10):
+                memory.update_concept_mastery_many("s004", [("Algebra", 0.005, None), ("Geometry", 0.005, None)])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    scores = {m["concept_id"]: round(m["mastery_score"], 6) for m in memory.get_student_mastery("s004")}
+    assert scores == {"Algebra": 0.8, "Geometry": 0.8}
+    assert len(memory.get_concept_history("s004", "Algebra")) == 160
+    assert memory.get_pool_stats()["size"] <= 4
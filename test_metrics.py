@@ -0,0 +1,85 @@
+import sys
+import os
+
+import pytest
+
+# Add parent directory to path to import tools
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools import metrics
+from tools.llm_client import LLMClient
+from test_llm_client import FlakyModel
+
+
+def test_histogram_buckets_and_render():
+    hist = metrics.histogram("test_latency_seconds", "Test latencies", ("route",), buckets=(0.1, 1.0))
+    hist.clear()
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(value, "/a")
+    with pytest.raises(ValueError):
+        hist.observe(0.2)
+
+    text = metrics.render()
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="1"} 3' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_count{route="/a"} 4' in text
+    # Registering the same name again returns the existing metric
+    assert metrics.histogram("test_latency_seconds", "Test latencies", ("route",)) is hist
+
+
+def test_instrument_methods_times_calls_and_counts_errors():
+    class Store:
+        def read(self):
+            return 1
+
+        def fail(self):
+            raise RuntimeError("locked")
+
+    hist = metrics.histogram("test_store_seconds", "Test store calls", ("component", "method"))
+    errors = metrics.counter("test_store_errors_total", "Test store errors", ("component", "method"))
+    metrics.instrument_methods(Store, hist, "Store", errors=errors)
+    # Instrumenting twice must not double-count
+    metrics.instrument_methods(Store, hist, "Store", errors=errors)
+
+    store = Store()
+    assert store.read() == 1
+    with pytest.raises(RuntimeError):
+        store.fail()
+    assert hist.count("Store", "read") == 1
+    assert hist.count("Store", "fail") == 1
+    assert errors.value("Store", "fail") == 1
+    assert errors.value("Store", "read") == 0
+
+
+def test_llm_attempts_labelled_by_agent():
+    client = LLMClient("models/metrics-test", backoff=0, model=FlakyModel(failures=1))
+    client.generate_json("hi", agent="TestAgent")
+
+    ok = metrics.LLM_CALL_SECONDS.count("TestAgent", "models/metrics-test", "ok")
+    failed = metrics.LLM_CALL_SECONDS.count("TestAgent", "models/metrics-test", "error")
+    assert (ok, failed) == (1, 1)
+    assert metrics.LLM_ERRORS.value("TestAgent", "models/metrics-test", "TimeoutError") == 1
+
+
+def test_sqlite_metrics_cover_queries_and_caught_errors(tmp_path):
+    from tools.user_database import UserDatabase
+    from tools.memory_bank import MemoryBank
+    assert getattr(UserDatabase.get_session, "_metrics_timed", False)
+    assert not getattr(UserDatabase.hash_password, "_metrics_timed", False)
+    assert not getattr(MemoryBank.update_concept_mastery, "_metrics_timed", False)
+
+    db = UserDatabase(db_path=str(tmp_path / "users.db"))
+    user_id = db.register_user("Metrics", "metrics@example.com", "secret")["user_id"]
+    replays = metrics.SQLITE_ERRORS.value("UserDatabase", "record_game_attempt")
+    # A replayed window is an answer, not a database error
+    assert db.record_game_attempt(user_id, 1, 10) and not db.record_game_attempt(user_id, 1, 20)
+    assert metrics.SQLITE_ERRORS.value("UserDatabase", "record_game_attempt") == replays
+
+    with db._get_conn() as conn:
+        conn.execute("DROP TABLE game_attempts")
+    before = metrics.SQLITE_ERRORS.value("UserDatabase", "has_played_window")
+    assert db.has_played_window(user_id, 1) is False
+    assert metrics.SQLITE_ERRORS.value("UserDatabase", "has_played_window") == before + 1
+    db.close()
@@ -0,0 +1,84 @@
+import sys
+import os
+import json
+
+import pytest
+
+# Add parent directory to path to import tools
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools import llm_client
+from tools.fake_llm import FakeModel, LatencyModel
+
+QUIZ = {"quiz_id": "q", "questions": [
+    {"id": "q1", "text": "What is 2 + 2?", "correct_answer": "4", "concepts": ["Addition"]},
+    {"id": "q2", "text": "What is 3 * 3?", "correct_answer": "9", "concepts": ["Multiplication"]},
+]}
+RESPONSES = {"student_id": "s1", "responses": [
+    {"question_id": "q1", "answer": "5"},
+    {"question_id": "q2", "answer": "9"},
+]}
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    from fastapi.testclient import TestClient
+
+    scratch = tmp_path_factory.mktemp("api")
+    with pytest.MonkeyPatch.context() as mp:
+        # Read when api is imported
+        mp.setenv("USER_DB_PATH", str(scratch / "users.db"))
+        mp.setenv("MEMORY_DB_PATH", str(scratch / "memory.db"))
+        mp.setenv("LLM_CACHE_DB_PATH", "")
+        mp.setenv("GRADING_POOL_SIZE", "0")
+        import api
+
+        shared = llm_client.get_client(api.diagnostic.model_name)
+        shared.use_model(FakeModel(latency=LatencyModel("fixed", mean_ms=0), ms_per_token=0))
+        try:
+            yield TestClient(api.app)
+        finally:
+            shared.use_model(None)
+
+
+def test_pipeline_run_json(client):
+    response = client.post("/pipeline/run", json={"quiz": QUIZ, "responses": RESPONSES, "stream": False})
+    assert response.status_code == 200
+    body = response.json()
+    assert [c["concept"] for c in body["diagnose"]["weak_concepts"]] == ["Addition"]
+    assert body["practice"]["practice_set"]
+    assert set(body["timings_ms"]) == {"normalize", "diagnose", "explain", "practice", "total"}
+
+    # The pipeline's state was saved, so its practice set can be submitted
+    submitted = client.post("/submit_practice", params={"pipeline_id": body["pipeline_id"]}, json={})
+    assert submitted.status_code == 200
+
+
+def test_pipeline_run_stream(client):
+    response = client.post("/pipeline/run", json={"quiz": QUIZ, "responses": RESPONSES})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\ndata: ", 1) for block in response.text.strip().split("\n\n")]
+    names = [event[len("event: "):] for event, _ in events]
+    assert names[:3] == ["pipeline", "normalize", "diagnose"]
+    assert sorted(names[3:5]) == ["explain", "practice"] and names[-1] == "done"
+    assert json.loads(events[-1][1])["pipeline_id"] == json.loads(events[0][1])["pipeline_id"]
+
+
+def test_pipeline_run_rejects_bad_input_before_streaming(client):
+    assert client.post("/pipeline/run", json={"responses": RESPONSES, "pipeline_id": "no-quiz"}).status_code == 400
+    malformed = {"student_id": "s1", "responses": ["not an object"]}
+    response = client.post("/pipeline/run", json={"quiz": QUIZ, "responses": malformed})
+    assert response.status_code == 400
+
+
+def test_failed_practice_generation_is_not_saved(client, monkeypatch):
+    import api
+
+    async def failing(weak_concepts):
+        return {"error": "model unavailable", "practice_set": []}
+
+    monkeypatch.setattr(api.practice, "generate_practice_async", failing)
+    body = client.post("/pipeline/run", json={"quiz": QUIZ, "responses": RESPONSES, "stream": False}).json()
+    assert body["practice"]["error"] == "model unavailable"
+    assert client.post("/submit_practice", params={"pipeline_id": body["pipeline_id"]}, json={}).status_code == 400
@@ -0,0 +1,60 @@
+import sys
+import os
+
+# Add parent directory to path to import tools
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools.pipeline_state import PipelineStateStore, MemoryStateBackend, SQLiteStateBackend
+
+
+def test_pipelines_are_isolated_and_expire():
+    store = PipelineStateStore(MemoryStateBackend(), ttl=60)
+    store.update("a", quiz={"quiz_id": "q1"})
+    store.update("b", weak_concepts=["Fractions"])
+    state = store.update("a", weak_concepts=["Algebra"])
+
+    assert state["quiz"] == {"quiz_id": "q1"} and state["weak_concepts"] == ["Algebra"]
+    assert store.get("b")["quiz"] is None
+    assert store.get("unknown")["practice_set"] is None
+
+    state, updated_at = store.backend.entries.get("a")
+    store.backend.entries.set("a", (state, updated_at - 120))
+    assert store.get("a")["quiz"] is None
+    # An expired pipeline starts over instead of merging into stale state
+    store.backend.entries.set("b", (store.backend.entries.get("b")[0], updated_at - 120))
+    assert store.update("b", practice_set={"questions": []})["weak_concepts"] == []
+
+
+def test_sqlite_backend_is_shared_between_workers(tmp_path):
+    db_path = str(tmp_path / "pipelines.db")
+    worker_a = PipelineStateStore(SQLiteStateBackend(db_path))
+    worker_b = PipelineStateStore(SQLiteStateBackend(db_path))
+
+    worker_a.update("p1", responses={"student_id": "s1"})
+    worker_b.update("p1", weak_concepts=["Algebra"])
+    state = worker_a.get("p1")
+    assert state["responses"] == {"student_id": "s1"}
+    assert state["weak_concepts"] == ["Algebra"]
+
+    worker_b.delete("p1")
+    assert worker_a.get("p1")["responses"] is None
+    assert worker_a.stats()["backend"] == "sqlite"
+
+
+def test_expiry_does_not_drop_a_concurrent_refresh(tmp_path):
+    for backend in (MemoryStateBackend(), SQLiteStateBackend(str(tmp_path / "pipelines.db"))):
+        store = PipelineStateStore(backend, ttl=60)
+        store.update("p1", quiz={"quiz_id": "q1"})
+        # This worker's load saw a stale row; another worker refreshed it just after
+        loads = []
+        fresh_load = backend.load
+
+        def stale_then_fresh(pipeline_id):
+            loads.append(pipeline_id)
+            state, updated_at = fresh_load(pipeline_id)
+            return (state, 0.0) if len(loads) == 1 else (state, updated_at)
+
+        backend.load = stale_then_fresh
+        assert store.get("p1")["quiz"] == {"quiz_id": "q1"}
+        assert store.stats()["expired"] == 0
+        assert fresh_load("p1") is not None
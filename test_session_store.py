@@ -0,0 +1,56 @@
+import sys
+import os
+
+import pytest
+
+# Add parent directory to path to import tools
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools.session_store import ChatSessionStore
+
+
+def test_append_and_history_in_memory():
+    store = ChatSessionStore()
+    sid = store.create("Physics", "beginner", "Class 10")
+    assert store.append(sid, {"role": "ai", "content": "Q1?"}) == 1
+    assert store.append(sid, {"role": "user", "content": "A1"}, {"role": "ai", "content": "Q2?", "is_correct": True}) == 3
+
+    session = store.get(sid)
+    assert session["subject"] == "Physics"
+    assert session["grade_level"] == "Class 10"
+    assert [m["content"] for m in session["messages"]] == ["Q1?", "A1", "Q2?"]
+    assert store.get("missing") is None
+    with pytest.raises(KeyError):
+        store.append("missing", {"role": "user", "content": "hi"})
+
+
+def test_lru_eviction_and_idle_ttl():
+    store = ChatSessionStore(max_sessions=2)
+    first = store.create("A")
+    store.create("B")
+    store.create("C")
+    assert store.get(first) is None
+    assert store.stats()["evicted"] == 1
+
+    store = ChatSessionStore(idle_ttl=60)
+    sid = store.create("A")
+    store.sessions.get(sid).last_active -= 120
+    assert store.get(sid) is None
+    assert store.stats()["expired"] == 1
+
+
+def test_persisted_sessions_reload_and_sync_across_workers(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    worker_a = ChatSessionStore(db_path=db_path)
+    worker_b = ChatSessionStore(db_path=db_path)
+
+    sid = worker_a.create("Chemistry")
+    worker_a.append(sid, {"role": "ai", "content": "Q1?"})
+    # Worker B has never seen the session; it loads it from disk and appends
+    assert worker_b.append(sid, {"role": "user", "content": "A1"}) == 2
+    # Worker A picks up B's message before its next append
+    assert worker_a.append(sid, {"role": "ai", "content": "Q2?"}) == 3
+    assert [m["content"] for m in worker_b.history(sid)] == ["Q1?", "A1", "Q2?"]
+
+    restarted = ChatSessionStore(db_path=db_path)
+    assert restarted.get(sid)["messages"] == worker_a.get(sid)["messages"]
@@ -0,0 +1,240 @@
+import sys
+import os
+import random
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+# Add parent directory to path to import tools
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools.user_database import UserDatabase, MIGRATIONS
+from tools import user_stats
+
+
+def make_db(tmp_path, **kwargs):
+    return UserDatabase(db_path=str(tmp_path / "users.db"), **kwargs)
+
+
+def test_pool_reuses_connections(tmp_path):
+    db = make_db(tmp_path)
+    result = db.register_user("Pool User", "pool@gmail.com", "secret")
+    user_id = result["user_id"]
+
+    for _ in range(20):
+        db.save_session(user_id, "Math", "beginner", 80, {"messages": []})
+        db.get_user_stats(user_id)
+
+    stats = db.get_pool_stats()
+    # Single-threaded use never needs more than one connection
+    assert stats["size"] == 1
+    assert stats["in_use"] == 0
+
+    # A nested checkout on the same thread reuses the caller's connection
+    with db._get_conn() as outer:
+        with db._get_conn() as inner:
+            assert inner is outer
+    assert db.get_pool_stats()["reentrant_checkouts"] == 1
+    db.close()
+
+
+def test_pool_pragmas_applied_once(tmp_path):
+    db = make_db(tmp_path)
+    with db._get_conn() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    db.close()
+
+
+def test_pool_is_bounded_across_threads(tmp_path):
+    db = make_db(tmp_path, pool_size=3)
+    user_id = db.register_user("Threads", "threads@gmail.com", "secret")["user_id"]
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(10):
+                assert db.save_session(user_id, "Science", "advanced", 50, {})["success"]
+                db.get_user_sessions(user_id, limit=5)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    stats = db.get_pool_stats()
+    assert stats["size"] <= 3
+    assert db.get_user_stats(user_id)["total_sessions"] == 80
+    db.close()
+
+
+def test_migrations_upgrade_legacy_db(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    # Pre-migration schema: no grade_level, no indexes, duplicate game attempts
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, email TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("CREATE TABLE game_attempts (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, window_id INTEGER NOT NULL, score INTEGER, completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.executemany("INSERT INTO game_attempts (user_id, window_id, score) VALUES (?, ?, ?)", [(1, 7, 100), (1, 7, 0)])
+    conn.commit()
+    conn.close()
+
+    db = UserDatabase(db_path=path)
+    assert db.schema_version == MIGRATIONS[-1].version
+    assert db.register_user("Legacy", "legacy@gmail.com", "secret", "Class 8")["grade_level"] == "Class 8"
+    assert db.get_last_game_attempt(1)["score"] == 100
+    # UNIQUE (user_id, window_id) now rejects replays at the storage level
+    assert db.record_game_attempt(1, 7, 50) is False
+    db.close()
+
+    # Re-opening is a no-op
+    assert UserDatabase(db_path=path).schema_version == MIGRATIONS[-1].version
+
+
+def test_db_migrated_to_v6_upgrades_to_streak_state(tmp_path):
+    from tools.migrations import migrate
+    path = str(tmp_path / "v6.db")
+    conn = sqlite3.connect(path)
+    migrate(conn, MIGRATIONS[:6])
+    today = date.today()
+    conn.executemany(
+        "INSERT INTO sessions (user_id, subject, difficulty, score, completed_at) VALUES (1, 'Math', 'easy', 90, ?)",
+        [((today - timedelta(days=d)).isoformat() + " 12:00:00",) for d in (1, 2)]
+    )
+    conn.commit()
+    # v6 as shipped ran rebuild_stats against the pre-v7 user_stats table
+    user_stats.rebuild_stats(conn.cursor())
+    conn.close()
+
+    db = UserDatabase(db_path=path)
+    assert db.schema_version == MIGRATIONS[-1].version
+    assert db.get_user_stats(1)["total_sessions"] == 2
+    with db._get_conn() as conn:
+        assert conn.execute("SELECT streak_length FROM user_stats WHERE user_id = 1").fetchone()[0] == 2
+    db.close()
+
+
+def test_upgrade_rebuilds_streaks_on_configured_timezone(tmp_path):
+    from tools.migrations import migrate
+    path = str(tmp_path / "v5.db")
+    conn = sqlite3.connect(path)
+    migrate(conn, MIGRATIONS[:5])
+    # 20:00 UTC is 01:30 the next morning in Kolkata
+    conn.executemany(
+        "INSERT INTO sessions (user_id, subject, difficulty, score, completed_at) VALUES (1, 'Math', 'easy', 90, ?)",
+        [("2026-01-01 20:00:00",), ("2026-01-02 20:00:00",)]
+    )
+    conn.commit()
+    conn.close()
+
+    db = UserDatabase(db_path=path, timezone="Asia/Kolkata")
+    with db._get_conn() as conn:
+        row = conn.execute("SELECT streak_length, last_streak_day FROM user_stats WHERE user_id = 1").fetchone()
+    assert row == (2, "2026-01-03")
+    db.close()
+
+
+def test_materialized_stats_match_rebuild(tmp_path):
+    db = make_db(tmp_path)
+    user_id = db.register_user("Stats", "stats@gmail.com", "secret")["user_id"]
+    for subject, score in [("Math", 80), ("Math", 55), ("Science", None), ("History", 100)]:
+        db.save_session(user_id, subject, "intermediate", score, {})
+
+    stats = db.get_user_stats(user_id)
+    assert stats["total_sessions"] == 4
+    assert stats["average_score"] == round((80 + 55 + 100) / 3, 1)
+    assert {s["subject"]: (s["count"], s["avg_score"]) for s in stats["subjects"]} == {
+        "History": (1, 100), "Math": (2, 67.5), "Science": (1, 0)
+    }
+    assert stats["streak"] == 1
+
+    db.rebuild_stats()
+    assert db.get_user_stats(user_id) == stats
+    assert db.get_user_stats(9999)["total_sessions"] == 0
+    db.close()
+
+
+def test_incremental_streak_matches_full_scan():
+    rng = random.Random(1234)
+    for _ in range(2000):
+        start = date(2025, 1, 1) + timedelta(days=rng.randint(0, 300))
+        # Random history with gaps, repeats and multi-day runs
+        days, day = [], start
+        for _ in range(rng.randint(0, 40)):
+            day += timedelta(days=rng.choice([0, 1, 1, 1, 2, 3, 10]))
+            days.append(day)
+
+        streak_length, last_day = 0, None
+        for d in days:
+            streak_length, last_day = user_stats.advance_streak(streak_length, last_day, d)
+
+        for offset in (0, 1, 2, 5):
+            today = (days[-1] if days else start) + timedelta(days=offset)
+            assert user_stats.current_streak(streak_length, last_day, today) == \
+                user_stats.full_scan_streak(days, today)
+
+
+def test_streak_state_in_database(tmp_path):
+    db = make_db(tmp_path)
+    user_id = db.register_user("Streak", "streak@gmail.com", "secret")["user_id"]
+    today = date.today()
+    # Backfill three consecutive days ending yesterday, then rebuild the state
+    with db._get_conn() as conn:
+        for back in (3, 2, 1):
+            conn.execute(
+                "INSERT INTO sessions (user_id, subject, difficulty, score, completed_at) VALUES (?, 'Math', 'beginner', 70, ?)",
+                (user_id, f"{today - timedelta(days=back)} 12:00:00")
+            )
+    db.rebuild_stats(user_id)
+    assert db.calculate_streak(user_id) == db.calculate_streak_full_scan(user_id) == 3
+
+    db.save_session(user_id, "Math", "beginner", 90, {})
+    assert db.calculate_streak(user_id) == db.calculate_streak_full_scan(user_id)
+    db.close()
+
+
+def test_streak_timezone_day_boundary():
+    from zoneinfo import ZoneInfo
+    # 20:00 UTC is already the next day in Kolkata (UTC+5:30)
+    assert user_stats.session_day("2025-03-01 20:00:00") == date(2025, 3, 1)
+    assert user_stats.session_day("2025-03-01 20:00:00", ZoneInfo("Asia/Kolkata")) == date(2025, 3, 2)
+
+
+def test_today_is_utc_day_near_midnight(monkeypatch):
+    from datetime import datetime, timezone
+
+    class HostInUTCPlus5(datetime):
+        # 23:30 UTC on Jan 1 is already Jan 2 on the server's local clock
+        @classmethod
+        def now(cls, tz=None):
+            moment = datetime(2024, 1, 1, 23, 30, tzinfo=timezone.utc)
+            return moment.astimezone(tz) if tz else datetime(2024, 1, 2, 4, 30)
+
+    monkeypatch.setattr(user_stats, "datetime", HostInUTCPlus5)
+    assert user_stats.today_for() == user_stats.session_day("2024-01-01 23:30:00") == date(2024, 1, 1)
+    # Yesterday's session still counts toward the streak
+    assert user_stats.current_streak(3, date(2023, 12, 31), user_stats.today_for()) == 3
+
+
+def test_transcripts_stored_separately(tmp_path):
+    db = make_db(tmp_path)
+    user_id = db.register_user("Transcript", "transcript@gmail.com", "secret")["user_id"]
+    transcript = {"messages": [{"role": "user", "content": "x + 6 " * 200}], "subject": "Math"}
+    session_id = db.save_session(user_id, "Math", "beginner", 75, transcript)["session_id"]
+
+    recent = db.get_user_sessions(user_id)
+    assert recent[0]["id"] == session_id
+    assert "session_data" not in recent[0]
+
+    with db._get_conn() as conn:
+        encoding, blob = conn.execute(
+            "SELECT encoding, data FROM session_transcripts WHERE session_id = ?", (session_id,)
+        ).fetchone()
+    assert encoding == "zlib" and len(blob) < len(str(transcript))
+
+    assert db.get_session(session_id, user_id)["session_data"] == transcript
+    assert db.get_session(session_id, user_id=user_id + 1) is None
+    db.close()
@@ -0,0 +1,171 @@
+"""
+Bounded conversation context for chat prompts.
+
+Every chat message is answered with the session's whole history at hand
+(from the session store). Rather than putting all of it in the prompt,
+``ConversationContext`` keeps the last ``keep_turns`` messages verbatim
+and folds everything older into a short rolling summary. The summary is
+cached per session_id and extended incrementally as turns age out of the
+window, so building the context costs the same at turn 10 and turn 1000.
+The summary plus recent turns are held under a ``max_tokens`` budget.
+
+Token counts are estimates (about 4 characters per token); the model's
+own prompt_token_count is still recorded by LLMClient.
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from tools.lru_cache import LRUCache
+
+Turn = Dict[str, str]
+# (previous summary, newly folded turns, token budget) -> new summary
+Summarizer = Callable[[str, List[Turn], int], str]
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _turn_text(turn: Turn) -> str:
+    return " ".join(str(turn.get("content", "")).split())
+
+
+def _fingerprint(turn: Turn) -> str:
+    return hashlib.sha1(json.dumps(turn, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max(max_chars - 1, 0)] + "…"
+
+
+def extractive_summary(previous: str, turns: List[Turn], max_tokens: int) -> str:
+    """
+    Default summarizer, no model call: one short line per folded turn,
+    keeping the newest lines that fit in the budget.
+    """
+    lines = previous.splitlines() if previous else []
+    for turn in turns:
+        role = "Tutor" if turn.get("role") in ("ai", "assistant", "model") else "Student"
+        lines.append(f"{role}: {_truncate(_turn_text(turn), 40)}")
+
+    kept, used = [], 0
+    for line in reversed(lines):
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(reversed(kept))
+
+
+class ContextWindow:
+    def __init__(self, summary: str, recent: List[Turn], summarized_turns: int, tokens: int):
+        self.summary = summary
+        self.recent = recent
+        self.summarized_turns = summarized_turns
+        self.tokens = tokens
+
+    def render(self) -> str:
+        """History block for the prompt"""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation ({self.summarized_turns} messages):\n{self.summary}")
+        parts.append(f"Recent messages:\n{json.dumps(self.recent)}")
+        return "\n\n".join(parts)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "context_tokens": self.tokens,
+            "verbatim_turns": len(self.recent),
+            "summarized_turns": self.summarized_turns,
+        }
+
+
+class ConversationContext:
+    def __init__(self, keep_turns: int = 6, max_tokens: int = 1500, summary_tokens: int = 300,
+                 summarizer: Optional[Summarizer] = None, max_sessions: int = 10000):
+        self.keep_turns = keep_turns
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer or extractive_summary
+        # session_id -> (folded count, first turn fingerprint, last folded fingerprint, summary)
+        self.summaries = LRUCache(maxsize=max_sessions)
+
+        # Metrics
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.incremental = 0
+        self.rebuilt = 0
+        self.tokens_total = 0
+        self.tokens_max = 0
+
+    def build(self, history: List[Turn], session_id: Optional[str] = None) -> ContextWindow:
+        history = [turn for turn in history if isinstance(turn, dict)]
+        split = max(len(history) - self.keep_turns, 0)
+        older, recent = history[:split], history[split:]
+
+        # A single very long message can't take the whole budget
+        per_turn = max(self.max_tokens // max(self.keep_turns, 1), 1)
+        recent = [dict(turn, content=_truncate(str(turn.get("content", "")), per_turn)) for turn in recent]
+
+        # Over budget: fold the oldest verbatim turns into the summary too
+        budget = self.max_tokens - self.summary_tokens
+        while len(recent) > 1 and self._tokens(recent) > budget:
+            older.append(history[split])
+            split += 1
+            recent.pop(0)
+
+        summary = self._summary(session_id, older) if older else ""
+        window = ContextWindow(summary, recent, len(older), estimate_tokens(summary) + self._tokens(recent))
+
+        with self._lock:
+            self.builds += 1
+            self.tokens_total += window.tokens
+            self.tokens_max = max(self.tokens_max, window.tokens)
+        return window
+
+    def _summary(self, session_id: Optional[str], older: List[Turn]) -> str:
+        first = _fingerprint(older[0])
+        cached = self.summaries.get(session_id) if session_id else None
+        if cached:
+            count, cached_first, cached_last, summary = cached
+            # Same conversation, grown since the cached summary: only fold the new turns
+            if count <= len(older) and cached_first == first and _fingerprint(older[count - 1]) == cached_last:
+                if count < len(older):
+                    summary = self.summarizer(summary, older[count:], self.summary_tokens)
+                    with self._lock:
+                        self.incremental += 1
+                self._remember(session_id, older, first, summary)
+                return summary
+
+        summary = self.summarizer("", older, self.summary_tokens)
+        with self._lock:
+            self.rebuilt += 1
+        if session_id:
+            self._remember(session_id, older, first, summary)
+        return summary
+
+    def _remember(self, session_id: str, older: List[Turn], first: str, summary: str):
+        self.summaries.set(session_id, (len(older), first, _fingerprint(older[-1]), summary))
+
+    @staticmethod
+    def _tokens(turns: List[Turn]) -> int:
+        return estimate_tokens(json.dumps(turns))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "builds": self.builds,
+                "summary_incremental": self.incremental,
+                "summary_rebuilt": self.rebuilt,
+                "context_tokens_avg": round(self.tokens_total / self.builds, 1) if self.builds else 0.0,
+                "context_tokens_max": self.tokens_max,
+                "sessions_cached": len(self.summaries),
+                "keep_turns": self.keep_turns,
+                "max_tokens": self.max_tokens,
+            }
@@ -0,0 +1,356 @@
+"""
+Deterministic local stand-in for the Gemini model, for load tests and
+offline benchmarks.
+
+``FakeModel`` has the same ``generate_content`` / ``generate_content_async``
+surface as ``genai.GenerativeModel`` (including ``stream=True``), so it
+goes through LLMClient's real timeout, retry, streaming and JSON parsing
+paths. Setting ``LLM_BACKEND=fake`` makes every LLMClient use it instead
+of Gemini; no API key is needed.
+
+Replies are valid for the prompt that asked for them. The prompt type is
+recognised from the templates (diagnostic, practice, explanation, summary,
+chat start/response, recommendations), and the JSON has the fields that
+template asks for: weak concepts taken from the wrong answers in the
+diagnostic data, one practice group or explanation per concept, and so
+on. Replies and injected faults are a pure function of (seed, prompt,
+how many times that prompt has been seen), so runs repeat exactly
+whatever the request interleaving. Per-prompt counts are kept for the
+``SEEN_PROMPTS`` most recently used prompts, so memory stays bounded in
+long load tests where every chat turn is a new prompt.
+
+Timing: a first-token latency drawn from ``latency`` (fixed, uniform,
+normal or lognormal), then ``ms_per_token`` per output token (about 4
+characters). Faults, each with its own rate:
+
+- ``error_rate``: ConnectionError, which LLMClient retries
+- ``timeout_rate``: hangs and then raises TimeoutError. Async calls hang
+  for ``hang_s``, and LLMClient's own timeout fires first. LLMClient only
+  applies its timeout to real SDK models on the sync path, so sync calls
+  give up after ``min(hang_s, timeout_s)`` themselves (``timeout_s``
+  defaults to LLM_TIMEOUT_S, the client's own timeout).
+- ``malformed_rate``: a truncated JSON reply
+
+Configured from LLM_FAKE_* environment variables by ``from_env``.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.lru_cache import LRUCache
+
+CHARS_PER_TOKEN = 4
+CHUNK_TOKENS = 4
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+# Prompts whose attempt count is remembered
+SEEN_PROMPTS = 100000
+
+
+class LatencyModel:
+    """First-token latency in ms: ``mean_ms`` with a relative ``spread``"""
+
+    def __init__(self, distribution: str = "lognormal", mean_ms: float = 400.0, spread: float = 0.4):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}; expected one of {DISTRIBUTIONS}")
+        self.distribution = distribution
+        self.mean_ms = mean_ms
+        self.spread = spread
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "fixed" or self.mean_ms <= 0:
+            return max(self.mean_ms, 0.0)
+        if self.distribution == "uniform":
+            return max(rng.uniform(self.mean_ms * (1 - self.spread), self.mean_ms * (1 + self.spread)), 0.0)
+        if self.distribution == "normal":
+            return max(rng.gauss(self.mean_ms, self.mean_ms * self.spread), 0.0)
+        # lognormal with the requested mean; spread is sigma
+        mu = math.log(self.mean_ms) - self.spread ** 2 / 2
+        return rng.lognormvariate(mu, self.spread)
+
+
+def _concept_list(match: Optional[re.Match]) -> List[str]:
+    if not match:
+        return ["General Understanding"]
+    concepts = [c.strip() for c in match.group(1).split(",") if c.strip()]
+    return concepts or ["General Understanding"]
+
+
+def _embedded_json(prompt: str, marker: str) -> Any:
+    start = prompt.find("{", max(prompt.find(marker), 0))
+    if start == -1:
+        return None
+    try:
+        return json.JSONDecoder().raw_decode(prompt[start:])[0]
+    except ValueError:
+        return None
+
+
+def _line_value(prompt: str, label: str, default: str) -> str:
+    match = re.search(rf"{label}:\s*(.+)", prompt)
+    return match.group(1).strip() if match else default
+
+
+def _arithmetic(rng: random.Random, level: int) -> Tuple[str, str]:
+    a, b = rng.randint(2, 9 * level + 1), rng.randint(2, 9 * level + 1)
+    if level == 1:
+        return f"What is {a} + {b}?", str(a + b)
+    if level == 2:
+        return f"What is {a} * {b}?", str(a * b)
+    return f"Solve for x: {a}x + {b} = {a * 3 + b}", "3"
+
+
+def _diagnostic(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    data = _embedded_json(prompt, "Input Data:") or {}
+    weak = []
+    for question in data.get("questions", []):
+        if str(question.get("student_answer")).strip() != str(question.get("correct_answer")).strip():
+            weak.extend(c for c in question.get("concepts", []) if c not in weak)
+    weak = weak or ["General Understanding"]
+    return {
+        "weak_concepts": [
+            {"concept": concept, "confidence": round(rng.uniform(0.6, 0.95), 2),
+             "reason": f"Answers involving {concept} did not match the key."}
+            for concept in weak
+        ],
+        "summary": f"Student {data.get('student_id', 'unknown')} needs practice with {', '.join(weak)}."
+    }
+
+
+def _practice(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    concepts = _concept_list(re.search(r"(?:weak concepts|questions for): (.+)", prompt))
+    practice_set = []
+    for concept in concepts:
+        questions = []
+        for level, difficulty in enumerate(("Easy", "Medium", "Hard"), start=1):
+            question, answer = _arithmetic(rng, level)
+            questions.append({"difficulty": difficulty, "question": f"[{concept}] {question}", "answer": answer,
+                              "solution": f"Work it through step by step to get {answer}."})
+        practice_set.append({"concept": concept, "questions": questions})
+    return {"practice_set": practice_set}
+
+
+def _explanation(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    concepts = _concept_list(re.search(r"Explain the following concepts[^:\n]*: (.+)", prompt))
+    return {"explanations": [
+        {"concept": concept,
+         "text": f"{concept} is about seeing how the parts of a problem relate. Start from what you know "
+                 f"and change one thing at a time.",
+         "analogy": rng.choice(["Like balancing a scale.", "Like following a recipe.", "Like reading a map."])}
+        for concept in concepts
+    ]}
+
+
+def _summary(prompt: str, rng: random.Random) -> str:
+    return ("# Progress Report\n\n"
+            "## Overall mastery\nMost concepts are progressing steadily.\n\n"
+            "## Needs attention\n- Concepts with mastery below 0.5\n\n"
+            f"## Next steps\n- Assign {rng.randint(2, 5)} short practice sets this week.\n")
+
+
+def _chat_start(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    subject = _line_value(prompt, "- Subject", "your subject")
+    question, _ = _arithmetic(rng, 1)
+    return {"message": f"Hello! I'm TutorMate, and I'll help you with {subject}.", "question": question}
+
+
+def _chat_response(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    is_correct = rng.random() < 0.6
+    question, _ = _arithmetic(rng, rng.randint(1, 3))
+    return {
+        "feedback": "That's right, nicely done! You kept each step balanced." if is_correct
+        else "Not quite. Check the second step again: what happens to both sides?",
+        "next_question": question,
+        "is_correct": is_correct,
+        "concept": (re.search(r"You are a tutor for (.+?)\.?\n", prompt) or [None, "General"])[1],
+        "difficulty": _line_value(prompt, "Difficulty Setting", "intermediate"),
+    }
+
+
+def _recommendations(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    concepts = _concept_list(re.search(r"Weak Concepts: (.+)", prompt))
+    channels = ["Khan Academy", "3Blue1Brown", "Crash Course", "The Organic Chemistry Tutor"]
+    return {"recommendations": [
+        {"title": f"{concepts[i % len(concepts)]} explained", "channel": rng.choice(channels),
+         "query": f"{concepts[i % len(concepts)]} tutorial"}
+        for i in range(3)
+    ]}
+
+
+# (prompt marker, reply builder); first match wins
+PROMPT_TYPES = [
+    ("diagnostician", _diagnostic),
+    ("identify weak concepts", _diagnostic),
+    ("practice set for the following weak concepts", _practice),
+    ("Generate practice questions for", _practice),
+    ("Explain the following concepts", _explanation),
+    ("progress report for a teacher", _summary),
+    ("Summarize student progress", _summary),
+    ("tutor named TutorMate", _chat_start),
+    ("Student's Last Answer", _chat_response),
+    ("educational counselor", _recommendations),
+]
+
+
+def prompt_type(prompt: str) -> str:
+    for marker, builder in PROMPT_TYPES:
+        if marker in prompt:
+            return builder.__name__.lstrip("_")
+    return "generic"
+
+
+def reply_for(prompt: str, rng: random.Random) -> str:
+    """Reply text for a prompt: fenced JSON for JSON prompts, markdown for the summary"""
+    for marker, builder in PROMPT_TYPES:
+        if marker in prompt:
+            reply = builder(prompt, rng)
+            break
+    else:
+        reply = {"text": "OK"}
+    if isinstance(reply, str):
+        return reply
+    text = json.dumps(reply, indent=2)
+    # Real replies come fenced about half the time
+    return f"```json\n{text}\n```" if rng.random() < 0.5 else text
+
+
+class FakeModel:
+    def __init__(self, model_name: str = "fake", latency: LatencyModel = None, ms_per_token: float = 2.0,
+                 error_rate: float = 0.0, timeout_rate: float = 0.0, malformed_rate: float = 0.0,
+                 hang_s: float = 120.0, seed: int = 0, timeout_s: float = None):
+        self.model_name = model_name
+        self.latency = latency or LatencyModel()
+        self.ms_per_token = ms_per_token
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.malformed_rate = malformed_rate
+        self.hang_s = hang_s
+        self.seed = seed
+        self.timeout_s = timeout_s if timeout_s is not None else float(os.getenv("LLM_TIMEOUT_S", "60"))
+
+        self._lock = threading.Lock()
+        self._seen = LRUCache(maxsize=SEEN_PROMPTS)
+        # Metrics
+        self.calls = 0
+        self.injected = {"errors": 0, "timeouts": 0, "malformed": 0}
+        self.by_type: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls, model_name: str = "fake") -> "FakeModel":
+        return cls(
+            model_name=model_name,
+            latency=LatencyModel(
+                distribution=os.getenv("LLM_FAKE_LATENCY_DIST", "lognormal"),
+                mean_ms=float(os.getenv("LLM_FAKE_LATENCY_MS", "400")),
+                spread=float(os.getenv("LLM_FAKE_LATENCY_SPREAD", "0.4"))
+            ),
+            ms_per_token=float(os.getenv("LLM_FAKE_MS_PER_TOKEN", "2")),
+            error_rate=float(os.getenv("LLM_FAKE_ERROR_RATE", "0")),
+            timeout_rate=float(os.getenv("LLM_FAKE_TIMEOUT_RATE", "0")),
+            malformed_rate=float(os.getenv("LLM_FAKE_MALFORMED_RATE", "0")),
+            hang_s=float(os.getenv("LLM_FAKE_HANG_S", "120")),
+            seed=int(os.getenv("LLM_FAKE_SEED", "0"))
+        )
+
+    def _plan(self, prompt: str) -> Dict[str, Any]:
+        """Everything about one call, decided up front from (seed, prompt, attempt)"""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        kind = prompt_type(prompt)
+        with self._lock:
+            attempt = self._seen.get(digest, 0)
+            self._seen.set(digest, attempt + 1)
+            self.calls += 1
+            self.by_type[kind] = self.by_type.get(kind, 0) + 1
+        # Faults and timing vary per attempt (so retries can succeed); content doesn't
+        rng = random.Random(f"{self.seed}:{digest}:{attempt}")
+        roll = rng.random()
+        fault = None
+        if roll < self.error_rate:
+            fault = "errors"
+        elif roll < self.error_rate + self.timeout_rate:
+            fault = "timeouts"
+        elif roll < self.error_rate + self.timeout_rate + self.malformed_rate:
+            fault = "malformed"
+        if fault:
+            with self._lock:
+                self.injected[fault] += 1
+
+        text = reply_for(prompt, random.Random(f"{self.seed}:{digest}"))
+        if fault == "malformed":
+            text = text[:max(len(text) // 2, 1)]
+        tokens = max(len(text) // CHARS_PER_TOKEN, 1)
+        return {
+            "fault": fault,
+            "text": text,
+            "first_token_s": self.latency.sample(rng) / 1000,
+            "per_chunk_s": self.ms_per_token * CHUNK_TOKENS / 1000,
+            "usage": SimpleNamespace(prompt_token_count=max(len(prompt) // CHARS_PER_TOKEN, 1),
+                                     candidates_token_count=tokens),
+        }
+
+    def _chunks(self, text: str) -> List[str]:
+        size = CHUNK_TOKENS * CHARS_PER_TOKEN
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def _output_s(self, plan: Dict[str, Any]) -> float:
+        return plan["usage"].candidates_token_count * self.ms_per_token / 1000
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        plan = self._plan(prompt)
+        if plan["fault"] == "errors":
+            time.sleep(plan["first_token_s"])
+            raise ConnectionError("Injected fake LLM error")
+        if plan["fault"] == "timeouts":
+            # Nothing times out a sync call on our behalf
+            time.sleep(min(self.hang_s, self.timeout_s))
+            raise TimeoutError("Injected fake LLM timeout")
+        if stream:
+            return self._stream_sync(plan)
+        time.sleep(plan["first_token_s"] + self._output_s(plan))
+        return SimpleNamespace(text=plan["text"], usage_metadata=plan["usage"])
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        plan = self._plan(prompt)
+        if plan["fault"] == "errors":
+            await asyncio.sleep(plan["first_token_s"])
+            raise ConnectionError("Injected fake LLM error")
+        if plan["fault"] == "timeouts":
+            await asyncio.sleep(self.hang_s)
+            raise TimeoutError("Injected fake LLM timeout")
+        if stream:
+            return self._stream_async(plan)
+        await asyncio.sleep(plan["first_token_s"] + self._output_s(plan))
+        return SimpleNamespace(text=plan["text"], usage_metadata=plan["usage"])
+
+    def _stream_sync(self, plan: Dict[str, Any]):
+        time.sleep(plan["first_token_s"])
+        chunks = self._chunks(plan["text"])
+        for i, chunk in enumerate(chunks):
+            yield SimpleNamespace(text=chunk, usage_metadata=plan["usage"] if i == len(chunks) - 1 else None)
+            time.sleep(plan["per_chunk_s"])
+
+    async def _stream_async(self, plan: Dict[str, Any]):
+        await asyncio.sleep(plan["first_token_s"])
+        chunks = self._chunks(plan["text"])
+        for i, chunk in enumerate(chunks):
+            yield SimpleNamespace(text=chunk, usage_metadata=plan["usage"] if i == len(chunks) - 1 else None)
+            await asyncio.sleep(plan["per_chunk_s"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "fake",
+                "calls": self.calls,
+                "by_prompt_type": dict(self.by_type),
+                "injected": dict(self.injected),
+                "latency": {"distribution": self.latency.distribution, "mean_ms": self.latency.mean_ms,
+                            "spread": self.latency.spread, "ms_per_token": self.ms_per_token},
+                "seed": self.seed,
+            }
@@ -0,0 +1,82 @@
+"""
+Per-concept fan-out for generation agents.
+
+Instead of one prompt covering every weak concept (one large, slow call
+where a single bad reply loses everything), the explanation and practice
+agents can issue one request per concept, at most ``limit`` at a time,
+and merge the replies. A concept that fails is reported in ``errors``
+while the others still come back. With a ResponseCache each concept's
+prompt is cached on its own, so a later request only sends the concepts
+the model hasn't answered before.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+Concept = Dict[str, Any]
+# (concept, reply or None, error message or None)
+Outcome = Tuple[Concept, Any, Any]
+
+
+def unique_concepts(weak_concepts: List[Concept]) -> List[Concept]:
+    seen = set()
+    unique = []
+    for concept in weak_concepts:
+        name = concept.get("concept")
+        if name not in seen:
+            seen.add(name)
+            unique.append(concept)
+    return unique
+
+
+def run_bounded(fn: Callable[[Concept], Any], concepts: List[Concept], limit: int) -> List[Outcome]:
+    """Call fn once per concept on up to ``limit`` threads; outcomes keep the input order"""
+    def call(concept):
+        try:
+            return concept, fn(concept), None
+        except Exception as e:
+            print(f"Error generating for concept {concept.get('concept')}: {e}")
+            return concept, None, str(e)
+
+    if len(concepts) <= 1:
+        return [call(concept) for concept in concepts]
+    with ThreadPoolExecutor(max_workers=max(min(limit, len(concepts)), 1)) as executor:
+        return list(executor.map(call, concepts))
+
+
+async def run_bounded_async(fn: Callable[[Concept], Awaitable[Any]], concepts: List[Concept], limit: int) -> List[Outcome]:
+    """Async run_bounded: at most ``limit`` calls in flight"""
+    semaphore = asyncio.Semaphore(max(limit, 1))
+
+    async def call(concept):
+        async with semaphore:
+            try:
+                return concept, await fn(concept), None
+            except Exception as e:
+                print(f"Error generating for concept {concept.get('concept')}: {e}")
+                return concept, None, str(e)
+
+    return list(await asyncio.gather(*(call(concept) for concept in concepts)))
+
+
+def merge_results(outcomes: List[Outcome], key: str) -> Dict[str, Any]:
+    """
+    Concatenate each reply's ``key`` list. Concepts whose call failed or
+    whose reply has no such list are listed under "errors"; if none
+    succeeded, "error" is set too, as a single all-concepts call would.
+    """
+    merged, errors = [], []
+    for concept, reply, error in outcomes:
+        if error is None and not (isinstance(reply, dict) and isinstance(reply.get(key), list)):
+            error = f"Reply has no '{key}' list"
+        if error is not None:
+            errors.append({"concept": concept.get("concept"), "error": error})
+        else:
+            merged.extend(reply[key])
+
+    result = {key: merged}
+    if errors:
+        result["errors"] = errors
+        if not merged:
+            result["error"] = errors[0]["error"]
+    return result
@@ -0,0 +1,235 @@
+"""
+Bounded process pool for symbolic answer checking.
+
+A single adversarial answer (``9^9^9^9``, deeply nested expressions) can keep
+SymPy busy for minutes. Checks therefore run in worker processes with a
+per-answer time limit and an address-space cap; a worker that overruns is
+killed and replaced, and the answer gets an undetermined verdict
+(``None``) instead of hanging the request thread.
+
+Answer keys are parsed once, in a worker, and the parsed form is sent
+along with every answer checked against them (see MathSolver.check_many),
+so no worker parses a key again.
+
+A new worker reports ready once SymPy/NumPy are imported; its start-up is
+waited for separately, so it never eats into the first answer's time limit.
+"""
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows: no address-space limit
+    resource = None
+
+# Verdict tiers for answers the pool gave up on
+TIMEOUT_TIER = "timeout"
+MEMORY_TIER = "memory_limit"
+ERROR_TIER = "error"
+
+# Sent once by a worker after its imports
+READY = "ready"
+
+
+def _worker_main(conn, memory_limit_mb: Optional[int]):
+    # Import before capping memory: SymPy/NumPy map a lot of address space up front
+    from tools.math_solver import MathSolver
+    solver = MathSolver()
+
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+    conn.send(READY)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        kind, args = task
+        try:
+            if kind == "parse":
+                result = (solver.parse_answer(args), "parsed")
+            else:
+                student_answer, correct_answer, parsed_key = args
+                if parsed_key is not None:
+                    solver.remember_parsed(correct_answer, parsed_key)
+                result = solver.check_answer(student_answer, correct_answer)
+        except MemoryError:
+            result = (None, MEMORY_TIER)
+        except Exception:
+            result = (None, ERROR_TIER)
+        try:
+            conn.send(result)
+        except MemoryError:
+            conn.send((None, MEMORY_TIER))
+
+
+class _Worker:
+    def __init__(self, ctx, memory_limit_mb):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, memory_limit_mb), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Wait for the worker's start-up handshake; False if it didn't come in time"""
+        if not self.ready:
+            self.ready = self.conn.poll(timeout) and self.conn.recv() == READY
+        return self.ready
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(1)
+        finally:
+            self.conn.close()
+
+
+class GradingPool:
+    def __init__(self, size: int = None, timeout: float = 5.0, memory_limit_mb: int = 1024,
+                 startup_timeout: float = 60.0, acquire_timeout: float = 30.0):
+        self.size = size or min(4, os.cpu_count() or 1)
+        self.timeout = timeout
+        # Spawning a worker and importing SymPy, not counted against `timeout`
+        self.startup_timeout = startup_timeout
+        # How long a check waits for a free worker before giving up
+        self.acquire_timeout = acquire_timeout
+        self.memory_limit_mb = memory_limit_mb
+        # spawn: forking a threaded server process is unsafe
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._closed = False
+        self._threads = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="grading")
+
+        # Metrics
+        self.checks = 0
+        self.parses = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.acquire_timeouts = 0
+        self.failed_starts = 0
+        atexit.register(self.close)
+
+    def _acquire(self) -> Optional[_Worker]:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._started < self.size:
+                self._started += 1
+                return _Worker(self._ctx, self.memory_limit_mb)
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            # Every worker is busy or stuck
+            with self._lock:
+                self.acquire_timeouts += 1
+            return None
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        with self._lock:
+            self.restarts += 1
+        self._idle.put(_Worker(self._ctx, self.memory_limit_mb))
+
+    def check_answer(self, student_answer: str, correct_answer: str, parsed_key=None) -> Tuple[Optional[bool], str]:
+        """
+        Check one answer in a worker; (None, tier) if it timed out or failed.
+        parsed_key is correct_answer as returned by parse_many, if known.
+        """
+        with self._lock:
+            self.checks += 1
+        return self._run(("check", (student_answer, correct_answer, parsed_key)))
+
+    def parse_many(self, answers: List[str]) -> List[Any]:
+        """
+        Parse answer keys in parallel across the workers, preserving order. Each
+        is MathSolver.parse_answer's result, or None if the pool gave up on it.
+        """
+        with self._lock:
+            self.parses += len(answers)
+        return [value for value, _ in self._map(lambda answer: self._run(("parse", answer)), answers)]
+
+    def _run(self, task) -> Tuple[Any, str]:
+        worker = self._acquire()
+        if worker is None:
+            return None, TIMEOUT_TIER
+        try:
+            if not worker.wait_ready(self.startup_timeout):
+                with self._lock:
+                    self.failed_starts += 1
+                self._replace(worker)
+                return None, ERROR_TIER
+            worker.conn.send(task)
+            if worker.conn.poll(self.timeout):
+                result = worker.conn.recv()
+                self._idle.put(worker)
+                return result
+        except (EOFError, OSError):
+            # Worker died (e.g. killed by the OS for memory)
+            self._replace(worker)
+            return None, MEMORY_TIER
+
+        with self._lock:
+            self.timeouts += 1
+        self._replace(worker)
+        return None, TIMEOUT_TIER
+
+    def check_many(self, pairs: List[tuple]) -> List[Tuple[Optional[bool], str]]:
+        """
+        Check several (student_answer, correct_answer[, parsed_key]) tuples in
+        parallel across the workers, preserving order
+        """
+        return self._map(lambda pair: self.check_answer(*pair), pairs)
+
+    def _map(self, fn, items):
+        if len(items) == 1:
+            return [fn(items[0])]
+        return list(self._threads.map(fn, items))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "workers_started": self._started,
+                "checks": self.checks,
+                "parses": self.parses,
+                "timeouts": self.timeouts,
+                "restarts": self.restarts,
+                "failed_starts": self.failed_starts,
+                "acquire_timeouts": self.acquire_timeouts,
+                "timeout_s": self.timeout,
+                "startup_timeout_s": self.startup_timeout,
+                "memory_limit_mb": self.memory_limit_mb,
+            }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._threads.shutdown(wait=False)
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
@@ -0,0 +1,187 @@
+"""
+Incremental parser for a streamed JSON object reply.
+
+The chat prompts ask the model for one flat JSON object. When the reply is
+streamed, ``JSONFieldStream`` is fed text chunks as they arrive and reports:
+
+- ``("delta", key, text)`` for each piece of a string value as it is
+  decoded, so feedback can be shown while it is still being generated
+- ``("field", key, value)`` once a value is complete
+
+Anything before the opening ``{`` (a ```json fence, chatter) is skipped.
+Nested objects and arrays are collected and decoded when they close.
+"""
+import json
+from typing import Any, Dict, List, Tuple
+
+Event = Tuple[str, str, Any]
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+# Returned by _string_char at the closing quote
+_END = object()
+
+# Parser states
+_BEFORE, _KEY_OR_END, _KEY, _COLON, _VALUE, _STRING, _SCALAR, _NESTED, _COMMA_OR_END, _DONE = range(10)
+
+
+class JSONFieldStream:
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._state = _BEFORE
+        self._key = []
+        self._current_key = None
+        self._value = []
+        self._escape = None  # None, "" after a backslash, or the \uXXXX digits so far
+        self._high_surrogate = ""  # \uD800-\uDBFF waiting for the \uDC00-\uDFFF escape after it
+        self._depth = 0
+        self._nested_in_string = False
+
+    def feed(self, chunk: str) -> List[Event]:
+        events = []
+        delta = []
+        for ch in chunk:
+            state = self._state
+            if state == _BEFORE:
+                if ch == "{":
+                    self._state = _KEY_OR_END
+            elif state == _KEY_OR_END:
+                if ch == '"':
+                    self._key = []
+                    self._state = _KEY
+                elif ch == "}":
+                    self._finish()
+            elif state == _KEY:
+                # Keys are short and plain; escapes are kept verbatim
+                if ch == '"' and not (self._key and self._key[-1] == "\\"):
+                    self._current_key = "".join(self._key)
+                    self._state = _COLON
+                else:
+                    self._key.append(ch)
+            elif state == _COLON:
+                if ch == ":":
+                    self._state = _VALUE
+            elif state == _VALUE:
+                if ch.isspace():
+                    continue
+                self._value = []
+                if ch == '"':
+                    self._state = _STRING
+                elif ch in "{[":
+                    self._value.append(ch)
+                    self._depth = 1
+                    self._nested_in_string = False
+                    self._state = _NESTED
+                else:
+                    self._value.append(ch)
+                    self._state = _SCALAR
+            elif state == _STRING:
+                decoded = self._string_char(ch)
+                if decoded is _END:
+                    lone = self._take_surrogate()
+                    if lone:
+                        self._value.append(lone)
+                        delta.append(lone)
+                    self._flush(events, delta)
+                    self._complete(events, "".join(self._value))
+                    self._state = _COMMA_OR_END
+                elif decoded:
+                    self._value.append(decoded)
+                    delta.append(decoded)
+            elif state == _SCALAR:
+                if ch in ",}" or ch.isspace():
+                    self._complete(events, self._decode("".join(self._value).strip()))
+                    self._state = _COMMA_OR_END
+                    self._after_value(ch)
+                else:
+                    self._value.append(ch)
+            elif state == _NESTED:
+                self._value.append(ch)
+                self._nested_char(ch)
+                if self._depth == 0:
+                    self._complete(events, self._decode("".join(self._value)))
+                    self._state = _COMMA_OR_END
+            elif state == _COMMA_OR_END:
+                self._after_value(ch)
+            # _DONE: ignore trailing text (closing fence etc.)
+        self._flush(events, delta)
+        return events
+
+    def _string_char(self, ch: str):
+        if self._escape is not None:
+            if self._escape == "":
+                if ch == "u":
+                    self._escape = "u"
+                    return None
+                self._escape = None
+                return self._take_surrogate() + _ESCAPES.get(ch, ch)
+            self._escape += ch
+            if len(self._escape) < 5:
+                return None
+            code, self._escape = self._escape[1:], None
+            try:
+                decoded = chr(int(code, 16))
+            except ValueError:
+                return self._take_surrogate()
+            if "\ud800" <= decoded <= "\udbff":
+                # Astral characters (emoji) arrive as a \uD83D\uDE00 pair
+                lone, self._high_surrogate = self._take_surrogate(), decoded
+                return lone
+            if "\udc00" <= decoded <= "\udfff" and self._high_surrogate:
+                pair, self._high_surrogate = self._high_surrogate + decoded, ""
+                return pair.encode("utf-16", "surrogatepass").decode("utf-16")
+            return self._take_surrogate() + decoded
+        if ch == "\\":
+            self._escape = ""
+            return None
+        if ch == '"':
+            return _END
+        return self._take_surrogate() + ch
+
+    def _take_surrogate(self) -> str:
+        # An unpaired high surrogate is kept as is, like json.loads does
+        lone, self._high_surrogate = self._high_surrogate, ""
+        return lone
+
+    def _nested_char(self, ch: str):
+        if self._nested_in_string:
+            if self._escape == "":
+                self._escape = None
+            elif ch == "\\":
+                self._escape = ""
+            elif ch == '"':
+                self._nested_in_string = False
+        elif ch == '"':
+            self._nested_in_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+
+    def _after_value(self, ch: str):
+        if ch == ",":
+            self._state = _KEY_OR_END
+        elif ch == "}":
+            self._finish()
+
+    def _finish(self):
+        self._state = _DONE
+        self.done = True
+
+    def _flush(self, events: List[Event], delta: List[str]):
+        if delta and self._current_key is not None:
+            events.append(("delta", self._current_key, "".join(delta)))
+        delta.clear()
+
+    def _complete(self, events: List[Event], value: Any):
+        self.fields[self._current_key] = value
+        events.append(("field", self._current_key, value))
+
+    @staticmethod
+    def _decode(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return raw
+
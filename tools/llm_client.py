@@ -0,0 +1,364 @@
+"""
+Shared Gemini client for all agents.
+
+Agents used to configure ``genai`` and build a fresh ``GenerativeModel`` on
+every request, each with its own copy of the JSON cleanup code. Here the
+SDK is configured once, there is one long-lived model handle (and so one
+underlying HTTP/gRPC channel) per model name, and every call goes through
+the same timeout, retry and JSON-extraction path. Each client keeps
+latency and token counters for its model, and every attempt is recorded
+in the /metrics histograms labelled with the calling agent's class.
+
+Every call has a sync and an ``_async`` form. Async routes use the SDK's
+``generate_content_async`` so a slow model call holds no worker thread.
+
+``LLM_BACKEND=fake`` swaps Gemini for the local FakeModel
+(tools/fake_llm.py) in every client, for load tests and offline runs.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from tools import metrics
+from tools.fake_llm import FakeModel
+
+try:
+    import google.generativeai as genai
+except ImportError:
+    genai = None
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+DEFAULT_MODEL = "models/gemini-2.5-flash"
+
+# Transient failures worth retrying; anything else (bad request, safety block) is not
+if google_exceptions is not None:
+    RETRYABLE_ERRORS = (
+        TimeoutError, ConnectionError,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+    )
+else:
+    RETRYABLE_ERRORS = (TimeoutError, ConnectionError)
+
+# How many recent calls to keep for latency percentiles
+RECENT_CALLS = 512
+
+_configured_key = None
+_configure_lock = threading.Lock()
+_clients_lock = threading.Lock()
+_clients: Dict[str, "LLMClient"] = {}
+
+
+def extract_json(text: str) -> Any:
+    """
+    Parse a model reply as JSON. Handles the usual ```json fences and
+    leading/trailing chatter around a single object or array; raises
+    ValueError if no JSON can be found.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        # ```json\n...\n``` (or a bare ``` fence)
+        text = text[text.find("\n") + 1:] if "\n" in text else text[3:]
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+        text = text.strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    # Fall back to the outermost {...} or [...] span
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if starts:
+        start = min(starts)
+        end = text.rfind("}" if text[start] == "{" else "]")
+        if end > start:
+            return json.loads(text[start:end + 1])
+    raise ValueError("No JSON found in model response")
+
+
+def _fake_backend() -> bool:
+    return os.getenv("LLM_BACKEND", "gemini").lower() == "fake"
+
+
+def _configure() -> bool:
+    """Configure the SDK once per API key; False if Gemini isn't usable"""
+    global _configured_key
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key or genai is None:
+        return False
+    if api_key != _configured_key:
+        with _configure_lock:
+            if api_key != _configured_key:
+                genai.configure(api_key=api_key)
+                _configured_key = api_key
+    return True
+
+
+class LLMClient:
+    def __init__(self, model_name: str = DEFAULT_MODEL, timeout: float = None, max_retries: int = None,
+                 backoff: float = 0.5, model=None):
+        self.model_name = model_name
+        self.timeout = timeout if timeout is not None else float(os.getenv("LLM_TIMEOUT_S", "60"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.backoff = backoff
+        # Pre-built handle (anything with generate_content), e.g. a stand-in for tests
+        self._model = model
+        self._model_lock = threading.Lock()
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.latency_total = 0.0
+        self.streams = 0
+        self.first_token_total = 0.0
+        self.recent = deque(maxlen=RECENT_CALLS)
+
+    @property
+    def available(self) -> bool:
+        """Whether calls can reach a model (otherwise agents return simulation data)"""
+        return self._model is not None or _fake_backend() or _configure()
+
+    def model(self):
+        """The long-lived model handle for this client's model name"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None and _fake_backend():
+                    self._model = FakeModel.from_env(self.model_name)
+                if self._model is None:
+                    if not _configure():
+                        raise RuntimeError("Missing API Key or genai module")
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def use_model(self, model):
+        """Swap in another model handle, e.g. a local stand-in for load tests"""
+        with self._model_lock:
+            self._model = model
+
+    def generate_text(self, prompt: str, agent: str = None) -> str:
+        """
+        Send one prompt, retrying transient failures, and return the reply
+        text. ``agent`` (the caller's class name) labels the call's metrics.
+        """
+        model = self.model()
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                if self._timeout_supported(model):
+                    response = model.generate_content(prompt, request_options={"timeout": self.timeout})
+                else:
+                    response = model.generate_content(prompt)
+                text = response.text
+            except RETRYABLE_ERRORS as e:
+                attempt = self._failed(start, attempt, e, agent)
+                time.sleep(self._backoff_delay(attempt))
+                continue
+            except Exception as e:
+                self._record(time.perf_counter() - start, None, ok=False, agent=agent, error=e)
+                raise
+            self._record(time.perf_counter() - start, getattr(response, "usage_metadata", None), ok=True, agent=agent)
+            return text
+
+    async def generate_text_async(self, prompt: str, agent: str = None) -> str:
+        """generate_text without blocking the event loop"""
+        model = self.model()
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                if hasattr(model, "generate_content_async"):
+                    if self._timeout_supported(model):
+                        call = model.generate_content_async(prompt, request_options={"timeout": self.timeout})
+                    else:
+                        call = model.generate_content_async(prompt)
+                else:
+                    # Handles without an async API run on a worker thread
+                    call = asyncio.to_thread(model.generate_content, prompt)
+                response = await asyncio.wait_for(call, self.timeout)
+                text = response.text
+            except RETRYABLE_ERRORS + (asyncio.TimeoutError,) as e:
+                attempt = self._failed(start, attempt, e, agent)
+                await asyncio.sleep(self._backoff_delay(attempt))
+                continue
+            except Exception as e:
+                self._record(time.perf_counter() - start, None, ok=False, agent=agent, error=e)
+                raise
+            self._record(time.perf_counter() - start, getattr(response, "usage_metadata", None), ok=True, agent=agent)
+            return text
+
+    async def stream_text_async(self, prompt: str, agent: str = None) -> AsyncIterator[str]:
+        """
+        Yield the reply text in chunks as the model produces them. Opening the
+        stream is retried like any call; once text has been yielded a failure
+        is raised to the caller, since the chunks can't be taken back.
+        Handles without a streaming API yield the whole reply as one chunk.
+        """
+        model = self.model()
+        if not hasattr(model, "generate_content_async"):
+            yield await self.generate_text_async(prompt, agent)
+            return
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                if self._timeout_supported(model):
+                    call = model.generate_content_async(prompt, stream=True, request_options={"timeout": self.timeout})
+                else:
+                    call = model.generate_content_async(prompt, stream=True)
+                response = await asyncio.wait_for(call, self.timeout)
+                break
+            except RETRYABLE_ERRORS + (asyncio.TimeoutError,) as e:
+                attempt = self._failed(start, attempt, e, agent)
+                await asyncio.sleep(self._backoff_delay(attempt))
+            except Exception as e:
+                self._record(time.perf_counter() - start, None, ok=False, agent=agent, error=e)
+                raise
+
+        first_token = None
+        usage = None
+        try:
+            async for chunk in response:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                text = chunk.text
+                if text:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    yield text
+        except Exception as e:
+            self._record(time.perf_counter() - start, None, ok=False, first_token=first_token, agent=agent, error=e)
+            raise
+        self._record(time.perf_counter() - start, usage, ok=True, first_token=first_token, agent=agent)
+
+    def _failed(self, start: float, attempt: int, error: Exception, agent: str = None) -> int:
+        """Record a transient failure; re-raises it once retries are used up"""
+        self._record(time.perf_counter() - start, None, ok=False, agent=agent, error=error)
+        if attempt >= self.max_retries:
+            raise
+        with self._stats_lock:
+            self.retries += 1
+        return attempt + 1
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** (attempt - 1))
+
+    def generate_json(self, prompt: str, cache=None, template_version: Any = None, agent: str = None) -> Dict[str, Any]:
+        """
+        generate_text + extract_json; unparseable replies come back as
+        {"raw_text": ...}. With a ResponseCache, an identical earlier prompt
+        (same model and template version) is answered from the cache, and
+        only successfully parsed replies are stored.
+        """
+        if cache is not None:
+            cached = cache.get(self.model_name, template_version, prompt)
+            if cached is not None:
+                return cached
+        result, parsed = self._parse_reply(self.generate_text(prompt, agent))
+        if cache is not None and parsed:
+            cache.set(self.model_name, template_version, prompt, result)
+        return result
+
+    async def generate_json_async(self, prompt: str, cache=None, template_version: Any = None,
+                                  agent: str = None) -> Dict[str, Any]:
+        """Async form of generate_json; cache reads and writes stay off the event loop"""
+        if cache is not None:
+            cached = await cache.get_async(self.model_name, template_version, prompt)
+            if cached is not None:
+                return cached
+        result, parsed = self._parse_reply(await self.generate_text_async(prompt, agent))
+        if cache is not None and parsed:
+            await cache.set_async(self.model_name, template_version, prompt, result)
+        return result
+
+    @staticmethod
+    def _parse_reply(text: str) -> Tuple[Any, bool]:
+        """(reply, whether it parsed); only parsed replies are worth caching"""
+        try:
+            return extract_json(text), True
+        except ValueError:
+            return {"raw_text": text.strip()}, False
+
+    @staticmethod
+    def _timeout_supported(model) -> bool:
+        # Only the real SDK model takes request_options
+        return genai is not None and isinstance(model, genai.GenerativeModel)
+
+    def _record(self, elapsed: float, usage, ok: bool, first_token: float = None, agent: str = None,
+                error: Exception = None):
+        agent = agent or "unknown"
+        metrics.LLM_CALL_SECONDS.observe(elapsed, agent, self.model_name, "ok" if ok else "error")
+        if error is not None:
+            metrics.LLM_ERRORS.inc(agent, self.model_name, type(error).__name__)
+        if first_token is not None:
+            metrics.LLM_FIRST_TOKEN_SECONDS.observe(first_token, agent, self.model_name)
+
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        with self._stats_lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+            self.latency_total += elapsed
+            call = {
+                "latency_ms": round(elapsed * 1000, 2),
+                "prompt_tokens": prompt_tokens,
+                "output_tokens": output_tokens,
+                "ok": ok,
+            }
+            if first_token is not None:
+                self.streams += 1
+                self.first_token_total += first_token
+                call["first_token_ms"] = round(first_token * 1000, 2)
+            self.recent.append(call)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            latencies = sorted(call["latency_ms"] for call in self.recent)
+            stats = {
+                "model": self.model_name,
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "latency_avg_ms": round(self.latency_total * 1000 / self.calls, 2) if self.calls else 0.0,
+                "latency_p95_ms": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+                "latency_max_ms": latencies[-1] if latencies else 0.0,
+                "streams": self.streams,
+                "first_token_avg_ms": round(self.first_token_total * 1000 / self.streams, 2) if self.streams else 0.0,
+                "recent_calls": list(self.recent)[-10:],
+            }
+        if isinstance(self._model, FakeModel):
+            stats["fake_model"] = self._model.stats()
+        return stats
+
+
+def get_client(model_name: str = DEFAULT_MODEL) -> LLMClient:
+    """The process-wide client for a model name, shared by every agent using it"""
+    client = _clients.get(model_name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.setdefault(model_name, LLMClient(model_name))
+    return client
+
+
+def all_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: client.stats() for name, client in list(_clients.items())}
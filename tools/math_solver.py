@@ -1,31 +1,252 @@
+import random
+import threading
+from collections import Counter
 import sympy
 from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application
+from tools.lru_cache import LRUCache
+from tools import metrics
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Shared by every MathSolver (and so every QuizRunner) in the process: an answer
+# key is parsed once per class, not once per student, and repeated
+# (student answer, key) pairs skip simplify entirely.
+PARSE_CACHE = LRUCache(maxsize=4096)
+VERDICT_CACHE = LRUCache(maxsize=65536)
+PROBE_CACHE = LRUCache(maxsize=4096)
+
+# Which tier decided each fresh (uncached) verdict
+TIER_COUNTS = Counter()
+_TIER_LOCK = threading.Lock()
+
+class _ParseFailed:
+    # Pickled by name, so a grading worker's verdict keeps its identity here
+    def __reduce__(self):
+        return "_PARSE_FAILED"
+
+
+_PARSE_FAILED = _ParseFailed()
+
+# Numeric probing: random points per symbol, and how close values must be
+PROBE_POINTS = 6
+PROBE_RTOL = 1e-9
+PROBE_ATOL = 1e-12
+
 
 class MathSolver:
-    def __init__(self):
+    def __init__(self, parse_cache: LRUCache = None, verdict_cache: LRUCache = None, fast_paths: bool = True,
+                 pool=None):
         self.transformations = (standard_transformations + (implicit_multiplication_application,))
+        self.parse_cache = parse_cache if parse_cache is not None else PARSE_CACHE
+        self.verdict_cache = verdict_cache if verdict_cache is not None else VERDICT_CACHE
+        # Exact / rational / numeric-probe tiers before falling back to simplify
+        self.fast_paths = fast_paths
+        # Optional GradingPool: run checks in time/memory-limited worker processes
+        self.pool = pool
+
+    def _parse(self, answer: str):
+        """Parse a cleaned answer, reusing the shared parse cache"""
+        expr = self.parse_cache.get(answer)
+        if expr is None:
+            try:
+                expr = parse_expr(answer, transformations=self.transformations)
+            except Exception as e:
+                print(f"Error parsing math answer {answer!r}: {e}")
+                expr = _PARSE_FAILED
+            self.parse_cache.set(answer, expr)
+        return expr
+
+    def parse_answer(self, answer: str):
+        """The parsed form of a cleaned answer as the checks see it (picklable)"""
+        return self._parse(answer.replace('^', '**'))
+
+    def remember_parsed(self, answer: str, parsed):
+        """Cache parse_answer's result for answer, e.g. one from a grading worker"""
+        self.parse_cache.set(answer.replace('^', '**'), parsed)
 
     def validate_answer(self, student_answer: str, correct_answer: str) -> bool:
         """
         Compares student answer with correct answer using SymPy to handle algebraic equivalence.
         """
+        return bool(self.check_answer(student_answer, correct_answer)[0])
+
+    def check_answer(self, student_answer: str, correct_answer: str):
+        """
+        Like validate_answer, but returns (is_correct, tier) where tier names the
+        check that decided: exact, rational, probe, simplify or fallback. With a
+        grading pool, is_correct is None (undetermined) if the check hit the
+        pool's time or memory limit.
+        """
+        return self.check_many([(student_answer, correct_answer)])[0]
+
+    def check_many(self, pairs):
+        """
+        Check several (student_answer, correct_answer) pairs. Identical pairs are
+        checked once; with a grading pool the rest run in parallel.
+        """
+        keys = [(self._clean(s), self._clean(c)) for s, c in pairs]
+        results = {}
+        pending = []
+        for key in dict.fromkeys(keys):
+            cached = self.verdict_cache.get(key)
+            if cached is not None:
+                results[key] = cached
+            elif key[0].replace('^', '**') == key[1].replace('^', '**') and self.fast_paths:
+                # Cheap and safe in-process, no need for a worker round trip
+                results[key] = self._record(key, (True, "exact"))
+            else:
+                pending.append(key)
+
+        if pending:
+            if self.pool is not None:
+                parsed = self._parse_keys_in_pool([key[1] for key in pending])
+                checked = self.pool.check_many([key + (parsed.get(key[1]),) for key in pending])
+            else:
+                checked = [self._check(*key) for key in pending]
+            for key, result in zip(pending, checked):
+                results[key] = self._record(key, tuple(result))
+
+        return [results[key] for key in keys]
+
+    def _parse_keys_in_pool(self, answer_keys):
+        """
+        Parse each answer key once: from the parse cache, or in a grading worker
+        (keys are model output too, so they get the same limits) and then cached
+        here. Keys the pool gave up on are left for the checking worker.
+        """
+        parsed, missing = {}, []
+        for answer in dict.fromkeys(answer_keys):
+            expr = self.parse_cache.get(answer.replace('^', '**'))
+            if expr is None:
+                missing.append(answer)
+            else:
+                parsed[answer] = expr
+        if missing:
+            for answer, expr in zip(missing, self.pool.parse_many(missing)):
+                if expr is not None:
+                    self.remember_parsed(answer, expr)
+                    parsed[answer] = expr
+        return parsed
+
+    @staticmethod
+    def _clean(answer) -> str:
+        # Model-generated keys are sometimes bare numbers rather than strings
+        return "" if answer is None else str(answer).strip()
+
+    def _record(self, key, result):
+        # An undetermined verdict (pool timeout, memory limit, worker error) may
+        # be transient; caching it would hand every later student the same None
+        if result[0] is not None:
+            self.verdict_cache.set(key, result)
+        with _TIER_LOCK:
+            TIER_COUNTS[result[1]] += 1
+        return result
+
+    def _check(self, student_answer: str, correct_answer: str):
+        # Clean up inputs
+        s_ans = student_answer.replace('^', '**')
+        c_ans = correct_answer.replace('^', '**')
+
+        if self.fast_paths and s_ans == c_ans:
+            return True, "exact"
+
+        # Parse expressions
+        expr1 = self._parse(s_ans)
+        expr2 = self._parse(c_ans)
+        if expr1 is _PARSE_FAILED or expr2 is _PARSE_FAILED:
+            # Fallback to string comparison if parsing fails
+            return student_answer == correct_answer, "fallback"
+
+        if self.fast_paths:
+            try:
+                if expr1.is_Rational and expr2.is_Rational:
+                    return expr1 == expr2, "rational"
+                verdict = self._probe(s_ans, expr1, c_ans, expr2)
+                if verdict is not None:
+                    return verdict, "probe"
+            except Exception:
+                # Tuples, relations, etc.: leave them to simplify as before
+                pass
+
         try:
-            # Clean up inputs
-            s_ans = student_answer.strip().replace('^', '**')
-            c_ans = correct_answer.strip().replace('^', '**')
-            
-            # Parse expressions
-            expr1 = parse_expr(s_ans, transformations=self.transformations)
-            expr2 = parse_expr(c_ans, transformations=self.transformations)
-            
             # Check for equality
             # simplify(expr1 - expr2) == 0 checks if they are algebraically equivalent
             diff = sympy.simplify(expr1 - expr2)
-            return diff == 0
+            return diff == 0, "simplify"
         except Exception as e:
             print(f"Error validating math answer: {e}")
-            # Fallback to string comparison if parsing fails
-            return student_answer.strip() == correct_answer.strip()
+            return student_answer == correct_answer, "fallback"
+
+    def _probe_fn(self, answer: str, expr, symbols):
+        key = (answer, tuple(str(sym) for sym in symbols))
+        fn = PROBE_CACHE.get(key)
+        if fn is None:
+            fn = sympy.lambdify(symbols, expr, modules="numpy")
+            PROBE_CACHE.set(key, fn)
+        return fn
+
+    def _probe(self, s_ans: str, expr1, c_ans: str, expr2):
+        """
+        Evaluate both expressions at a few random points (vectorized with NumPy).
+        Returns False if they clearly differ, True if they agree and both are
+        rational functions with exact coefficients (where agreement at random
+        points settles it), or None when simplify has to decide.
+        """
+        if np is None:
+            return None
+        symbols = sorted(expr1.free_symbols | expr2.free_symbols, key=str)
+        try:
+            # Seeded per pair so a verdict never depends on the process
+            rng = random.Random(f"{s_ans}|{c_ans}")
+            points = [np.array([rng.uniform(0.1, 3.0) for _ in range(PROBE_POINTS)]) for _ in symbols]
+            with np.errstate(all="ignore"):
+                v1 = np.broadcast_to(np.asarray(self._probe_fn(s_ans, expr1, symbols)(*points), dtype=complex), (PROBE_POINTS,))
+                v2 = np.broadcast_to(np.asarray(self._probe_fn(c_ans, expr2, symbols)(*points), dtype=complex), (PROBE_POINTS,))
+        except Exception:
+            return None
+
+        finite = np.isfinite(v1) & np.isfinite(v2)
+        if finite.sum() < 3:
+            return None
+        close = np.isclose(v1[finite], v2[finite], rtol=PROBE_RTOL, atol=PROBE_ATOL)
+        if not close.all():
+            return False
+        if symbols and all(self._is_exact_rational_function(e, symbols) for e in (expr1, expr2)):
+            # Float agreement can hide tiny exact differences (x + 10^20 vs x + 10^20 + 1),
+            # so confirm with exact rational arithmetic at random integer points
+            return self._exact_agree(expr1, expr2, symbols, rng)
+        return None
+
+    @staticmethod
+    def _is_exact_rational_function(expr, symbols) -> bool:
+        if expr.has(sympy.Float) or not expr.is_rational_function(*symbols):
+            return False
+        # Irrational constants (sqrt(2), pi) can't be compared exactly this way
+        return all(atom.is_Rational for atom in expr.atoms(sympy.Number, sympy.NumberSymbol))
+
+    @staticmethod
+    def _exact_agree(expr1, expr2, symbols, rng):
+        for _ in range(2):
+            point = {sym: sympy.Integer(rng.randint(1000, 10 ** 6)) for sym in symbols}
+            a, b = expr1.xreplace(point), expr2.xreplace(point)
+            if not (a.is_Rational and b.is_Rational):
+                return None
+            if a != b:
+                return False
+        return True
+
+    def cache_stats(self):
+        """Hit/miss counters for the caches, plus how many verdicts each tier decided"""
+        with _TIER_LOCK:
+            tiers = dict(TIER_COUNTS)
+        return {
+            "parse": self.parse_cache.stats(),
+            "verdict": self.verdict_cache.stats(),
+            "probe": PROBE_CACHE.stats(),
+            "tiers": tiers,
+        }
 
     def solve(self, problem: str) -> str:
         """
@@ -35,3 +256,7 @@ class MathSolver:
         # This is a placeholder for a more complex solver if needed.
         # For now, we mainly use it for validation.
         return "Solver not fully implemented for generation, use Gemini."
+
+
+# Every check (validate_answer, check_answer, QuizRunner) goes through check_many
+metrics.instrument_methods(MathSolver, metrics.GRADING_SECONDS, "MathSolver", methods=["check_many"])
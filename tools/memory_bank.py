@@ -1,41 +1,47 @@
-import sqlite3
 import json
 import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from tools.migrations import Migration, migrate
+from tools.sqlite_pool import SQLitePool
+from tools import metrics
 
-class MemoryBank:
-    def __init__(self, db_path: str = "tutor_memory.db"):
-        self.db_path = db_path
-        self._init_db()
 
-    def _init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Student Table
-        cursor.execute('''
+def _explode_history(cursor):
+    # One mastery_events row per entry of the old JSON history arrays
+    cursor.execute("SELECT student_id, concept_id, history FROM concept_mastery WHERE history IS NOT NULL")
+    for student_id, concept_id, history in cursor.fetchall():
+        try:
+            entries = json.loads(history)
+        except ValueError:
+            continue
+        cursor.executemany(
+            "INSERT INTO mastery_events (student_id, concept_id, ts, delta, mistake) VALUES (?, ?, ?, ?, ?)",
+            [(student_id, concept_id, e.get("timestamp"), e.get("score_delta"), e.get("mistake")) for e in entries]
+        )
+    cursor.execute("UPDATE concept_mastery SET history = NULL WHERE history IS NOT NULL")
+
+
+MIGRATIONS = [
+    Migration(1, "create students, concept_mastery and session_history tables", [
+        '''
             CREATE TABLE IF NOT EXISTS students (
                 student_id TEXT PRIMARY KEY,
                 name TEXT,
                 grade_level INTEGER
             )
-        ''')
-
-        # Concept Mastery Table
-        cursor.execute('''
+        ''',
+        '''
             CREATE TABLE IF NOT EXISTS concept_mastery (
                 student_id TEXT,
                 concept_id TEXT,
                 mastery_score REAL,
                 last_practiced TIMESTAMP,
                 last_mistake TEXT,
-                history TEXT, -- JSON string of history
+                history TEXT, -- JSON string of history (superseded by mastery_events)
                 PRIMARY KEY (student_id, concept_id)
             )
-        ''')
-
-        # Session History Table
-        cursor.execute('''
+        ''',
+        '''
             CREATE TABLE IF NOT EXISTS session_history (
                 session_id TEXT PRIMARY KEY,
                 student_id TEXT,
@@ -44,62 +50,132 @@ class MemoryBank:
                 responses TEXT, -- JSON
                 diagnosis TEXT -- JSON
             )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        ''',
+    ]),
+    Migration(2, "append-only mastery_events log", [
+        '''
+            CREATE TABLE IF NOT EXISTS mastery_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id TEXT NOT NULL,
+                concept_id TEXT NOT NULL,
+                ts TIMESTAMP,
+                delta REAL,
+                mistake TEXT
+            )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_mastery_events_concept ON mastery_events (student_id, concept_id, ts)",
+        _explode_history,
+    ]),
+]
+
+
+# Fixed SQL strings so each pooled connection reuses its prepared statements
+ADD_STUDENT_SQL = 'INSERT OR REPLACE INTO students VALUES (?, ?, ?)'
+INSERT_EVENT_SQL = 'INSERT INTO mastery_events (student_id, concept_id, ts, delta, mistake) VALUES (?, ?, ?, ?, ?)'
+UPSERT_MASTERY_SQL = '''
+    INSERT INTO concept_mastery (student_id, concept_id, mastery_score, last_practiced, last_mistake)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (student_id, concept_id) DO UPDATE SET
+        mastery_score = excluded.mastery_score,
+        last_practiced = excluded.last_practiced,
+        last_mistake = excluded.last_mistake
+'''
+CONCEPT_HISTORY_SQL = '''
+    SELECT ts, delta, mistake FROM mastery_events
+    WHERE student_id=? AND concept_id=?
+    ORDER BY ts DESC, id DESC LIMIT ?
+'''
+STUDENT_MASTERY_SQL = 'SELECT concept_id, mastery_score, last_practiced FROM concept_mastery WHERE student_id=?'
+LOG_SESSION_SQL = 'INSERT INTO session_history VALUES (?, ?, ?, ?, ?, ?)'
+
+
+class MemoryBank:
+    def __init__(self, db_path: str = "tutor_memory.db", pool_size: int = 4):
+        self.db_path = db_path
+        # Long-lived WAL connections with a busy timeout, shared across request threads
+        self.pool = SQLitePool(db_path, max_size=pool_size, timeout=30.0)
+        self._init_db()
+
+    def _get_conn(self):
+        """Check out a pooled connection (use as a context manager)"""
+        return self.pool.connection()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        return self.pool.stats()
+
+    def close(self):
+        self.pool.close()
+
+    def _init_db(self):
+        with self._get_conn() as conn:
+            migrate(conn, MIGRATIONS)
 
     def add_student(self, student_id: str, name: str, grade_level: int):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('INSERT OR REPLACE INTO students VALUES (?, ?, ?)', (student_id, name, grade_level))
-        conn.commit()
-        conn.close()
+        with self._get_conn() as conn:
+            conn.execute(ADD_STUDENT_SQL, (student_id, name, grade_level))
 
     def update_concept_mastery(self, student_id: str, concept_id: str, score_delta: float, mistake_summary: str = None):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get current state
-        cursor.execute('SELECT mastery_score, history FROM concept_mastery WHERE student_id=? AND concept_id=?', (student_id, concept_id))
-        row = cursor.fetchone()
-        
-        current_score = 0.0
-        history = []
-        
-        if row:
-            current_score = row[0]
-            if row[1]:
-                history = json.loads(row[1])
-        
-        new_score = max(0.0, min(1.0, current_score + score_delta))
-        history.append({
-            "timestamp": datetime.datetime.now().isoformat(),
-            "score_delta": score_delta,
-            "mistake": mistake_summary
-        })
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO concept_mastery (student_id, concept_id, mastery_score, last_practiced, last_mistake, history)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (student_id, concept_id, new_score, datetime.datetime.now().isoformat(), mistake_summary, json.dumps(history)))
-        
-        conn.commit()
-        conn.close()
+        self.update_concept_mastery_many(student_id, [(concept_id, score_delta, mistake_summary)])
+
+    def update_concept_mastery_many(self, student_id: str, updates: List[Tuple[str, float, Optional[str]]]):
+        """
+        Apply several (concept_id, score_delta, mistake_summary) updates in one
+        transaction. Deltas are grouped by concept and applied in order, so the
+        result matches calling update_concept_mastery once per update.
+        """
+        if not updates:
+            return
+
+        by_concept: Dict[str, List[Tuple[float, Optional[str]]]] = {}
+        for concept_id, score_delta, mistake_summary in updates:
+            by_concept.setdefault(concept_id, []).append((score_delta, mistake_summary))
+
+        with self._get_conn() as conn:
+            # Take the write lock before reading so concurrent submits for the
+            # same student serialize instead of losing updates
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            now = datetime.datetime.now().isoformat()
+            
+            # Get current state for every touched concept at once
+            placeholders = ",".join("?" * len(by_concept))
+            cursor.execute(f'SELECT concept_id, mastery_score FROM concept_mastery WHERE student_id=? AND concept_id IN ({placeholders})',
+                           (student_id, *by_concept))
+            current = dict(cursor.fetchall())
+            
+            events, rows = [], []
+            for concept_id, deltas in by_concept.items():
+                score = current.get(concept_id, 0.0)
+                for score_delta, mistake_summary in deltas:
+                    score = max(0.0, min(1.0, score + score_delta))
+                    events.append((student_id, concept_id, now, score_delta, mistake_summary))
+                # last_mistake follows the most recent update, as before
+                rows.append((student_id, concept_id, score, now, deltas[-1][1]))
+            
+            # History is an append-only log; the mastery row only carries the current score
+            cursor.executemany(INSERT_EVENT_SQL, events)
+            cursor.executemany(UPSERT_MASTERY_SQL, rows)
+
+    def get_concept_history(self, student_id: str, concept_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Most recent mastery events for a concept, newest first"""
+        with self._get_conn() as conn:
+            rows = conn.execute(CONCEPT_HISTORY_SQL, (student_id, concept_id, -1 if limit is None else limit)).fetchall()
+        return [{"timestamp": r[0], "score_delta": r[1], "mistake": r[2]} for r in rows]
 
     def get_student_mastery(self, student_id: str) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT concept_id, mastery_score, last_practiced FROM concept_mastery WHERE student_id=?', (student_id,))
-        rows = cursor.fetchall()
-        conn.close()
+        with self._get_conn() as conn:
+            rows = conn.execute(STUDENT_MASTERY_SQL, (student_id,)).fetchall()
         return [{"concept_id": r[0], "mastery_score": r[1], "last_practiced": r[2]} for r in rows]
 
     def log_session(self, session_id: str, student_id: str, quiz_data: Dict, responses: Dict, diagnosis: Dict):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('INSERT INTO session_history VALUES (?, ?, ?, ?, ?, ?)',
-                       (session_id, student_id, datetime.datetime.now().isoformat(), 
-                        json.dumps(quiz_data), json.dumps(responses), json.dumps(diagnosis)))
-        conn.commit()
-        conn.close()
+        with self._get_conn() as conn:
+            conn.execute(LOG_SESSION_SQL,
+                         (session_id, student_id, datetime.datetime.now().isoformat(),
+                          json.dumps(quiz_data), json.dumps(responses), json.dumps(diagnosis)))
+
+
+# Per-method timings and failures on /metrics; update_concept_mastery is
+# timed through update_concept_mastery_many
+metrics.instrument_methods(MemoryBank, metrics.SQLITE_SECONDS, "MemoryBank", methods=[
+    "add_student", "update_concept_mastery_many", "get_concept_history", "get_student_mastery", "log_session",
+], errors=metrics.SQLITE_ERRORS)
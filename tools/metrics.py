@@ -0,0 +1,317 @@
+"""
+Prometheus-style metrics for the API.
+
+One process-wide registry of counters and histograms, rendered in the
+Prometheus text exposition format (0.0.4) by GET /metrics. Recording a
+value is a bisect, a dict lookup and a few additions under the metric's
+lock, cheap enough for every request, model call, SQLite query and
+grading check. Numbers that components already keep themselves (cache
+hits and misses, pool counters) are read by collectors at scrape time
+rather than being counted twice.
+
+Each uvicorn worker has its own registry; scrape every worker, or run one.
+"""
+import bisect
+import inspect
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; from a cached SQLite read up to a model call near its timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# A collector returns families: (name, type, help, [(labels, value), ...])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+_registry_lock = threading.Lock()
+_metrics: Dict[str, "_Metric"] = {}
+_collectors: Dict[str, Callable[[], Iterable[Family]]] = {}
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # label values tuple -> series
+        self._series: Dict[Tuple[str, ...], Any] = {}
+
+    def _check(self, labels: Tuple[str, ...]):
+        # Only on a series' first use, so the hot path stays a dict lookup
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {labels}")
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            value = self._series.get(labels)
+            if value is None:
+                self._check(labels)
+                value = 0.0
+            self._series[labels] = value + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._series.get(labels, 0.0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, (), value) for labels, value in self._series.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        # First bucket whose upper bound is >= value; the last slot is +Inf
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                self._check(labels)
+                # [per-bucket counts, sum, count]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the seconds spent in its block"""
+        return _Timer(self, labels)
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            series = self._series.get(labels)
+            return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            snapshot = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        samples = []
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((self.name + "_bucket", labels, (("le", _format_value(bound)),), cumulative))
+            samples.append((self.name + "_sum", labels, (), total))
+            samples.append((self.name + "_count", labels, (), count))
+        return samples
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+def _register(cls, name: str, *args, **kwargs):
+    # Get-or-create, so modules imported twice (tests, reloads) share one series
+    with _registry_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter, name, help, labelnames)
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram, name, help, labelnames, buckets)
+
+
+def register_collector(name: str, collect: Callable[[], Iterable[Family]]):
+    """Call ``collect`` on every scrape; registering a name again replaces it"""
+    with _registry_lock:
+        _collectors[name] = collect
+
+
+def instrument_methods(cls, metric: Histogram, component: str, methods: Sequence[str] = None,
+                       errors: Counter = None):
+    """
+    Time calls to ``cls``'s methods into ``metric`` with labels (component,
+    method), counting raised exceptions in ``errors``. By default every
+    public plain function defined on the class is wrapped. Returns cls.
+    """
+    if methods is None:
+        methods = [name for name, value in vars(cls).items()
+                   if inspect.isfunction(value) and not name.startswith("_")]
+    for name in methods:
+        fn = vars(cls)[name]
+        if getattr(fn, "_metrics_timed", False):
+            continue
+        setattr(cls, name, _timed(fn, metric, (component, name), errors))
+    return cls
+
+
+def _timed(fn, metric: Histogram, labels: Tuple[str, ...], errors: Counter = None):
+    observe = metric.observe
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            if errors is not None:
+                errors.inc(*labels)
+            raise
+        finally:
+            observe(time.perf_counter() - start, *labels)
+
+    wrapper._metrics_timed = True
+    return wrapper
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request into HTTP_REQUEST_SECONDS,
+    labelled with the matched route's path template (so /dashboard/{user_id}
+    is one series, not one per user) or "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            # Returns once the last body chunk is sent, streams included
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"],
+                                         getattr(route, "path", "unmatched"), str(status))
+
+
+def cache_families(caches: Dict[str, Dict[str, Any]]) -> List[Family]:
+    """
+    Hit, miss and size families for caches given as name -> stats dict with
+    "hits", "misses" and optionally "size" (LRUCache.stats() shape).
+    """
+    hits, misses, ratios, sizes = [], [], [], []
+    for name, stats in caches.items():
+        labels = {"cache": name}
+        lookups = stats["hits"] + stats["misses"]
+        hits.append((labels, stats["hits"]))
+        misses.append((labels, stats["misses"]))
+        ratios.append((labels, stats["hits"] / lookups if lookups else 0.0))
+        if stats.get("size") is not None:
+            sizes.append((labels, stats["size"]))
+    return [
+        ("tutormate_cache_hits_total", "counter", "Cache lookups answered from the cache", hits),
+        ("tutormate_cache_misses_total", "counter", "Cache lookups that missed", misses),
+        ("tutormate_cache_hit_ratio", "gauge", "Hits / lookups since start", ratios),
+        ("tutormate_cache_entries", "gauge", "Entries currently held", sizes),
+    ]
+
+
+def render() -> str:
+    """Every metric and collector in the Prometheus text format"""
+    with _registry_lock:
+        metrics = list(_metrics.values())
+        collectors = list(_collectors.items())
+
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {_escape_help(metric.help)}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, values, extra, value in metric.samples():
+            pairs = tuple(zip(metric.labelnames, values)) + extra
+            lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+
+    for collector_name, collect in collectors:
+        try:
+            families = list(collect())
+        except Exception as e:
+            print(f"Metrics collector {collector_name} failed: {e}")
+            continue
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {_escape_help(help)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(tuple(labels.items()))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(pairs: Tuple[Tuple[str, str], ...]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + "}"
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# Recorded across the app
+HTTP_REQUEST_SECONDS = histogram(
+    "tutormate_http_request_seconds", "Time from request to the last byte of the response",
+    ("method", "route", "status"))
+LLM_CALL_SECONDS = histogram(
+    "tutormate_llm_call_seconds", "Model call attempts, including failed and retried ones",
+    ("agent", "model", "outcome"))
+LLM_FIRST_TOKEN_SECONDS = histogram(
+    "tutormate_llm_first_token_seconds", "Time to the first streamed chunk", ("agent", "model"))
+LLM_ERRORS = counter(
+    "tutormate_llm_errors_total", "Failed model call attempts by exception type", ("agent", "model", "error"))
+SQLITE_SECONDS = histogram(
+    "tutormate_sqlite_seconds", "Database method calls", ("component", "method"))
+SQLITE_ERRORS = counter(
+    "tutormate_sqlite_errors_total", "Database method calls that raised", ("component", "method"))
+GRADING_SECONDS = histogram(
+    "tutormate_grading_seconds", "Answer checking and quiz grading", ("component", "method"))
@@ -0,0 +1,80 @@
+import sqlite3
+from datetime import datetime
+from typing import Callable, List, Union
+
+
+Step = Union[str, Callable]
+
+
+class Migration:
+    """
+    A single schema step. ``apply`` is a SQL statement, a callable taking a
+    cursor (for steps that need to inspect existing data), or a list of either.
+    """
+
+    def __init__(self, version: int, description: str, apply: Union[Step, List[Step]]):
+        self.version = version
+        self.description = description
+        self.apply = apply
+
+    def run(self, cursor: sqlite3.Cursor):
+        steps = self.apply if isinstance(self.apply, list) else [self.apply]
+        for step in steps:
+            if callable(step):
+                step(cursor)
+            else:
+                cursor.execute(step)
+
+
+def column_exists(cursor: sqlite3.Cursor, table: str, column: str) -> bool:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='schema_version'"
+    ).fetchone()
+    if not row:
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, migrations: List[Migration]) -> int:
+    """
+    Apply every migration newer than the recorded schema version, in order,
+    inside a single write transaction. Safe to call from several processes
+    at startup: the first one takes the write lock and the rest see the
+    bumped version and do nothing. Returns the resulting schema version.
+    """
+    if conn.in_transaction:
+        conn.commit()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP
+            )
+        ''')
+        current = get_schema_version(conn)
+
+        for migration in sorted(migrations, key=lambda m: m.version):
+            if migration.version <= current:
+                continue
+            print(f"Migrating database: v{migration.version} {migration.description}")
+            migration.run(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (migration.version, migration.description, datetime.utcnow().isoformat())
+            )
+            current = migration.version
+
+        conn.commit()
+        return current
+    except Exception:
+        conn.rollback()
+        raise
@@ -0,0 +1,199 @@
+"""
+Per-pipeline state for the ingest -> diagnose -> practice -> submit flow.
+
+Each student's run through the pipeline (quiz, responses, normalized data,
+diagnosis, weak concepts, practice set) is kept under its own pipeline_id
+instead of in one process-global dict, so several students can go through
+it at once. State expires ``ttl`` seconds after its last update.
+
+Two backends:
+
+- ``MemoryStateBackend``: in-process LRU. Fast, but each worker process
+  has its own, so only for a single worker.
+- ``SQLiteStateBackend``: one JSON row per pipeline in a SQLite file that
+  every worker opens, so consecutive requests of a pipeline can land on
+  different uvicorn workers.
+
+Both implement ``load``/``update``/``delete``/``expire``/``purge``/``stats``;
+``update`` merges fields atomically (per process for memory, across
+processes for SQLite).
+"""
+import json
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from tools.lru_cache import LRUCache
+from tools.migrations import Migration, migrate
+from tools.sqlite_pool import SQLitePool
+
+
+EMPTY_STATE = {
+    "quiz": None,
+    "responses": None,
+    "normalized": None,
+    "diagnosis": None,
+    "weak_concepts": [],
+    "practice_set": None
+}
+
+MIGRATIONS = [
+    Migration(1, "create pipeline_state table", [
+        '''
+            CREATE TABLE IF NOT EXISTS pipeline_state (
+                pipeline_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL, -- JSON
+                updated_at REAL NOT NULL
+            )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_pipeline_state_updated_at ON pipeline_state (updated_at)",
+    ]),
+]
+
+GET_STATE_SQL = 'SELECT state, updated_at FROM pipeline_state WHERE pipeline_id = ?'
+PUT_STATE_SQL = 'INSERT OR REPLACE INTO pipeline_state (pipeline_id, state, updated_at) VALUES (?, ?, ?)'
+DELETE_STATE_SQL = 'DELETE FROM pipeline_state WHERE pipeline_id = ?'
+EXPIRE_STATE_SQL = 'DELETE FROM pipeline_state WHERE pipeline_id = ? AND updated_at < ?'
+PURGE_STATE_SQL = 'DELETE FROM pipeline_state WHERE updated_at < ?'
+
+# Purge expired rows from SQLite every N updates
+PURGE_EVERY = 500
+
+
+class MemoryStateBackend:
+    def __init__(self, maxsize: int = 10000):
+        self.entries = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def load(self, pipeline_id: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        entry = self.entries.get(pipeline_id)
+        return (dict(entry[0]), entry[1]) if entry else None
+
+    def update(self, pipeline_id: str, fields: Dict[str, Any], now: float, expire_before: float) -> Dict[str, Any]:
+        with self._lock:
+            entry = self.entries.get(pipeline_id)
+            state = dict(entry[0]) if entry and entry[1] >= expire_before else {}
+            state.update(fields)
+            self.entries.set(pipeline_id, (state, now))
+            return dict(state)
+
+    def delete(self, pipeline_id: str):
+        self.entries.pop(pipeline_id)
+
+    def expire(self, pipeline_id: str, expire_before: float) -> bool:
+        """Delete the entry only if it is still older than expire_before"""
+        with self._lock:
+            entry = self.entries.get(pipeline_id)
+            if entry is None or entry[1] >= expire_before:
+                return False
+            self.entries.pop(pipeline_id)
+            return True
+
+    def purge(self, expire_before: float) -> int:
+        # Expired entries are dropped on read; the LRU bounds the rest
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "pipelines": len(self.entries), "evicted": self.entries.evictions}
+
+
+class SQLiteStateBackend:
+    def __init__(self, db_path: str, pool_size: int = 4):
+        self.pool = SQLitePool(db_path, max_size=pool_size)
+        with self.pool.connection() as conn:
+            migrate(conn, MIGRATIONS)
+
+    def load(self, pipeline_id: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        with self.pool.connection() as conn:
+            row = conn.execute(GET_STATE_SQL, (pipeline_id,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def update(self, pipeline_id: str, fields: Dict[str, Any], now: float, expire_before: float) -> Dict[str, Any]:
+        with self.pool.connection() as conn:
+            # Read-merge-write under the write lock so concurrent steps from other workers aren't lost
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(GET_STATE_SQL, (pipeline_id,)).fetchone()
+            state = json.loads(row[0]) if row and row[1] >= expire_before else {}
+            state.update(fields)
+            conn.execute(PUT_STATE_SQL, (pipeline_id, json.dumps(state), now))
+        return state
+
+    def delete(self, pipeline_id: str):
+        with self.pool.connection() as conn:
+            conn.execute(DELETE_STATE_SQL, (pipeline_id,))
+
+    def expire(self, pipeline_id: str, expire_before: float) -> bool:
+        # Conditional, so a refresh by another worker since our load survives
+        with self.pool.connection() as conn:
+            return conn.execute(EXPIRE_STATE_SQL, (pipeline_id, expire_before)).rowcount > 0
+
+    def purge(self, expire_before: float) -> int:
+        with self.pool.connection() as conn:
+            return conn.execute(PURGE_STATE_SQL, (expire_before,)).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self.pool.connection() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM pipeline_state").fetchone()[0]
+        return {"backend": "sqlite", "pipelines": count, "pool": self.pool.stats()}
+
+
+class PipelineStateStore:
+    def __init__(self, backend=None, ttl: float = 3600):
+        self.backend = backend or MemoryStateBackend()
+        self.ttl = ttl
+
+        # Metrics
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.updates = 0
+        self.expired = 0
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def get(self, pipeline_id: str) -> Dict[str, Any]:
+        """Current state of a pipeline; an unknown or expired id reads as a fresh pipeline"""
+        entry = self.backend.load(pipeline_id)
+        with self._lock:
+            self.reads += 1
+        if entry is None:
+            return dict(EMPTY_STATE)
+        state, updated_at = entry
+        expire_before = time.time() - self.ttl
+        if updated_at < expire_before:
+            if not self.backend.expire(pipeline_id, expire_before):
+                # Refreshed (or deleted) since the load; read it again
+                entry = self.backend.load(pipeline_id)
+                return {**EMPTY_STATE, **entry[0]} if entry else dict(EMPTY_STATE)
+            with self._lock:
+                self.expired += 1
+            return dict(EMPTY_STATE)
+        return {**EMPTY_STATE, **state}
+
+    def update(self, pipeline_id: str, **fields) -> Dict[str, Any]:
+        """Merge fields into a pipeline's state and refresh its TTL; returns the new state"""
+        now = time.time()
+        state = self.backend.update(pipeline_id, fields, now, now - self.ttl)
+        with self._lock:
+            self.updates += 1
+            purge = self.updates % PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+        return {**EMPTY_STATE, **state}
+
+    def delete(self, pipeline_id: str):
+        self.backend.delete(pipeline_id)
+
+    def purge_expired(self) -> int:
+        purged = self.backend.purge(time.time() - self.ttl)
+        with self._lock:
+            self.expired += purged
+        return purged
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {"reads": self.reads, "updates": self.updates, "expired": self.expired, "ttl_s": self.ttl}
+        stats.update(self.backend.stats())
+        return stats
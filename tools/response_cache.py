@@ -0,0 +1,189 @@
+"""
+Content-addressed cache for generated LLM content.
+
+Explanations, practice sets and video recommendations depend only on the
+prompt (concepts, subject, difficulty, template) and the model, so an
+identical request can reuse an earlier reply. Entries are keyed on a hash
+of (model name, prompt template version, whitespace-normalized prompt) and
+kept in two tiers: an in-process LRU and an optional SQLite table that
+survives restarts and is shared by every worker on the host. Both tiers
+expire entries after ``ttl`` seconds; the SQLite tier is also trimmed to
+``max_rows`` least recently used entries. "Recently used" is coarse: a disk
+hit only writes last_used back once it is TOUCH_AFTER of the TTL old, so
+reads don't queue behind the database write lock.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from tools.lru_cache import LRUCache
+from tools.migrations import Migration, migrate
+from tools.sqlite_pool import SQLitePool
+
+
+MIGRATIONS = [
+    Migration(1, "create llm_cache table", [
+        '''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                template_version TEXT NOT NULL,
+                value TEXT NOT NULL, -- JSON
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)",
+    ]),
+]
+
+GET_SQL = 'SELECT value, expires_at, last_used FROM llm_cache WHERE key = ?'
+TOUCH_SQL = 'UPDATE llm_cache SET last_used = ? WHERE key = ?'
+PUT_SQL = '''
+    INSERT OR REPLACE INTO llm_cache (key, model, template_version, value, created_at, expires_at, last_used)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+DELETE_SQL = 'DELETE FROM llm_cache WHERE key = ?'
+PURGE_EXPIRED_SQL = 'DELETE FROM llm_cache WHERE expires_at <= ?'
+TRIM_SQL = '''
+    DELETE FROM llm_cache WHERE key IN (
+        SELECT key FROM llm_cache ORDER BY last_used ASC
+        LIMIT MAX((SELECT COUNT(*) FROM llm_cache) - ?, 0)
+    )
+'''
+
+# Trim the SQLite tier every N stores rather than on every write
+TRIM_EVERY = 100
+# Fraction of the TTL after which a disk hit refreshes the entry's last_used
+TOUCH_AFTER = 0.1
+
+
+def make_key(model_name: str, template_version: Any, prompt: str) -> str:
+    """Cache key for a prompt; whitespace differences don't produce new entries"""
+    normalized = " ".join(prompt.split())
+    raw = f"{model_name}\x00{template_version}\x00{normalized}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, db_path: Optional[str] = "llm_cache.db", maxsize: int = 1024, ttl: float = 86400,
+                 max_rows: int = 20000):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        # Memory tier holds (expires_at, JSON text); callers always get a fresh copy
+        self.memory = LRUCache(maxsize=maxsize)
+        self.pool = SQLitePool(db_path, max_size=4) if db_path else None
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                migrate(conn, MIGRATIONS)
+
+        # Metrics
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stores = 0
+        self.trimmed = 0
+
+    def get(self, model_name: str, template_version: Any, prompt: str) -> Optional[Any]:
+        """Cached reply for this prompt, or None"""
+        return self._get(make_key(model_name, template_version, prompt))
+
+    def set(self, model_name: str, template_version: Any, prompt: str, value: Any):
+        self._set(make_key(model_name, template_version, prompt), model_name, template_version, value)
+
+    async def get_async(self, model_name: str, template_version: Any, prompt: str) -> Optional[Any]:
+        """get for async callers; the SQLite tier is read on a worker thread, off the event loop"""
+        if self.pool is None:
+            return self.get(model_name, template_version, prompt)
+        return await asyncio.to_thread(self.get, model_name, template_version, prompt)
+
+    async def set_async(self, model_name: str, template_version: Any, prompt: str, value: Any):
+        if self.pool is None:
+            self.set(model_name, template_version, prompt, value)
+        else:
+            await asyncio.to_thread(self.set, model_name, template_version, prompt, value)
+
+    def _get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        entry = self.memory.get(key)
+        if entry is not None:
+            expires_at, text = entry
+            if expires_at > now:
+                self._count("memory_hits")
+                return json.loads(text)
+            self._count("expired")
+
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                row = conn.execute(GET_SQL, (key,)).fetchone()
+                if row and row[1] > now:
+                    if now - row[2] >= self.ttl * TOUCH_AFTER:
+                        conn.execute(TOUCH_SQL, (now, key))
+                    self.memory.set(key, (row[1], row[0]))
+                    self._count("disk_hits")
+                    return json.loads(row[0])
+                if row:
+                    conn.execute(DELETE_SQL, (key,))
+                    self._count("expired")
+
+        self._count("misses")
+        return None
+
+    def _set(self, key: str, model_name: str, template_version: Any, value: Any):
+        now = time.time()
+        expires_at = now + self.ttl
+        text = json.dumps(value)
+        self.memory.set(key, (expires_at, text))
+        with self._lock:
+            self.stores += 1
+            trim = self.stores % TRIM_EVERY == 0
+
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                conn.execute(PUT_SQL, (key, model_name, str(template_version), text, now, expires_at, now))
+                if trim:
+                    removed = conn.execute(PURGE_EXPIRED_SQL, (now,)).rowcount
+                    removed += conn.execute(TRIM_SQL, (self.max_rows,)).rowcount
+                    self._count("trimmed", removed)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def clear(self):
+        self.memory.clear()
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        rows = None
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                rows = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "stores": self.stores,
+                "trimmed": self.trimmed,
+                "memory_size": len(self.memory),
+                "memory_evictions": self.memory.evictions,
+                "disk_rows": rows,
+                "ttl_s": self.ttl,
+            }
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
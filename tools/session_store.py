@@ -0,0 +1,253 @@
+"""
+Server-side chat session store.
+
+Chat clients used to resend the whole conversation with every message and
+again for analysis, so request bodies grew with the square of the session
+length. Sessions now live here, keyed by session_id: messages are appended
+one at a time as the conversation happens, and /chat/message and
+/chat/analyze read the history from the store.
+
+Sessions are held in an in-process LRU (``max_sessions``) and expire after
+``idle_ttl`` seconds without activity. With a ``db_path`` every session
+and message is also written through to SQLite, so sessions survive a
+restart and are visible to every worker process: before a read, the
+store checks the message count on disk and pulls in anything another
+worker appended.
+
+Each session is guarded by one of ``LOCK_STRIPES`` locks chosen by its id,
+held across that session's SQLite I/O, so turns in different sessions
+don't queue behind each other's disk writes.
+"""
+import json
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from tools.lru_cache import LRUCache
+from tools.migrations import Migration, migrate
+from tools.sqlite_pool import SQLitePool
+
+
+MIGRATIONS = [
+    Migration(1, "create chat_sessions and chat_messages tables", [
+        '''
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                subject TEXT,
+                difficulty TEXT,
+                grade_level TEXT,
+                created_at REAL NOT NULL,
+                last_active REAL NOT NULL
+            )
+        ''',
+        '''
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                message TEXT NOT NULL, -- JSON
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_active ON chat_sessions (last_active)",
+    ]),
+]
+
+INSERT_SESSION_SQL = '''
+    INSERT OR REPLACE INTO chat_sessions (session_id, subject, difficulty, grade_level, created_at, last_active)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+GET_SESSION_SQL = 'SELECT subject, difficulty, grade_level, created_at, last_active FROM chat_sessions WHERE session_id = ?'
+MESSAGE_COUNT_SQL = 'SELECT COALESCE(MAX(seq) + 1, 0) FROM chat_messages WHERE session_id = ?'
+MESSAGES_FROM_SQL = 'SELECT message FROM chat_messages WHERE session_id = ? AND seq >= ? ORDER BY seq'
+INSERT_MESSAGE_SQL = 'INSERT INTO chat_messages (session_id, seq, message) VALUES (?, ?, ?)'
+TOUCH_SESSION_SQL = 'UPDATE chat_sessions SET last_active = ? WHERE session_id = ?'
+DELETE_MESSAGES_SQL = 'DELETE FROM chat_messages WHERE session_id = ?'
+DELETE_SESSION_SQL = 'DELETE FROM chat_sessions WHERE session_id = ?'
+EXPIRED_SESSIONS_SQL = 'SELECT session_id FROM chat_sessions WHERE last_active < ?'
+
+# Purge expired sessions from SQLite every N appends
+PURGE_EVERY = 1000
+
+# Per-session locks, shared by ids that hash alike
+LOCK_STRIPES = 64
+
+
+class ChatSession:
+    def __init__(self, session_id: str, subject: str, difficulty: str, grade_level: str,
+                 created_at: float, last_active: float, messages: List[Dict[str, Any]] = None):
+        self.session_id = session_id
+        self.subject = subject
+        self.difficulty = difficulty
+        self.grade_level = grade_level
+        self.created_at = created_at
+        self.last_active = last_active
+        self.messages = messages or []
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Snapshot in the session_data shape /chat/analyze and UserDatabase.save_session use"""
+        return {
+            "session_id": self.session_id,
+            "subject": self.subject,
+            "difficulty": self.difficulty,
+            "grade_level": self.grade_level,
+            "messages": list(self.messages),
+        }
+
+
+class ChatSessionStore:
+    def __init__(self, db_path: Optional[str] = None, max_sessions: int = 10000, idle_ttl: float = 7200):
+        self.idle_ttl = idle_ttl
+        self.sessions = LRUCache(maxsize=max_sessions)
+        # Counters only; never held across I/O
+        self._lock = threading.Lock()
+        # Reentrant: an expired session is deleted while its lock is held
+        self._session_locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+        self.pool = SQLitePool(db_path, max_size=4) if db_path else None
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                migrate(conn, MIGRATIONS)
+
+        # Metrics
+        self.created = 0
+        self.appended = 0
+        self.expired = 0
+        self.loaded = 0
+
+    @property
+    def persistent(self) -> bool:
+        return self.pool is not None
+
+    def create(self, subject: str, difficulty: str = "intermediate", grade_level: str = "College Year 1",
+               session_id: Optional[str] = None) -> str:
+        """Start a session and return its id"""
+        now = time.time()
+        session = ChatSession(session_id or uuid.uuid4().hex, subject, difficulty, grade_level, now, now)
+        with self._session_lock(session.session_id):
+            if self.pool is not None:
+                with self.pool.connection() as conn:
+                    conn.execute(DELETE_MESSAGES_SQL, (session.session_id,))
+                    conn.execute(INSERT_SESSION_SQL, (session.session_id, subject, difficulty, grade_level, now, now))
+            self.sessions.set(session.session_id, session)
+        self._count("created")
+        return session.session_id
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Session snapshot (metadata and messages), or None if unknown or expired"""
+        with self._session_lock(session_id):
+            session = self._load(session_id)
+            return session.to_dict() if session else None
+
+    def history(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._session_lock(session_id):
+            session = self._load(session_id)
+            return list(session.messages) if session else None
+
+    def append(self, session_id: str, *messages: Dict[str, Any]) -> int:
+        """Append messages to a session; returns the new message count"""
+        now = time.time()
+        with self._session_lock(session_id):
+            session = self._load(session_id)
+            if session is None:
+                raise KeyError(session_id)
+            if self.pool is not None:
+                with self.pool.connection() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    # Another worker may have appended since _load synced
+                    seq = conn.execute(MESSAGE_COUNT_SQL, (session_id,)).fetchone()[0]
+                    if seq != len(session.messages):
+                        self._sync(conn, session)
+                    conn.executemany(INSERT_MESSAGE_SQL, [
+                        (session_id, seq + i, json.dumps(message)) for i, message in enumerate(messages)
+                    ])
+                    conn.execute(TOUCH_SESSION_SQL, (now, session_id))
+            session.messages.extend(messages)
+            session.last_active = now
+            count = len(session.messages)
+        with self._lock:
+            self.appended += len(messages)
+            purge = self.pool is not None and self.appended % PURGE_EVERY < len(messages)
+        if purge:
+            self.purge_expired()
+        return count
+
+    def delete(self, session_id: str):
+        with self._session_lock(session_id):
+            self.sessions.pop(session_id)
+            if self.pool is not None:
+                with self.pool.connection() as conn:
+                    conn.execute(DELETE_MESSAGES_SQL, (session_id,))
+                    conn.execute(DELETE_SESSION_SQL, (session_id,))
+
+    def purge_expired(self) -> int:
+        """Drop sessions idle longer than idle_ttl from SQLite; returns how many"""
+        if self.pool is None:
+            return 0
+        cutoff = time.time() - self.idle_ttl
+        with self.pool.connection() as conn:
+            expired = [row[0] for row in conn.execute(EXPIRED_SESSIONS_SQL, (cutoff,)).fetchall()]
+            conn.executemany(DELETE_MESSAGES_SQL, [(sid,) for sid in expired])
+            conn.executemany(DELETE_SESSION_SQL, [(sid,) for sid in expired])
+        self._count("expired", len(expired))
+        return len(expired)
+
+    def _session_lock(self, session_id: str):
+        return self._session_locks[hash(session_id) % LOCK_STRIPES]
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _load(self, session_id: str) -> Optional[ChatSession]:
+        """The live session; callers hold its session lock"""
+        if not session_id:
+            return None
+        now = time.time()
+        session = self.sessions.get(session_id)
+
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                if session is None:
+                    row = conn.execute(GET_SESSION_SQL, (session_id,)).fetchone()
+                    if row is None:
+                        return None
+                    session = ChatSession(session_id, *row)
+                    self.sessions.set(session_id, session)
+                    self._count("loaded")
+                else:
+                    # Pick up activity from other workers before judging idleness
+                    row = conn.execute("SELECT last_active FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+                    if row is None:
+                        self.sessions.pop(session_id)
+                        return None
+                    session.last_active = max(session.last_active, row[0])
+                if now - session.last_active <= self.idle_ttl:
+                    if conn.execute(MESSAGE_COUNT_SQL, (session_id,)).fetchone()[0] != len(session.messages):
+                        self._sync(conn, session)
+
+        if session is None:
+            return None
+        if now - session.last_active > self.idle_ttl:
+            self.delete(session_id)
+            self._count("expired")
+            return None
+        return session
+
+    @staticmethod
+    def _sync(conn, session: ChatSession):
+        rows = conn.execute(MESSAGES_FROM_SQL, (session.session_id, len(session.messages))).fetchall()
+        session.messages.extend(json.loads(row[0]) for row in rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions_in_memory": len(self.sessions),
+                "max_sessions": self.sessions.maxsize,
+                "evicted": self.sessions.evictions,
+                "created": self.created,
+                "messages_appended": self.appended,
+                "expired": self.expired,
+                "loaded_from_disk": self.loaded,
+                "persistent": self.persistent,
+                "idle_ttl_s": self.idle_ttl,
+            }
@@ -0,0 +1,150 @@
+import sqlite3
+import threading
+import time
+import queue
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+
+# PRAGMAs applied once when a connection is opened, instead of on every checkout
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",        # Write-Ahead Logging for concurrency
+    "synchronous": "NORMAL",      # Safe with WAL, avoids an fsync per commit
+    "mmap_size": 268435456,       # 256MB memory-mapped I/O
+    "cache_size": -16000,         # ~16MB page cache per connection
+}
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class SQLitePool:
+    """
+    Bounded, thread-safe pool of SQLite connections.
+
+    Connections are opened lazily up to ``max_size`` and reused across threads
+    (FastAPI runs sync routes in a worker threadpool). A thread that already
+    holds a connection gets the same one back on a nested checkout, so helper
+    methods calling each other never need a second connection or deadlock
+    waiting on the pool.
+    """
+
+    def __init__(self, db_path: str, max_size: int = 8, timeout: float = 30.0,
+                 checkout_timeout: float = 30.0, pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.checkout_timeout = checkout_timeout
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._all = []
+
+        # Metrics
+        self._checkouts = 0
+        self._reused = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._in_use = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if len(self._all) < self.max_size:
+                    conn = self._connect()
+                    self._all.append(conn)
+            if conn is None:
+                try:
+                    conn = self._idle.get(timeout=self.checkout_timeout)
+                except queue.Empty:
+                    raise PoolTimeout(f"No connection available for {self.db_path} after {self.checkout_timeout}s")
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of the ``with`` block.
+        The outermost block commits on success and rolls back on error.
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            with self._lock:
+                self._reused += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool metrics: size, usage, checkouts and time spent waiting for a connection"""
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "max_size": self.max_size,
+                "size": len(self._all),
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "reentrant_checkouts": self._reused,
+                "wait_total_ms": round(self._wait_total * 1000, 3),
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+                "wait_avg_ms": round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+            }
+
+    def close(self):
+        """Close every connection owned by the pool"""
+        with self._lock:
+            conns, self._all = self._all, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
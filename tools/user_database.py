@@ -1,61 +1,183 @@
 import sqlite3
 import hashlib
 import json
-from datetime import datetime
+from zoneinfo import ZoneInfo
 import time
+import zlib
+from tools.sqlite_pool import SQLitePool
+from tools.migrations import Migration, migrate, column_exists, get_schema_version
+from tools import user_stats
+from tools import metrics
+
+
+def _add_grade_level(cursor):
+    # Databases created before grade_level existed
+    if not column_exists(cursor, "users", "grade_level"):
+        cursor.execute("ALTER TABLE users ADD COLUMN grade_level TEXT")
+
+
+def _dedupe_game_attempts(cursor):
+    # Keep the first attempt per (user, window) so the UNIQUE index can be built
+    cursor.execute('''
+        DELETE FROM game_attempts
+        WHERE id NOT IN (SELECT MIN(id) FROM game_attempts GROUP BY user_id, window_id)
+    ''')
+
+
+def _add_last_streak_day(cursor):
+    if not column_exists(cursor, "user_stats", "last_streak_day"):
+        cursor.execute("ALTER TABLE user_stats ADD COLUMN last_streak_day TEXT")
+
+
+# Transcripts smaller than this are stored as plain JSON; compression doesn't pay off
+TRANSCRIPT_COMPRESS_MIN_BYTES = 512
+
+
+def encode_transcript(session_data):
+    """Serialize a chat transcript to (encoding, blob) for session_transcripts"""
+    raw = json.dumps(session_data).encode("utf-8")
+    if len(raw) < TRANSCRIPT_COMPRESS_MIN_BYTES:
+        return "json", raw
+    return "zlib", zlib.compress(raw, 6)
+
+
+def decode_transcript(encoding, blob):
+    if blob is None:
+        return {}
+    if encoding == "zlib":
+        blob = zlib.decompress(blob)
+    return json.loads(blob)
+
+
+def _move_transcripts(cursor):
+    # Move existing transcripts out of the hot sessions table
+    cursor.execute("SELECT id, session_data FROM sessions WHERE session_data IS NOT NULL")
+    rows = cursor.fetchall()
+    for session_id, session_data in rows:
+        try:
+            data = json.loads(session_data)
+        except ValueError:
+            data = {"raw": session_data}
+        cursor.execute(
+            "INSERT OR REPLACE INTO session_transcripts (session_id, encoding, data) VALUES (?, ?, ?)",
+            (session_id, *encode_transcript(data))
+        )
+    cursor.execute("UPDATE sessions SET session_data = NULL WHERE session_data IS NOT NULL")
+
+
+# Ordered schema history. Append new steps; never edit an applied one.
+MIGRATIONS = [
+    Migration(1, "create users and sessions tables", [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            grade_level TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            subject TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            score INTEGER,
+            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            session_data TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+    ]),
+    Migration(2, "add users.grade_level", _add_grade_level),
+    Migration(3, "create game_attempts table", [
+        '''
+        CREATE TABLE IF NOT EXISTS game_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            window_id INTEGER NOT NULL,
+            score INTEGER,
+            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+    ]),
+    Migration(4, "index sessions and game_attempts by user", [
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user_completed ON sessions (user_id, completed_at)",
+        "CREATE INDEX IF NOT EXISTS idx_game_attempts_user_completed ON game_attempts (user_id, completed_at)",
+    ]),
+    Migration(5, "unique game attempt per user and window", [
+        _dedupe_game_attempts,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_game_attempts_user_window ON game_attempts (user_id, window_id)",
+    ]),
+    Migration(6, "materialized user_stats and user_subject_stats", user_stats.CREATE_TABLES + [
+        user_stats.rebuild_stats,
+    ]),
+    Migration(7, "incremental streak state", [
+        _add_last_streak_day,
+        user_stats.rebuild_stats,
+    ]),
+    Migration(8, "move transcripts to session_transcripts", [
+        '''
+        CREATE TABLE IF NOT EXISTS session_transcripts (
+            session_id INTEGER PRIMARY KEY,
+            encoding TEXT NOT NULL,
+            data BLOB,
+            FOREIGN KEY (session_id) REFERENCES sessions (id)
+        )
+        ''',
+        _move_transcripts,
+    ]),
+]
+
+# Migration steps can't know the streak timezone, so their rebuilds use UTC days
+STATS_REBUILT_AT = max(m.version for m in MIGRATIONS if isinstance(m.apply, list) and user_stats.rebuild_stats in m.apply)
+
+# Game endpoints are polled constantly; keeping their SQL as fixed strings lets
+# each pooled connection reuse the prepared statement from its statement cache.
+# The game_attempts table itself is created once by the migrations above.
+RECORD_GAME_ATTEMPT_SQL = "INSERT INTO game_attempts (user_id, window_id, score) VALUES (?, ?, ?)"
+HAS_PLAYED_WINDOW_SQL = "SELECT 1 FROM game_attempts WHERE user_id = ? AND window_id = ? LIMIT 1"
+LAST_GAME_ATTEMPT_SQL = """SELECT score, completed_at, window_id
+                           FROM game_attempts
+                           WHERE user_id = ?
+                           ORDER BY completed_at DESC
+                           LIMIT 1"""
+
 
 class UserDatabase:
-    def __init__(self, db_path="tutormate_users.db"):
+    def __init__(self, db_path="tutormate_users.db", pool_size=8, timezone=None):
         self.db_path = db_path
+        # Day boundary for streaks, e.g. "Asia/Kolkata" (default: UTC days)
+        self.tz = ZoneInfo(timezone) if timezone else None
+        # Connections (and their PRAGMAs) are set up once and reused across requests
+        self.pool = SQLitePool(db_path, max_size=pool_size, timeout=30.0) # 30s busy timeout
         self._init_db()
     
     def _get_conn(self):
-        """Get a database connection with timeout and WAL mode"""
-        conn = sqlite3.connect(self.db_path, timeout=30.0) # 30s timeout
-        conn.execute("PRAGMA journal_mode=WAL") # Write-Ahead Logging for concurrency
-        return conn
+        """Check out a pooled connection (use as a context manager)"""
+        return self.pool.connection()
+
+    def get_pool_stats(self):
+        """Connection pool metrics (size, checkouts, wait time)"""
+        return self.pool.stats()
+
+    def close(self):
+        """Close all pooled connections"""
+        self.pool.close()
 
     def _init_db(self):
-        """Initialize the database with users and sessions tables"""
+        """Bring the database schema up to date"""
         with self._get_conn() as conn:
-            cursor = conn.cursor()
-            
-            # Users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    grade_level TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Check if grade_level column exists (for migration)
-            try:
-                cursor.execute("SELECT grade_level FROM users LIMIT 1")
-            except sqlite3.OperationalError:
-                print("Migrating database: Adding grade_level column")
-                try:
-                    cursor.execute("ALTER TABLE users ADD COLUMN grade_level TEXT")
-                except sqlite3.OperationalError:
-                    pass # Column might have been added by another process
-            
-            # Sessions table to track learning sessions
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS sessions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    subject TEXT NOT NULL,
-                    difficulty TEXT NOT NULL,
-                    score INTEGER,
-                    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    session_data TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users (id)
-                )
-            ''')
-            conn.commit()
+            previous = get_schema_version(conn)
+            self.schema_version = migrate(conn, MIGRATIONS)
+            if previous < STATS_REBUILT_AT <= self.schema_version and self.tz is not None \
+                    and self.tz.key not in ("UTC", "Etc/UTC"):
+                # Redo the migrations' UTC-day streaks on the configured boundary
+                print(f"Rebuilding dashboard stats on {self.tz.key} days")
+                self.rebuild_stats()
     
     def hash_password(self, password):
         """Hash password using SHA-256"""
@@ -80,6 +202,7 @@ class UserDatabase:
         except sqlite3.IntegrityError:
             return {"success": False, "error": "Email already registered"}
         except Exception as e:
+            metrics.SQLITE_ERRORS.inc("UserDatabase", "register_user")
             return {"success": False, "error": str(e)}
     
     def login_user(self, email, password):
@@ -109,31 +232,41 @@ class UserDatabase:
                 else:
                     return {"success": False, "error": "Invalid credentials"}
         except Exception as e:
+            metrics.SQLITE_ERRORS.inc("UserDatabase", "login_user")
             return {"success": False, "error": str(e)}
     
     def save_session(self, user_id, subject, difficulty, score, session_data):
-        """Save a learning session"""
+        """Save a learning session and fold it into the user's dashboard stats"""
         try:
             with self._get_conn() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute(
-                    "INSERT INTO sessions (user_id, subject, difficulty, score, session_data) VALUES (?, ?, ?, ?, ?)",
-                    (user_id, subject, difficulty, score, json.dumps(session_data))
+                    "INSERT INTO sessions (user_id, subject, difficulty, score) VALUES (?, ?, ?, ?)",
+                    (user_id, subject, difficulty, score)
                 )
+                session_id = cursor.lastrowid
+                cursor.execute(
+                    "INSERT INTO session_transcripts (session_id, encoding, data) VALUES (?, ?, ?)",
+                    (session_id, *encode_transcript(session_data))
+                )
+                cursor.execute("SELECT completed_at FROM sessions WHERE id = ?", (session_id,))
+                completed_at = cursor.fetchone()[0]
+                user_stats.apply_session(cursor, user_id, subject, score, completed_at, self.tz)
                 conn.commit()
-                return {"success": True}
+                return {"success": True, "session_id": session_id}
         except Exception as e:
+            metrics.SQLITE_ERRORS.inc("UserDatabase", "save_session")
             return {"success": False, "error": str(e)}
     
     def get_user_sessions(self, user_id, limit=10):
-        """Get recent sessions for a user"""
+        """Get recent session summaries for a user (transcripts load via get_session)"""
         try:
             with self._get_conn() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute(
-                    """SELECT subject, difficulty, score, completed_at, session_data 
+                    """SELECT id, subject, difficulty, score, completed_at
                        FROM sessions 
                        WHERE user_id = ? 
                        ORDER BY completed_at DESC 
@@ -144,111 +277,78 @@ class UserDatabase:
                 sessions = []
                 for row in cursor.fetchall():
                     sessions.append({
-                        "subject": row[0],
-                        "difficulty": row[1],
-                        "score": row[2],
-                        "completed_at": row[3],
-                        "session_data": json.loads(row[4]) if row[4] else {}
+                        "id": row[0],
+                        "subject": row[1],
+                        "difficulty": row[2],
+                        "score": row[3],
+                        "completed_at": row[4]
                     })
                 return sessions
         except Exception as e:
+            metrics.SQLITE_ERRORS.inc("UserDatabase", "get_user_sessions")
             print(f"Error fetching sessions: {e}")
             return []
-    
-    def calculate_streak(self, user_id):
-        """Calculate user's active learning streak (consecutive days with sessions)"""
+
+    def get_session(self, session_id, user_id):
+        """Get one of a user's sessions with its full transcript (None if it isn't theirs)"""
         try:
             with self._get_conn() as conn:
                 cursor = conn.cursor()
                 
-                # Get all session dates for this user, ordered by date descending
                 cursor.execute(
-                    """SELECT DISTINCT DATE(completed_at) as session_date
-                       FROM sessions 
-                       WHERE user_id = ? 
-                       ORDER BY session_date DESC""",
-                    (user_id,)
+                    """SELECT s.id, s.user_id, s.subject, s.difficulty, s.score, s.completed_at,
+                              t.encoding, t.data, s.session_data
+                       FROM sessions s
+                       LEFT JOIN session_transcripts t ON t.session_id = s.id
+                       WHERE s.id = ? AND s.user_id = ?""",
+                    (session_id, user_id)
                 )
                 
-                dates = [row[0] for row in cursor.fetchall()]
-                
-                if not dates:
-                    return 0
-                
-                # Calculate streak from most recent date
-                from datetime import datetime, timedelta
-                
-                streak = 0
-                today = datetime.now().date()
-                
-                # Convert string dates to date objects
-                session_dates = [datetime.strptime(d, '%Y-%m-%d').date() for d in dates]
-                
-                # Check if there's a session today or yesterday (to count current streak)
-                most_recent = session_dates[0]
-                if (today - most_recent).days > 1:
-                    # Streak is broken if last session was more than 1 day ago
-                    return 0
-                
-                # Count consecutive days
-                streak = 1
-                for i in range(len(session_dates) - 1):
-                    current_date = session_dates[i]
-                    next_date = session_dates[i + 1]
-                    
-                    # Check if dates are consecutive
-                    if (current_date - next_date).days == 1:
-                        streak += 1
-                    else:
-                        break
+                row = cursor.fetchone()
+                if not row:
+                    return None
                 
-                return streak
+                if row[7] is not None:
+                    session_data = decode_transcript(row[6], row[7])
+                else:
+                    # Written before transcripts moved to their own table
+                    session_data = json.loads(row[8]) if row[8] else {}
                 
+                return {
+                    "id": row[0],
+                    "subject": row[2],
+                    "difficulty": row[3],
+                    "score": row[4],
+                    "completed_at": row[5],
+                    "session_data": session_data
+                }
         except Exception as e:
+            metrics.SQLITE_ERRORS.inc("UserDatabase", "get_session")
+            print(f"Error fetching session: {e}")
+            return None
+    
+    def calculate_streak(self, user_id):
+        """Calculate user's active learning streak (consecutive days with sessions)"""
+        try:
+            with self._get_conn() as conn:
+                return user_stats.read_streak(conn.cursor(), user_id, user_stats.today_for(self.tz))
+        except Exception as e:
+            metrics.SQLITE_ERRORS.inc("UserDatabase", "calculate_streak")
             print(f"Error calculating streak: {e}")
             return 0
+
+    def calculate_streak_full_scan(self, user_id):
+        """Streak recomputed from every session date (for verification)"""
+        with self._get_conn() as conn:
+            return user_stats.scan_streak(conn.cursor(), user_id, user_stats.today_for(self.tz), self.tz)
     
     def get_user_stats(self, user_id):
-        """Get user statistics"""
+        """Get user statistics from the materialized summaries"""
         try:
             with self._get_conn() as conn:
-                cursor = conn.cursor()
-                
-                # Total sessions
-                cursor.execute("SELECT COUNT(*) FROM sessions WHERE user_id = ?", (user_id,))
-                total_sessions = cursor.fetchone()[0]
-                
-                # Average score
-                cursor.execute("SELECT AVG(score) FROM sessions WHERE user_id = ? AND score IS NOT NULL", (user_id,))
-                avg_score = cursor.fetchone()[0] or 0
-                
-                # Recent sessions by subject
-                cursor.execute(
-                    """SELECT subject, COUNT(*) as count, AVG(score) as avg_score
-                       FROM sessions 
-                       WHERE user_id = ? 
-                       GROUP BY subject""",
-                    (user_id,)
-                )
-                
-                subjects = []
-                for row in cursor.fetchall():
-                    subjects.append({
-                        "subject": row[0],
-                        "count": row[1],
-                        "avg_score": round(row[2] or 0, 1)
-                    })
-                
-                # Calculate streak
-                streak = self.calculate_streak(user_id)
-                
-                return {
-                    "total_sessions": total_sessions,
-                    "average_score": round(avg_score, 1),
-                    "subjects": subjects,
-                    "streak": streak
-                }
+                return user_stats.read_stats(conn.cursor(), user_id, user_stats.today_for(self.tz))
         except Exception as e:
+            metrics.SQLITE_ERRORS.inc("UserDatabase", "get_user_stats")
             print(f"Error fetching stats: {e}")
             return {
                 "total_sessions": 0,
@@ -257,31 +357,25 @@ class UserDatabase:
                 "streak": 0
             }
 
+    def rebuild_stats(self, user_id=None):
+        """Recompute dashboard summaries from the raw sessions table"""
+        with self._get_conn() as conn:
+            return user_stats.rebuild_stats(conn.cursor(), user_id, self.tz)
+
     def record_game_attempt(self, user_id, window_id, score):
         """Record a game attempt"""
         try:
             with self._get_conn() as conn:
                 cursor = conn.cursor()
                 
-                # Create table if not exists (lazy init for this feature)
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS game_attempts (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        window_id INTEGER NOT NULL,
-                        score INTEGER,
-                        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users (id)
-                    )
-                ''')
-                
-                cursor.execute(
-                    "INSERT INTO game_attempts (user_id, window_id, score) VALUES (?, ?, ?)",
-                    (user_id, window_id, score)
-                )
+                cursor.execute(RECORD_GAME_ATTEMPT_SQL, (user_id, window_id, score))
                 conn.commit()
                 return True
+        except sqlite3.IntegrityError:
+            # Already played this window
+            return False
         except Exception as e:
+            metrics.SQLITE_ERRORS.inc("UserDatabase", "record_game_attempt")
             print(f"Error recording game attempt: {e}")
             return False
 
@@ -291,24 +385,10 @@ class UserDatabase:
             with self._get_conn() as conn:
                 cursor = conn.cursor()
                 
-                # Create table if not exists
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS game_attempts (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        window_id INTEGER NOT NULL,
-                        score INTEGER,
-                        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users (id)
-                    )
-                ''')
-                
-                cursor.execute(
-                    "SELECT 1 FROM game_attempts WHERE user_id = ? AND window_id = ?",
-                    (user_id, window_id)
-                )
+                cursor.execute(HAS_PLAYED_WINDOW_SQL, (user_id, window_id))
                 return cursor.fetchone() is not None
         except Exception as e:
+            metrics.SQLITE_ERRORS.inc("UserDatabase", "has_played_window")
             print(f"Error checking game attempt: {e}")
             return False
 
@@ -318,26 +398,7 @@ class UserDatabase:
             with self._get_conn() as conn:
                 cursor = conn.cursor()
                 
-                # Create table if not exists (just in case)
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS game_attempts (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        window_id INTEGER NOT NULL,
-                        score INTEGER,
-                        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users (id)
-                    )
-                ''')
-                
-                cursor.execute(
-                    """SELECT score, completed_at, window_id 
-                       FROM game_attempts 
-                       WHERE user_id = ? 
-                       ORDER BY completed_at DESC 
-                       LIMIT 1""",
-                    (user_id,)
-                )
+                cursor.execute(LAST_GAME_ATTEMPT_SQL, (user_id,))
                 
                 row = cursor.fetchone()
                 if row:
@@ -348,5 +409,15 @@ class UserDatabase:
                     }
                 return None
         except Exception as e:
+            metrics.SQLITE_ERRORS.inc("UserDatabase", "get_last_game_attempt")
             print(f"Error fetching last game attempt: {e}")
             return None
+
+
+# Per-method timings on /metrics. Methods that catch their own errors count
+# them in SQLITE_ERRORS where they're caught; the wrapper counts the rest.
+metrics.instrument_methods(UserDatabase, metrics.SQLITE_SECONDS, "UserDatabase", methods=[
+    "register_user", "login_user", "save_session", "get_user_sessions", "get_session", "calculate_streak",
+    "calculate_streak_full_scan", "get_user_stats", "rebuild_stats", "record_game_attempt",
+    "has_played_window", "get_last_game_attempt",
+], errors=metrics.SQLITE_ERRORS)
@@ -0,0 +1,233 @@
+"""
+Incrementally maintained per-user dashboard summaries.
+
+``user_stats`` holds one row per user (session count, score sum/count,
+last active day and streak state) and ``user_subject_stats`` one row per
+(user, subject). Both are updated by ``apply_session`` in the same
+transaction that inserts the session, so the dashboard reads a handful of
+primary-key rows instead of aggregating the full sessions history.
+
+Streaks are tracked as (streak_length, last_streak_day). Days are UTC
+calendar days by default; pass a ``tzinfo`` to count days on a local
+day boundary instead.
+"""
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Any, Iterable, List, Optional
+
+from tools.migrations import column_exists
+
+
+CREATE_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER PRIMARY KEY,
+        session_count INTEGER NOT NULL DEFAULT 0,
+        score_count INTEGER NOT NULL DEFAULT 0,
+        score_sum INTEGER NOT NULL DEFAULT 0,
+        last_active_date TEXT,
+        streak_length INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS user_subject_stats (
+        user_id INTEGER NOT NULL,
+        subject TEXT NOT NULL,
+        session_count INTEGER NOT NULL DEFAULT 0,
+        score_count INTEGER NOT NULL DEFAULT 0,
+        score_sum INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, subject),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+]
+
+
+def session_day(completed_at: str, tz=None) -> date:
+    """Calendar day of a sessions.completed_at value (stored as UTC)"""
+    if tz is None:
+        return date.fromisoformat(completed_at[:10])
+    moment = datetime.strptime(completed_at[:19], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return moment.astimezone(tz).date()
+
+
+def today_for(tz=None) -> date:
+    """Today's date on the same day boundary as session_day (UTC unless tz is given)"""
+    return datetime.now(tz or timezone.utc).date()
+
+
+def full_scan_streak(session_days: Iterable[date], today: date) -> int:
+    """
+    Reference streak over a user's full day history (the original
+    calculate_streak algorithm). Used for verification only.
+    """
+    days: List[date] = sorted(set(session_days), reverse=True)
+    if not days or (today - days[0]).days > 1:
+        return 0
+
+    streak = 1
+    for current_day, next_day in zip(days, days[1:]):
+        if (current_day - next_day).days == 1:
+            streak += 1
+        else:
+            break
+    return streak
+
+
+def advance_streak(streak_length: int, last_day: Optional[date], day: date):
+    """Return the (streak_length, last_day) state after activity on ``day``"""
+    if last_day is None:
+        return 1, day
+    if day <= last_day:
+        # Same day, or an out-of-order backfill that cannot extend the current run
+        return streak_length, last_day
+    if day - last_day == timedelta(days=1):
+        return streak_length + 1, day
+    return 1, day
+
+
+def current_streak(streak_length: int, last_day: Optional[date], today: date) -> int:
+    """A stored streak only counts if the last active day was today or yesterday"""
+    if last_day is None or (today - last_day).days > 1:
+        return 0
+    return streak_length
+
+
+def apply_session(cursor: sqlite3.Cursor, user_id: int, subject: str, score: Optional[int],
+                  completed_at: str, tz=None):
+    """Fold one new session into the user's summaries"""
+    has_score = 0 if score is None else 1
+    score_value = score or 0
+
+    cursor.execute(
+        "SELECT last_streak_day, streak_length FROM user_stats WHERE user_id = ?",
+        (user_id,)
+    )
+    row = cursor.fetchone()
+    last_day = date.fromisoformat(row[0]) if row and row[0] else None
+    streak_length, last_day = advance_streak(row[1] if row else 0, last_day, session_day(completed_at, tz))
+
+    cursor.execute('''
+        INSERT INTO user_stats (user_id, session_count, score_count, score_sum, last_active_date, streak_length, last_streak_day)
+        VALUES (?, 1, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            session_count = session_count + 1,
+            score_count = score_count + excluded.score_count,
+            score_sum = score_sum + excluded.score_sum,
+            last_active_date = MAX(COALESCE(last_active_date, ''), excluded.last_active_date),
+            streak_length = excluded.streak_length,
+            last_streak_day = excluded.last_streak_day
+    ''', (user_id, has_score, score_value, completed_at[:10], streak_length, last_day.isoformat()))
+
+    cursor.execute('''
+        INSERT INTO user_subject_stats (user_id, subject, session_count, score_count, score_sum)
+        VALUES (?, ?, 1, ?, ?)
+        ON CONFLICT (user_id, subject) DO UPDATE SET
+            session_count = session_count + 1,
+            score_count = score_count + excluded.score_count,
+            score_sum = score_sum + excluded.score_sum
+    ''', (user_id, subject, has_score, score_value))
+
+
+def rebuild_stats(cursor: sqlite3.Cursor, user_id: Optional[int] = None, tz=None) -> int:
+    """
+    Recompute summaries from the raw sessions table, for every user or just
+    one. Returns the number of users rebuilt. Also runs as a migration step
+    at v6, before v7 adds last_streak_day; the streak day is only written
+    once the column exists.
+    """
+    streak_day_column = column_exists(cursor, "user_stats", "last_streak_day")
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+
+    cursor.execute(f"DELETE FROM user_stats {where}", params)
+    cursor.execute(f"DELETE FROM user_subject_stats {where}", params)
+
+    cursor.execute(f'''
+        INSERT INTO user_subject_stats (user_id, subject, session_count, score_count, score_sum)
+        SELECT user_id, subject, COUNT(*), COUNT(score), COALESCE(SUM(score), 0)
+        FROM sessions {where}
+        GROUP BY user_id, subject
+    ''', params)
+
+    cursor.execute(f'''
+        SELECT user_id, COUNT(*), COUNT(score), COALESCE(SUM(score), 0)
+        FROM sessions {where}
+        GROUP BY user_id
+    ''', params)
+    totals = cursor.fetchall()
+
+    for uid, session_count, score_count, score_sum in totals:
+        streak_length, last_day = 0, None
+        for day in sorted(_session_days(cursor, uid, tz)):
+            streak_length, last_day = advance_streak(streak_length, last_day, day)
+
+        cursor.execute("SELECT MAX(DATE(completed_at)) FROM sessions WHERE user_id = ?", (uid,))
+        last_active = cursor.fetchone()[0]
+
+        row = (uid, session_count, score_count, score_sum, last_active, streak_length)
+        if streak_day_column:
+            cursor.execute('''
+                INSERT INTO user_stats (user_id, session_count, score_count, score_sum, last_active_date, streak_length, last_streak_day)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', row + (last_day.isoformat() if last_day else None,))
+        else:
+            cursor.execute('''
+                INSERT INTO user_stats (user_id, session_count, score_count, score_sum, last_active_date, streak_length)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', row)
+
+    return len(totals)
+
+
+def _session_days(cursor: sqlite3.Cursor, user_id: int, tz=None) -> set:
+    if tz is None:
+        cursor.execute("SELECT DISTINCT DATE(completed_at) FROM sessions WHERE user_id = ?", (user_id,))
+        return {date.fromisoformat(row[0]) for row in cursor.fetchall()}
+    cursor.execute("SELECT completed_at FROM sessions WHERE user_id = ?", (user_id,))
+    return {session_day(row[0], tz) for row in cursor.fetchall()}
+
+
+def scan_streak(cursor: sqlite3.Cursor, user_id: int, today: date, tz=None) -> int:
+    """Streak recomputed from every session of the user (O(history))"""
+    return full_scan_streak(_session_days(cursor, user_id, tz), today)
+
+
+def read_streak(cursor: sqlite3.Cursor, user_id: int, today: date) -> int:
+    """Current streak from the stored state (O(1))"""
+    cursor.execute("SELECT streak_length, last_streak_day FROM user_stats WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    if not row:
+        return 0
+    return current_streak(row[0], date.fromisoformat(row[1]) if row[1] else None, today)
+
+
+def read_stats(cursor: sqlite3.Cursor, user_id: int, today: date) -> Dict[str, Any]:
+    """Dashboard stats for one user from the summary tables"""
+    cursor.execute(
+        "SELECT session_count, score_count, score_sum, last_streak_day, streak_length FROM user_stats WHERE user_id = ?",
+        (user_id,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return {"total_sessions": 0, "average_score": 0, "subjects": [], "streak": 0}
+
+    session_count, score_count, score_sum, last_streak_day, streak_length = row
+    last_day = date.fromisoformat(last_streak_day) if last_streak_day else None
+
+    cursor.execute(
+        "SELECT subject, session_count, score_count, score_sum FROM user_subject_stats WHERE user_id = ? ORDER BY subject",
+        (user_id,)
+    )
+    subjects = [{
+        "subject": subject,
+        "count": count,
+        "avg_score": round(s_sum / s_count, 1) if s_count else 0
+    } for subject, count, s_count, s_sum in cursor.fetchall()]
+
+    return {
+        "total_sessions": session_count,
+        "average_score": round(score_sum / score_count, 1) if score_count else 0,
+        "subjects": subjects,
+        "streak": current_streak(streak_length, last_day, today)
+    }